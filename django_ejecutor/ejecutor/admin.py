@@ -24,6 +24,12 @@ class ExecutableFileAdmin(admin.ModelAdmin):
             ('Información Básica', {
                 'fields': ('name', 'description', 'category', 'type', 'is_active')
             }),
+            ('Vista en Vivo', {
+                'fields': ('live_view_policy', 'live_view_max_rate', 'live_view_interval_ms', 'interactive')
+            }),
+            ('Historial', {
+                'fields': ('retention_days',)
+            }),
             ('Metadatos', {
                 'fields': ('uploader', 'upload_date', 'last_executed', 'execution_count')
             }),
@@ -47,14 +53,15 @@ class ExecutionLogAdmin(admin.ModelAdmin):
     """Admin view for ExecutionLog model."""
     list_display = ('executable', 'user', 'executed_at', 'success', 'exit_code', 'ip_address')
     list_filter = ('success', 'executable', 'user')
-    search_fields = ('executable__name', 'output')
-    readonly_fields = ('executable', 'user', 'executed_at', 'success', 'output', 'exit_code', 'ip_address')
+    search_fields = ('executable__name',)
+    readonly_fields = ('executable', 'user', 'executed_at', 'success', 'exit_code', 'ip_address',
+                       'output_bytes', 'output_lines')
     fieldsets = (
         ('Ejecución', {
             'fields': ('executable', 'user', 'executed_at')
         }),
         ('Resultado', {
-            'fields': ('success', 'exit_code', 'output')
+            'fields': ('success', 'exit_code', 'output_bytes', 'output_lines')
         }),
         ('Información Adicional', {
             'fields': ('ip_address',)
@@ -8,3 +8,6 @@ class EjecutorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ejecutor'
     verbose_name = "Gestor de Ejecutables"
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,181 @@
+"""
+Compressed storage of finished execution output.
+
+The output of a run is cut into segments that are compressed independently
+and concatenated into one blob (a valid multi-member gzip or multi-frame
+zstd file). A small JSON index stored next to it records where each segment
+starts, so a byte range is served by decompressing only the segments it
+covers.
+"""
+import bisect
+import gzip
+import json
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx'
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def zstd_available():
+    return zstandard is not None
+
+
+def compress(codec, data, level=None):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level or 3).compress(data)
+    return gzip.compress(data, compresslevel=level or 6, mtime=0)
+
+
+def decompress(codec, data):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed output")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class OutputBlobStore:
+    """
+    Write and read compressed output blobs through a Django storage backend.
+
+    ``codec`` is ``gzip`` or ``zstd`` (needs the optional ``zstandard``
+    package; gzip is used without it). Each blob records its own codec, so
+    blobs written with either can be read back later. Blobs are immutable
+    once saved. They are named ``<location>/<id[:2]>/<id><suffix>`` plus the
+    codec extension.
+    """
+
+    def __init__(self, storage=None, codec='gzip', segment_size=256 * 1024, level=None,
+                 location='execution_output/archive', index_cache_size=128, suffix='.log'):
+        if codec not in EXTENSIONS:
+            raise ValueError(f"Unknown output codec: {codec}")
+        if codec == 'zstd' and not zstd_available():
+            logger.warning("zstandard is not installed, compressing output with gzip")
+            codec = 'gzip'
+        self.storage = storage or default_storage
+        self.codec = codec
+        self.segment_size = segment_size
+        self.level = level
+        self.location = location
+        self.index_cache_size = index_cache_size
+        self.suffix = suffix
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def name_for(self, execution_id):
+        return f'{self.location}/{execution_id[:2]}/{execution_id}{self.suffix}{EXTENSIONS[self.codec]}'
+
+    def save(self, execution_id, chunks):
+        """
+        Compress an iterable of byte chunks into a new blob.
+
+        Returns:
+            dict with 'path', 'size' and 'lines', or None if there was no data
+        """
+        # [raw offset, blob offset, blob length] of each segment
+        segments = []
+        size = newlines = 0
+        pending = bytearray()
+
+        with tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024) as blob:
+            def write_segment(data):
+                compressed = compress(self.codec, bytes(data), self.level)
+                segments.append([size, blob.tell(), len(compressed)])
+                blob.write(compressed)
+                return len(data)
+
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                newlines += chunk.count(b'\n')
+                pending += chunk
+                while len(pending) >= self.segment_size:
+                    size += write_segment(pending[:self.segment_size])
+                    del pending[:self.segment_size]
+            if pending:
+                size += write_segment(pending)
+            if not size:
+                return None
+
+            blob.seek(0)
+            path = self.storage.save(self.name_for(execution_id), File(blob))
+
+        # Lines are joined with \n, so a non-empty output has one more line than newlines
+        index = {'version': INDEX_VERSION, 'codec': self.codec, 'size': size,
+                 'lines': newlines + 1, 'segments': segments}
+        self.storage.save(path + INDEX_SUFFIX, ContentFile(json.dumps(index).encode('utf-8')))
+        return {'path': path, 'size': size, 'lines': index['lines']}
+
+    def save_text(self, execution_id, text):
+        """Store a short text (an error message) as a blob; None if empty."""
+        return self.save(execution_id, [text.encode('utf-8')] if text else [])
+
+    def index(self, path):
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is not None:
+                self._indexes.move_to_end(path)
+                return index
+        with self.storage.open(path + INDEX_SUFFIX, 'rb') as f:
+            index = json.loads(f.read())
+        if index.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported output index version in {path}")
+        with self._lock:
+            self._indexes[path] = index
+            if len(self._indexes) > self.index_cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def read(self, path, offset=0, length=None):
+        """Return ``length`` bytes (all if None) starting at byte ``offset``."""
+        index = self.index(path)
+        size = index['size']
+        offset = max(0, min(offset, size))
+        end = size if length is None else min(size, offset + max(0, length))
+        if end <= offset:
+            return b''
+
+        segments = index['segments']
+        starts = [segment[0] for segment in segments]
+        first = bisect.bisect_right(starts, offset) - 1
+        data = bytearray()
+        with self.storage.open(path, 'rb') as f:
+            for raw_offset, blob_offset, blob_length in segments[first:]:
+                if raw_offset >= end:
+                    break
+                f.seek(blob_offset)
+                segment = decompress(index['codec'], f.read(blob_length))
+                data += segment[max(0, offset - raw_offset):end - raw_offset]
+        return bytes(data)
+
+    def iter_chunks(self, path):
+        """Yield the whole output as decompressed segments, one at a time."""
+        index = self.index(path)
+        with self.storage.open(path, 'rb') as f:
+            for _raw_offset, blob_offset, blob_length in index['segments']:
+                f.seek(blob_offset)
+                yield decompress(index['codec'], f.read(blob_length))
+
+    def delete(self, path):
+        with self._lock:
+            self._indexes.pop(path, None)
+        for name in (path, path + INDEX_SUFFIX):
+            try:
+                self.storage.delete(name)
+            except Exception as e:
+                logger.warning(f"Could not delete output blob {name}: {e}")
@@ -0,0 +1,157 @@
+"""
+Write-behind persistence of output as ExecutionOutputChunk rows while an
+execution runs, and reading output back from those rows.
+"""
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from django.db.models import Sum
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkWriter:
+    """
+    Buffer the output of one execution and persist it in the background.
+
+    ``write`` only appends to a buffer and never blocks. A dedicated task
+    flushes the buffer every ``flush_lines`` writes or ``flush_interval``
+    seconds, whichever comes first, as rows of at most ``max_chunk_bytes``
+    inserted with one bulk insert in a worker thread. Flushes are serial, so
+    a slow database makes batches larger rather than piling up inserts. Rows
+    that fail to insert are retried with the next flush, up to
+    ``max_retries`` failed flushes in a row; then the writer gives up, drops
+    what it holds and ignores further output, so a database outage cannot
+    grow memory without bound. The chunks persisted so far stay a consistent
+    prefix, and the execution still stores its whole output when it ends.
+    """
+
+    def __init__(self, log_id, flush_lines=500, flush_interval=0.5, max_chunk_bytes=64 * 1024,
+                 max_retries=5):
+        self.log_id = log_id
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_retries = max_retries
+        self.offset = 0
+        self.seq = 0
+        self.failures = 0
+        self.given_up = False
+        self._pending = bytearray()
+        self._pending_lines = 0
+        self._failed = []
+        self._wake = asyncio.Event()
+        self._closed = False
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def write(self, data):
+        """Queue the bytes of one line (with its separator)."""
+        if self.given_up:
+            return
+        self._pending += data
+        self._pending_lines += 1
+        if self._pending_lines >= self.flush_lines:
+            self._wake.set()
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush()
+        await self._flush()
+
+    def _take_chunks(self):
+        from .models import ExecutionOutputChunk
+
+        data, self._pending, self._pending_lines = bytes(self._pending), bytearray(), 0
+        chunks = []
+        for start in range(0, len(data), self.max_chunk_bytes):
+            piece = data[start:start + self.max_chunk_bytes]
+            self.seq += 1
+            chunks.append(ExecutionOutputChunk(
+                log_id=self.log_id, seq=self.seq, offset=self.offset,
+                newlines=piece.count(b'\n'), data=piece,
+            ))
+            self.offset += len(piece)
+        return chunks
+
+    async def _flush(self):
+        chunks, self._failed = self._failed + self._take_chunks(), []
+        if not chunks:
+            return
+        try:
+            await database_sync_to_async(self._insert)(chunks)
+        except Exception as e:
+            self.failures += 1
+            if self.failures < self.max_retries:
+                logger.error(f"Error persisting output chunks of log {self.log_id}: {e}")
+                self._failed = chunks
+                return
+            self.given_up = True
+            self._pending, self._pending_lines = bytearray(), 0
+            dropped = sum(len(chunk.data) for chunk in chunks)
+            logger.error(f"Giving up persisting output chunks of log {self.log_id} after "
+                         f"{self.failures} failed attempts ({e}); dropped {len(chunks)} chunks "
+                         f"({dropped} bytes) from offset {chunks[0].offset}")
+        else:
+            self.failures = 0
+
+    @staticmethod
+    def _insert(chunks):
+        from .models import ExecutionOutputChunk
+
+        ExecutionOutputChunk.objects.bulk_create(chunks)
+
+    async def close(self):
+        """Flush what is left and stop the writer task."""
+        self._closed = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+
+
+def chunked_size(log_id):
+    """Return ``(bytes, lines)`` of the output persisted as chunks of a log."""
+    from .models import ExecutionOutputChunk
+
+    chunks = ExecutionOutputChunk.objects.filter(log_id=log_id)
+    last = chunks.order_by('-offset').only('offset', 'data').first()
+    if last is None:
+        return 0, 0
+    newlines = chunks.aggregate(total=Sum('newlines'))['total']
+    return last.offset + len(last.data), newlines + 1
+
+
+def read_chunks(log_id, offset=0, length=None):
+    """Return ``length`` bytes (all if None) of a log's chunks starting at byte ``offset``."""
+    from .models import ExecutionOutputChunk
+
+    chunks = ExecutionOutputChunk.objects.filter(log_id=log_id)
+    first = chunks.filter(offset__lte=offset).order_by('-offset').values_list('offset', flat=True).first()
+    if first is None:
+        return b''
+    chunks = chunks.filter(offset__gte=first).order_by('offset')
+    if length is not None:
+        chunks = chunks.filter(offset__lt=offset + length)
+    data = bytearray()
+    for chunk_data in chunks.values_list('data', flat=True).iterator():
+        data += chunk_data
+    data = bytes(data[offset - first:])
+    return data if length is None else data[:length]
+
+
+def iter_chunks(log_id):
+    """Yield the chunk data of a log in order, without loading every chunk at once."""
+    from .models import ExecutionOutputChunk
+
+    chunks = ExecutionOutputChunk.objects.filter(log_id=log_id).order_by('seq')
+    for data in chunks.values_list('data', flat=True).iterator(chunk_size=32):
+        yield bytes(data)
@@ -4,23 +4,88 @@ WebSocket consumers for real-time execution updates.
 import json
 import asyncio
 import logging
+from collections import deque
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.consumer import get_handler_name
 from channels.db import database_sync_to_async
 from django.utils import timezone
 from django.conf import settings
 from .models import ExecutionLog, ExecutableFile
 from .execution import ExecutionManager
+from .frames import SUBPROTOCOL_DEFLATE, frame_cache, negotiate
+from .streams import FlowControl
 
 logger = logging.getLogger(__name__)
 
-class ExecutionConsumer(AsyncWebsocketConsumer):
+class ExecutionLookupMixin:
+    """Access checks and status lookups shared by the execution consumers."""
+
+    @database_sync_to_async
+    def can_access(self, execution_id):
+        """Only the user who started an execution, or staff, may watch or cancel it."""
+        user = self.scope['user']
+        if user.is_staff:
+            return True
+        if ExecutionLog.objects.filter(execution_uuid=execution_id, user=user).exists():
+            return True
+        archived = ExecutionManager.get_log_archiver().load(execution_id)
+        return archived is not None and archived.user_id == user.id
+
+    @database_sync_to_async
+    def get_execution_status(self, execution_id):
+        """Return the stored status of an execution."""
+        log = ExecutionManager.find_log(execution_id)
+        if log is None:
+            return {'status': 'unknown', 'message': 'Ejecución no encontrada'}
+
+        if log.completed:
+            return {
+                'status': 'completed',
+                'success': log.success,
+                'exit_code': log.exit_code,
+                'message': f'Ejecución finalizada con código {log.exit_code}'
+            }
+        return {'status': 'running', 'message': 'Ejecución en curso'}
+
+    async def current_status(self, execution_id):
+        """Return the status of an execution, with its queue position if it is waiting."""
+        execution_status = await self.get_execution_status(execution_id)
+        if execution_status['status'] == 'running':
+            position = ExecutionManager.get_scheduler().position(execution_id)
+            if position:
+                execution_status = {
+                    'status': 'queued',
+                    'position': position,
+                    'message': f'En cola: posición {position}'
+                }
+        return execution_status
+
+class ExecutionConsumer(ExecutionLookupMixin, AsyncWebsocketConsumer):
     """Consumer to handle real-time execution output."""
 
+    # Flow control for clients that acknowledge output (?flow=ack)
+    FLOW_WINDOW_BYTES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('FLOW_WINDOW_BYTES', 1024 * 1024)
+    SNAPSHOT_INTERVAL = getattr(settings, 'EXECUTOR_CONFIG', {}).get('SNAPSHOT_INTERVAL', 1.0)
+    SNAPSHOT_LINES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('SNAPSHOT_LINES', 200)
+    # Longest a connect waits for the shared display warm-up
+    DISPLAY_READY_TIMEOUT = getattr(settings, 'EXECUTOR_CONFIG', {}).get('DISPLAY_READY_TIMEOUT', 5.0)
+    # Longest stdin message accepted from the client, in characters
+    MAX_STDIN_LENGTH = 4096
+
     async def connect(self):
         """Handle WebSocket connection."""
         try:
             self.execution_id = self.scope['url_route']['kwargs'].get('execution_id')
             self.execution_group_name = f'execution_{self.execution_id}' if self.execution_id else 'execution_general'
+            # Sequence number of the last output batch delivered to this client
+            self.last_seq = 0
+            self.completion_sent = False
+            self.subscription = None
+            self.subscription_task = None
+            self.subprotocol = None
+            self.flow = None
+            self.snapshot_task = None
 
             # Validate user authentication
             if not self.scope['user'].is_authenticated:
@@ -28,20 +93,27 @@ class ExecutionConsumer(AsyncWebsocketConsumer):
                 await self.close()
                 return
 
-            # Ensure virtual display is running (only on Linux)
-            if not getattr(settings, 'IS_WINDOWS', False):
+            # Wait for a warm display only if the execution is still to run here;
+            # finished or remote executions need none
+            if not getattr(settings, 'IS_WINDOWS', False) and ExecutionManager.is_active(self.execution_id):
                 try:
-                    ExecutionManager.ensure_virtual_display()
+                    await asyncio.wait_for(ExecutionManager.ensure_virtual_display(), self.DISPLAY_READY_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Virtual display not ready after {self.DISPLAY_READY_TIMEOUT}s, connecting anyway")
                 except Exception as e:
                     logger.error(f"Error ensuring virtual display: {e}")
 
-            # Join execution group
-            await self.channel_layer.group_add(
-                self.execution_group_name,
-                self.channel_name
+            # Events come in-process: straight from the execution when it runs here,
+            # else through the node relay shared by every consumer of this process.
+            # They queue up in the subscription until the handshake and the replay
+            # are done, so none is sent early or lost
+            self.subscription = await ExecutionManager.get_transport().subscribe(
+                self.execution_group_name, ExecutionManager.is_local(self.execution_id)
             )
 
-            await self.accept()
+            # Clients offering a binary subprotocol get output batches as binary frames
+            self.subprotocol = negotiate(self.scope.get('subprotocols'))
+            await self.accept(subprotocol=self.subprotocol)
             logger.info(f"WebSocket connection established for execution {self.execution_id}")
 
             # Send initial status message
@@ -52,24 +124,74 @@ class ExecutionConsumer(AsyncWebsocketConsumer):
                 'timestamp': timezone.now().isoformat()
             }
 
-            # Add VNC URL only if not on Windows
-            if not getattr(settings, 'IS_WINDOWS', False):
-                initial_message['vnc_url'] = f'http://localhost:{getattr(ExecutionManager, "NOVNC_PORT", 6080)}/vnc.html'
+            # Add the VNC URL of the display leased to this execution, if any
+            running = ExecutionManager.registry.get(self.execution_id)
+            if running and running.display and running.display.vnc_url:
+                initial_message['vnc_url'] = running.display.vnc_url
 
             await self.send(text_data=json.dumps(initial_message))
 
+            query = parse_qs(self.scope.get('query_string', b'').decode())
+            if query.get('flow', [None])[0] == 'ack':
+                self.flow = FlowControl(self.FLOW_WINDOW_BYTES)
+                # Latest lines, sent instead of every batch while the client lags
+                self.recent_lines = deque(maxlen=self.SNAPSHOT_LINES)
+                self.snapshot_dirty = False
+
+            # Resume: replay what the client missed before going live
+            since = query.get('since', [None])[0]
+            if since is not None and since.isdigit():
+                await self.replay(int(since))
+
+            # Go live; batches the replay already sent are skipped by their seq
+            self.subscription_task = asyncio.create_task(self.consume_subscription())
+
         except Exception as e:
             logger.error(f"Error in WebSocket connect: {e}")
             await self.close()
 
+    async def replay(self, since):
+        """Send the output batches after ``since`` from the execution's replay buffer."""
+        self.last_seq = since
+        buffer = ExecutionManager.replays.get(self.execution_id)
+        events, gap = buffer.since(since) if buffer else ([], since > 0)
+
+        if gap:
+            # Missed batches are gone; the client must re-fetch the stored output
+            await self.send(text_data=json.dumps({
+                'type': 'execution_resync',
+                'execution_id': self.execution_id,
+                'last_seq': buffer.last_seq if buffer else None,
+            }))
+            if buffer:
+                self.last_seq = buffer.last_seq
+            return
+
+        for event in events:
+            await self.execution_output(event)
+        if buffer and buffer.final:
+            await self.execution_output(buffer.final)
+
+    async def consume_subscription(self):
+        """Dispatch events from the in-process subscription to the handlers."""
+        # Handlers are called directly: they do not touch the database, so the
+        # connection cleanup that dispatch() runs on every message is not needed
+        while True:
+            event = await self.subscription.get()
+            try:
+                await getattr(self, get_handler_name(event))(event)
+            except Exception as e:
+                logger.error(f"Error handling {event.get('type')} event: {e}")
+
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
         try:
-            # Leave execution group
-            await self.channel_layer.group_discard(
-                self.execution_group_name,
-                self.channel_name
-            )
+            if getattr(self, 'snapshot_task', None) is not None:
+                self.snapshot_task.cancel()
+            if getattr(self, 'subscription_task', None) is not None:
+                self.subscription_task.cancel()
+            if getattr(self, 'subscription', None) is not None:
+                await ExecutionManager.get_transport().unsubscribe(self.subscription)
             logger.info(f"WebSocket disconnected for execution {self.execution_id}, code: {close_code}")
         except Exception as e:
             logger.error(f"Error in WebSocket disconnect: {e}")
@@ -80,7 +202,341 @@ class ExecutionConsumer(AsyncWebsocketConsumer):
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type')
 
-            if message_type == 'check_status':
+            if message_type == 'ack':
+                if self.flow is not None and isinstance(text_data_json.get('seq'), int):
+                    self.flow.ack(text_data_json['seq'])
+
+            elif message_type == 'check_status':
                 # Check execution status and send back
-                execution_status = await self.get_execution_status(self.execution_id)
-      
\ No newline at end of file
+                execution_status = await self.current_status(self.execution_id)
+                await self.send(text_data=json.dumps({
+                    'type': 'execution_status',
+                    **execution_status
+                }))
+
+            elif message_type == 'cancel':
+                if not await self.can_access(self.execution_id):
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'No tiene permisos para cancelar esta ejecución'
+                    }))
+                    return
+                cancelled = await ExecutionManager.kill_execution(self.execution_id)
+                await self.send(text_data=json.dumps({
+                    'type': 'cancel_result',
+                    'cancelled': cancelled,
+                    'execution_id': self.execution_id
+                }))
+
+            elif message_type in ('stdin', 'resize'):
+                # Input for interactive executions running in this process
+                if not await self.can_access(self.execution_id):
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'No tiene permisos para enviar entrada a esta ejecución'
+                    }))
+                    return
+                if message_type == 'resize':
+                    rows, cols = text_data_json.get('rows'), text_data_json.get('cols')
+                    if isinstance(rows, int) and isinstance(cols, int):
+                        ExecutionManager.resize_terminal(self.execution_id, rows, cols)
+                    return
+                data = text_data_json.get('data')
+                if not isinstance(data, str) or len(data) > self.MAX_STDIN_LENGTH or \
+                        not await ExecutionManager.write_stdin(self.execution_id, data):
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'La ejecución no acepta entrada'
+                    }))
+
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON received on execution {self.execution_id}")
+        except Exception as e:
+            logger.error(f"Error in WebSocket receive: {e}")
+
+    async def execution_output(self, event):
+        """Forward execution output to the WebSocket client, skipping what it already has."""
+        seq = event.get('seq')
+        if seq is not None:
+            if seq <= self.last_seq:
+                return
+            self.last_seq = seq
+        if event.get('complete'):
+            if self.completion_sent:
+                return
+            self.completion_sent = True
+            if self.snapshot_task is not None:
+                # Leave the client with the final tail before the completion message
+                self.snapshot_task.cancel()
+                self.snapshot_task = None
+                if self.snapshot_dirty:
+                    await self.send_snapshot()
+
+        if self.flow is not None and seq is not None and 'lines' in event:
+            progress = set(event.get('progress', ()))
+            self.recent_lines.extend(line for index, line in enumerate(event['lines'])
+                                     if index not in progress)
+            if self.snapshot_task is not None:
+                self.snapshot_dirty = True
+                return
+            if self.flow.lagging:
+                await self.enter_snapshot_mode()
+                return
+
+        if self.subprotocol and seq is not None and 'lines' in event:
+            compress = self.subprotocol == SUBPROTOCOL_DEFLATE
+            data = frame_cache.encode(self.execution_id, event, compress)
+            await self.send(bytes_data=data)
+        else:
+            data = frame_cache.text(event)
+            await self.send(text_data=data)
+        if self.flow is not None and seq is not None:
+            self.flow.sent(seq, len(data))
+
+    async def enter_snapshot_mode(self):
+        """Stop streaming every batch to a lagging client and send it the latest tail instead."""
+        logger.info(f"Client of execution {self.execution_id} is lagging "
+                    f"({self.flow.outstanding} bytes unacknowledged), switching to snapshots")
+        await self.send(text_data=json.dumps({
+            'type': 'execution_flow',
+            'mode': 'snapshot',
+            'message': 'Conexión lenta: se muestran solo las últimas líneas',
+        }))
+        await self.send_snapshot()
+        self.snapshot_task = asyncio.create_task(self.snapshot_loop())
+
+    async def send_snapshot(self):
+        data = json.dumps({
+            'type': 'execution_snapshot',
+            'seq': self.last_seq,
+            'lines': list(self.recent_lines),
+        })
+        await self.send(text_data=data)
+        self.flow.sent(self.last_seq, len(data))
+        self.snapshot_dirty = False
+
+    async def snapshot_loop(self):
+        """Refresh the snapshot while the client lags; resume streaming once it catches up."""
+        try:
+            while True:
+                await asyncio.sleep(self.SNAPSHOT_INTERVAL)
+                # At most one snapshot in flight: wait until the client has rendered the last one
+                if self.flow.outstanding:
+                    continue
+                if self.snapshot_dirty:
+                    await self.send_snapshot()
+                self.snapshot_task = None
+                await self.send(text_data=json.dumps({
+                    'type': 'execution_flow',
+                    'mode': 'live',
+                    'message': 'Conexión recuperada: salida en tiempo real',
+                }))
+                return
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending output snapshot: {e}")
+
+    async def execution_status(self, event):
+        """Forward execution status changes to the WebSocket client."""
+        await self.send(text_data=frame_cache.text(event))
+
+    async def execution_queue(self, event):
+        """Forward queue position updates to the WebSocket client."""
+        await self.send(text_data=frame_cache.text(event))
+
+class WatchedExecution:
+    """State of one subscription of a multiplexed connection."""
+
+    def __init__(self, mode, tail_lines):
+        self.mode = mode
+        self.subscription = None
+        self.seq = 0
+        self.lines = deque(maxlen=tail_lines)
+        self.dirty = False
+
+class ExecutionMultiplexConsumer(ExecutionLookupMixin, AsyncWebsocketConsumer):
+    """
+    Watch many executions over one connection.
+
+    The client sends ``{"type": "subscribe", "execution_id": ..., "mode": ...}``
+    and ``{"type": "unsubscribe", "execution_id": ...}``; every event sent back
+    carries its ``execution_id``. Modes:
+
+    - ``status``: status, queue and completion messages only.
+    - ``tail``: plus the latest output lines, at most every ``TAIL_INTERVAL`` seconds.
+    - ``output``: every output batch, as on ``ws/execution/<id>/``.
+    """
+
+    MODES = ('status', 'tail', 'output')
+    MAX_SUBSCRIPTIONS = getattr(settings, 'EXECUTOR_CONFIG', {}).get('MULTIPLEX_MAX_SUBSCRIPTIONS', 50)
+    TAIL_INTERVAL = getattr(settings, 'EXECUTOR_CONFIG', {}).get('MULTIPLEX_TAIL_INTERVAL', 1.0)
+    TAIL_LINES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('MULTIPLEX_TAIL_LINES', 20)
+
+    async def connect(self):
+        """Handle WebSocket connection."""
+        self.subscriptions = {}
+        # One queue for the events of every subscription of this connection
+        self.events = asyncio.Queue()
+        self.events_task = None
+        self.tail_task = None
+
+        if not self.scope['user'].is_authenticated:
+            logger.warning(f"Unauthenticated user attempted multiplexed WebSocket connection")
+            await self.close()
+            return
+
+        await self.accept()
+        await self.send_event({
+            'type': 'connection_established',
+            'message': 'Conectado al flujo de ejecuciones',
+            'modes': self.MODES,
+            'max_subscriptions': self.MAX_SUBSCRIPTIONS,
+            'timestamp': timezone.now().isoformat()
+        })
+
+    async def disconnect(self, close_code):
+        """Drop every subscription of the connection."""
+        try:
+            for task in (self.events_task, self.tail_task):
+                if task is not None:
+                    task.cancel()
+            for execution_id in list(self.subscriptions):
+                await self.unsubscribe(execution_id, notify=False)
+            logger.info(f"Multiplexed WebSocket disconnected, code: {close_code}")
+        except Exception as e:
+            logger.error(f"Error in multiplexed WebSocket disconnect: {e}")
+
+    async def receive(self, text_data):
+        """Handle subscribe/unsubscribe messages."""
+        try:
+            message = json.loads(text_data)
+            message_type = message.get('type')
+            execution_id = message.get('execution_id')
+
+            if not isinstance(execution_id, str) or not execution_id:
+                await self.send_error(None, 'Falta execution_id')
+            elif message_type == 'subscribe':
+                await self.subscribe(execution_id, message.get('mode', 'status'))
+            elif message_type == 'unsubscribe':
+                await self.unsubscribe(execution_id)
+            else:
+                await self.send_error(execution_id, f'Tipo de mensaje desconocido: {message_type}')
+
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON received on multiplexed connection")
+        except Exception as e:
+            logger.error(f"Error in multiplexed WebSocket receive: {e}")
+
+    async def subscribe(self, execution_id, mode):
+        if mode not in self.MODES:
+            await self.send_error(execution_id, f'Modo no válido: {mode}')
+            return
+
+        watched = self.subscriptions.get(execution_id)
+        if watched is None:
+            if len(self.subscriptions) >= self.MAX_SUBSCRIPTIONS:
+                await self.send_error(execution_id, f'Máximo de {self.MAX_SUBSCRIPTIONS} suscripciones por conexión')
+                return
+            if not await self.can_access(execution_id):
+                await self.send_error(execution_id, 'No tiene permisos para ver esta ejecución')
+                return
+
+            watched = WatchedExecution(mode, self.TAIL_LINES)
+            watched.subscription = await ExecutionManager.get_transport().subscribe(
+                f'execution_{execution_id}', ExecutionManager.is_local(execution_id), queue=self.events
+            )
+            self.subscriptions[execution_id] = watched
+            if self.events_task is None:
+                self.events_task = asyncio.create_task(self.consume_events())
+        else:
+            # Re-subscribing changes the mode
+            watched.mode = mode
+
+        if mode == 'tail' and self.tail_task is None:
+            self.tail_task = asyncio.create_task(self.flush_tails())
+
+        await self.send_event({
+            'type': 'subscribed',
+            'execution_id': execution_id,
+            'mode': mode,
+            **await self.current_status(execution_id)
+        })
+
+    async def unsubscribe(self, execution_id, notify=True):
+        watched = self.subscriptions.pop(execution_id, None)
+        if watched is not None:
+            await ExecutionManager.get_transport().unsubscribe(watched.subscription)
+        if notify:
+            await self.send_event({'type': 'unsubscribed', 'execution_id': execution_id})
+
+    async def consume_events(self):
+        """Dispatch events of every subscription to the handlers."""
+        while True:
+            event = await self.events.get()
+            try:
+                await getattr(self, get_handler_name(event))(event)
+            except Exception as e:
+                logger.error(f"Error handling {event.get('type')} event: {e}")
+
+    async def flush_tails(self):
+        """Send the latest lines of every tail subscription that has new output."""
+        try:
+            while True:
+                await asyncio.sleep(self.TAIL_INTERVAL)
+                for execution_id, watched in list(self.subscriptions.items()):
+                    if watched.dirty:
+                        await self.send_tail(execution_id, watched)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending execution tails: {e}")
+
+    async def send_tail(self, execution_id, watched):
+        watched.dirty = False
+        await self.send_event({
+            'type': 'execution_tail',
+            'execution_id': execution_id,
+            'seq': watched.seq,
+            'lines': list(watched.lines),
+        })
+
+    async def send_event(self, event):
+        await self.send(text_data=json.dumps(event))
+
+    async def forward(self, event):
+        """Send an execution event, serialized once for every connection of this process."""
+        await self.send(text_data=frame_cache.text(event))
+
+    async def send_error(self, execution_id, message):
+        await self.send_event({'type': 'error', 'execution_id': execution_id, 'message': message})
+
+    async def execution_output(self, event):
+        """Forward output according to the subscription mode."""
+        execution_id = event.get('execution_id')
+        watched = self.subscriptions.get(execution_id)
+        if watched is None:
+            return
+
+        if event.get('complete'):
+            if watched.mode == 'tail' and watched.dirty:
+                await self.send_tail(execution_id, watched)
+            await self.forward(event)
+        elif watched.mode == 'output':
+            await self.forward(event)
+        elif watched.mode == 'tail':
+            progress = set(event.get('progress', ()))
+            lines = event['lines'] if 'lines' in event else [event.get('output', '')]
+            watched.lines.extend(line for index, line in enumerate(lines) if index not in progress)
+            watched.seq = event.get('seq', watched.seq)
+            watched.dirty = True
+
+    async def execution_status(self, event):
+        """Forward execution status changes of watched executions."""
+        if event.get('execution_id') in self.subscriptions:
+            await self.forward(event)
+
+    async def execution_queue(self, event):
+        """Forward queue position updates of watched executions."""
+        if event.get('execution_id') in self.subscriptions:
+            await self.forward(event)
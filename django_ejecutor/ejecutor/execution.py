@@ -8,16 +8,31 @@ import uuid
 import subprocess
 import logging
 from datetime import datetime
-from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
 import sys
 import platform
 import shutil
 import signal
 import tempfile
+import threading
+import time
 import atexit
+import functools
 from pathlib import Path
 from django.conf import settings
+from django.core.files.storage import storages
+
+from . import chunks
+from .blobs import OutputBlobStore
+from .output import OutputDiscardedError, OutputStore, remove_stale_spill_files
+from .registry import ExecutionRegistry
+from .retention import LogArchiver
+from .scheduler import ExecutionScheduler, QueueFullError
+from . import search
+from .streams import LineSplitter, LiveViewLimiter, OutputBatcher, ReplayBuffer, utf8_size
+from .transport import GroupListener, OutputTransport
+from .wine import PrefixCloner, PrefixPool, wineserver_pool
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -25,19 +40,56 @@ logger = logging.getLogger(__name__)
 # Check if running on Windows for proper imports
 IS_WINDOWS = platform.system() == 'Windows'
 
+if not IS_WINDOWS:
+    from .terminal import PseudoTerminal
+
 # Virtual display configuration
 XVFB_DISPLAY = ":99"
 NOVNC_PORT = getattr(settings, 'NOVNC_PORT', 6080)
+VNC_PORT = 5900
+DISPLAY_POOL_BASE = getattr(settings, 'EXECUTOR_CONFIG', {}).get('DISPLAY_POOL_BASE', 100)
 
 class VirtualDisplay:
     """Manage virtual display for GUI applications."""
-    def __init__(self, display=XVFB_DISPLAY):
+    def __init__(self, display=XVFB_DISPLAY, vnc_port=VNC_PORT, novnc_port=NOVNC_PORT):
         self.display = display
+        self.vnc_port = vnc_port
+        self.novnc_port = novnc_port
         self.xvfb_process = None
         self.vnc_process = None
         self.novnc_process = None
         self.is_running = False
-        atexit.register(self.cleanup)
+        # Serializes restarts: the pool may start a display from several threads
+        self._start_lock = threading.Lock()
+
+    @property
+    def vnc_url(self):
+        if not self.novnc_process:
+            return None
+        return f'http://localhost:{self.novnc_port}/vnc.html'
+
+    def is_healthy(self):
+        return self.is_running and self.xvfb_process is not None and self.xvfb_process.poll() is None
+
+    def ensure_started(self):
+        """(Re)start the display unless it is already healthy. Blocking; call it off the event loop."""
+        with self._start_lock:
+            if not self.is_healthy():
+                self.cleanup()
+                self.start()
+        return self.is_running
+
+    def _wait_for_socket(self, timeout=5.0):
+        """Wait until Xvfb accepts connections on its Unix socket."""
+        socket_path = f"/tmp/.X11-unix/X{self.display.lstrip(':')}"
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.path.exists(socket_path):
+                return True
+            if self.xvfb_process.poll() is not None:
+                return False
+            time.sleep(0.05)
+        return False
 
     def start(self):
         """Start virtual display and VNC server."""
@@ -55,22 +107,24 @@ class VirtualDisplay:
                 'Xvfb', self.display, '-screen', '0', '1024x768x24', '-ac'
             ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             
-            # Wait a bit for Xvfb to start
-            asyncio.sleep(1)
+            # Wait for Xvfb to start
+            if not self._wait_for_socket():
+                raise RuntimeError(f"Xvfb did not start on {self.display}")
             
             # Start x11vnc if available
             if shutil.which('x11vnc'):
                 self.vnc_process = subprocess.Popen([
-                    'x11vnc', '-display', self.display, '-forever', '-nopw', '-quiet'
+                    'x11vnc', '-display', self.display, '-rfbport', str(self.vnc_port),
+                    '-forever', '-shared', '-nopw', '-quiet'
                 ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             
             # Start noVNC if available
-            if shutil.which('websockify'):
+            if self.vnc_process and shutil.which('websockify'):
                 novnc_path = "/usr/share/novnc"
                 if os.path.exists(novnc_path):
                     self.novnc_process = subprocess.Popen([
                         'websockify', '--web', novnc_path,
-                        str(NOVNC_PORT), 'localhost:5900'
+                        str(self.novnc_port), f'localhost:{self.vnc_port}'
                     ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             
             self.is_running = True
@@ -90,33 +144,110 @@ class VirtualDisplay:
                         process.wait(timeout=5)
                     except subprocess.TimeoutExpired:
                         process.kill()
+            self.xvfb_process = self.vnc_process = self.novnc_process = None
             self.is_running = False
-            logger.info("Virtual display cleaned up")
+            logger.info(f"Virtual display {self.display} cleaned up")
         except Exception as e:
             logger.error(f"Error cleaning up virtual display: {e}")
 
-# Global virtual display manager
-virtual_display = VirtualDisplay()
+class DisplayUnavailableError(RuntimeError):
+    """Raised when an execution cannot get a virtual display of its own."""
 
-# Check if wine is available on Linux
-WINE_AVAILABLE = False if IS_WINDOWS else bool(shutil.which('wine'))
+class DisplayPool:
+    """
+    Pool of virtual displays, each leased to a single execution.
 
-# Set up environment variables for WINE
-if not IS_WINDOWS and WINE_AVAILABLE:
-    wine_prefix = getattr(settings, 'WINE_PREFIX', os.path.expanduser('~/.wine'))
-    wine_arch = getattr(settings, 'WINE_ARCH', 'win64')
-    
-    os.environ['WINEARCH'] = wine_arch
-    os.environ['WINEPREFIX'] = wine_prefix
-    os.environ['WINEDEBUG'] = '-all'
-    
-    # Ensure Wine prefix exists
-    if not os.path.exists(wine_prefix):
-        logger.info("Initializing Wine prefix...")
-        try:
-            subprocess.run(['winecfg'], check=True, timeout=30)
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-            logger.warning(f"Wine initialization warning: {e}")
+    Display ``:base+n`` is paired with x11vnc on ``VNC_PORT+n`` and websockify
+    on ``NOVNC_PORT+n``. ``warm_spares`` idle displays are kept started so a
+    lease does not wait for Xvfb. A pool of size 0 is disabled: executions
+    run without any display.
+    """
+    def __init__(self, size, warm_spares=1, base=DISPLAY_POOL_BASE):
+        self.displays = [
+            VirtualDisplay(f':{base + n}', vnc_port=VNC_PORT + n, novnc_port=NOVNC_PORT + n)
+            for n in range(max(0, int(size)))
+        ]
+        self.warm_spares = max(0, min(int(warm_spares), len(self.displays)))
+        self._leases = {}
+        self._lock = threading.Lock()
+        # Checked once: without Xvfb there is nothing to start or warm
+        self.available = bool(self.displays) and not IS_WINDOWS and shutil.which('Xvfb') is not None
+        atexit.register(self.cleanup)
+
+    @property
+    def enabled(self):
+        return bool(self.displays)
+
+    @property
+    def is_running(self):
+        return any(display.is_running for display in self.displays)
+
+    def _idle(self):
+        leased = set(map(id, self._leases.values()))
+        return [display for display in self.displays if id(display) not in leased]
+
+    def ensure_spares(self):
+        """Start idle displays until ``warm_spares`` of them are ready."""
+        if not self.available:
+            return
+        with self._lock:
+            idle = self._idle()
+        ready = [display for display in idle if display.is_healthy()]
+        for display in idle:
+            if len(ready) >= self.warm_spares:
+                break
+            if not display.is_healthy() and display.ensure_started():
+                ready.append(display)
+
+    def has_spares(self):
+        """Whether ``warm_spares`` idle displays are already running. Non-blocking."""
+        with self._lock:
+            idle = self._idle()
+        return sum(1 for display in idle if display.is_healthy()) >= self.warm_spares
+
+    def lease(self, execution_id):
+        """
+        Lease a display to an execution, starting it if needed.
+
+        Returns None when every display is leased.
+
+        Raises:
+            DisplayUnavailableError: if Xvfb is not installed or the display does not start
+        """
+        if not self.available:
+            raise DisplayUnavailableError("Xvfb no está instalado: no hay pantalla virtual para la ejecución")
+        with self._lock:
+            idle = self._idle()
+            # Prefer an already running display
+            idle.sort(key=lambda display: not display.is_healthy())
+            if not idle:
+                return None
+            display = idle[0]
+            self._leases[execution_id] = display
+
+        if not display.ensure_started():
+            self.release(execution_id)
+            raise DisplayUnavailableError(f"No se pudo iniciar la pantalla virtual {display.display}")
+        return display
+
+    def get(self, execution_id):
+        return self._leases.get(execution_id)
+
+    def release(self, execution_id):
+        """Return a leased display to the pool."""
+        with self._lock:
+            display = self._leases.pop(execution_id, None)
+        if display and not display.is_healthy():
+            display.cleanup()
+
+    def cleanup(self):
+        """Stop every display on exit."""
+        for display in self.displays:
+            display.cleanup()
+
+# Wine runtime state, resolved lazily by ExecutionManager.initialize()
+WINE_AVAILABLE = False
+WINE_ENV = {}
 
 class ExecutionManager:
     """Manager for executable file execution with real-time output streaming."""
@@ -124,14 +255,289 @@ class ExecutionManager:
     NOVNC_PORT = NOVNC_PORT
     MAX_EXECUTION_TIME = getattr(settings, 'EXECUTOR_CONFIG', {}).get('MAX_EXECUTION_TIME', 30)
     MAX_OUTPUT_SIZE = getattr(settings, 'EXECUTOR_CONFIG', {}).get('MAX_OUTPUT_SIZE', 1024 * 1024)
-    
+    MAX_CONCURRENT_EXECUTIONS = getattr(settings, 'EXECUTOR_CONFIG', {}).get('MAX_CONCURRENT_EXECUTIONS', 4)
+    MAX_QUEUED_EXECUTIONS = getattr(settings, 'EXECUTOR_CONFIG', {}).get('MAX_QUEUED_EXECUTIONS', 20)
+    QUEUE_RETRY_AFTER = getattr(settings, 'EXECUTOR_CONFIG', {}).get('QUEUE_RETRY_AFTER', 10)
+    WINESERVER_WARM_POOL = getattr(settings, 'EXECUTOR_CONFIG', {}).get('WINESERVER_WARM_POOL', True)
+    ISOLATED_PREFIXES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('ISOLATED_PREFIXES', False)
+    READ_CHUNK_SIZE = getattr(settings, 'EXECUTOR_CONFIG', {}).get('READ_CHUNK_SIZE', 64 * 1024)
+    MAX_LINE_LENGTH = getattr(settings, 'EXECUTOR_CONFIG', {}).get('MAX_LINE_LENGTH', 16 * 1024)
+    # Idle time after which an unfinished line of an interactive run (a prompt) is shown
+    PTY_PROMPT_DELAY = getattr(settings, 'EXECUTOR_CONFIG', {}).get('PTY_PROMPT_DELAY', 0.2)
+    OUTPUT_BATCH_MAX_LINES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_BATCH_MAX_LINES', 500)
+    OUTPUT_BATCH_MAX_BYTES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_BATCH_MAX_BYTES', 64 * 1024)
+    OUTPUT_BATCH_MAX_DELAY = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_BATCH_MAX_DELAY', 0.05)
+    OUTPUT_TAIL_BYTES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_TAIL_BYTES', 64 * 1024)
+    OUTPUT_SPILL_DIR = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_SPILL_DIR') or \
+        os.path.join(settings.MEDIA_ROOT, 'execution_output')
+    # Stored output of finished runs: compressed blobs in a Django storage backend
+    OUTPUT_STORAGE = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_STORAGE', 'default')
+    OUTPUT_CODEC = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_CODEC', 'gzip')
+    OUTPUT_SEGMENT_SIZE = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_SEGMENT_SIZE', 256 * 1024)
+    # Output persisted as ExecutionOutputChunk rows while a run is in progress
+    OUTPUT_CHUNK_FLUSH_LINES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_CHUNK_FLUSH_LINES', 500)
+    OUTPUT_CHUNK_FLUSH_INTERVAL = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_CHUNK_FLUSH_INTERVAL', 0.5)
+    OUTPUT_CHUNK_MAX_BYTES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_CHUNK_MAX_BYTES', 64 * 1024)
+    OUTPUT_CHUNK_MAX_RETRIES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_CHUNK_MAX_RETRIES', 5)
+    # Leading part of each output added to the full-text index
+    SEARCH_INDEX_MAX_BYTES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('SEARCH_INDEX_MAX_BYTES', 1024 * 1024)
+    # Retention of execution logs: archived after N days (None = kept forever,
+    # unless the executable sets its own period) every LOG_RETENTION_INTERVAL seconds by
+    # manage.py archive_execution_logs --loop
+    LOG_RETENTION_DAYS = getattr(settings, 'EXECUTOR_CONFIG', {}).get('LOG_RETENTION_DAYS', None)
+    LOG_RETENTION_ARCHIVE = getattr(settings, 'EXECUTOR_CONFIG', {}).get('LOG_RETENTION_ARCHIVE', True)
+    LOG_RETENTION_BATCH_SIZE = getattr(settings, 'EXECUTOR_CONFIG', {}).get('LOG_RETENTION_BATCH_SIZE', 500)
+    LOG_RETENTION_BATCH_PAUSE = getattr(settings, 'EXECUTOR_CONFIG', {}).get('LOG_RETENTION_BATCH_PAUSE', 0.05)
+    LOG_RETENTION_INTERVAL = getattr(settings, 'EXECUTOR_CONFIG', {}).get('LOG_RETENTION_INTERVAL', 6 * 3600)
+    LOG_ARCHIVE_SEGMENT_LOGS = getattr(settings, 'EXECUTOR_CONFIG', {}).get('LOG_ARCHIVE_SEGMENT_LOGS', 10000)
+    REPLAY_MAX_BATCHES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('REPLAY_MAX_BATCHES', 1000)
+    REPLAY_MAX_BYTES = getattr(settings, 'EXECUTOR_CONFIG', {}).get('REPLAY_MAX_BYTES', 1024 * 1024)
+    REPLAY_RETENTION = getattr(settings, 'EXECUTOR_CONFIG', {}).get('REPLAY_RETENTION', 60)
+    OUTPUT_TRANSPORT = getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_TRANSPORT', 'hybrid')
+    # Seconds a run waits for a free virtual display before failing
+    DISPLAY_LEASE_TIMEOUT = getattr(settings, 'EXECUTOR_CONFIG', {}).get('DISPLAY_LEASE_TIMEOUT', 60.0)
+
+    _prefix_pool = None
+    _transport = None
+    _output_blobs = None
+    _log_archiver = None
+    # Shared task warming spare displays; concurrent callers await the same one
+    _display_ready = None
+    _display_pool = None
+    _initialized = False
+    _init_lock = threading.Lock()
+
+    _scheduler = None
+    registry = ExecutionRegistry()
+    # Output stores of executions being run or persisted, by execution ID
+    outputs = {}
+    # Recent output batches for reconnecting clients, by execution ID
+    replays = {}
+
+    @classmethod
+    def initialize(cls):
+        """
+        Resolve Wine and prepare the base prefix. Idempotent and thread-safe.
+
+        Runs on first use rather than at import time, so importing this module
+        stays cheap for every worker and manage.py command. It may block for up
+        to 30s on a node without a prefix, so call it off the event loop.
+        """
+        global WINE_AVAILABLE
+        if cls._initialized:
+            return
+
+        with cls._init_lock:
+            if cls._initialized:
+                return
+
+            # Output of runs interrupted by a crash of a previous process
+            remove_stale_spill_files(cls.OUTPUT_SPILL_DIR)
+
+            WINE_AVAILABLE = False if IS_WINDOWS else bool(shutil.which('wine'))
+
+            if WINE_AVAILABLE:
+                wine_prefix = getattr(settings, 'WINE_PREFIX', os.path.expanduser('~/.wine'))
+                WINE_ENV.update({
+                    'WINEARCH': getattr(settings, 'WINE_ARCH', 'win64'),
+                    'WINEPREFIX': wine_prefix,
+                    'WINEDEBUG': '-all',
+                })
+
+                # Ensure Wine prefix exists
+                if not os.path.exists(wine_prefix):
+                    logger.info("Initializing Wine prefix...")
+                    try:
+                        subprocess.run(['wineboot', '--init'], env={**os.environ, **WINE_ENV},
+                                       check=True, timeout=30)
+                    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                        logger.warning(f"Wine initialization warning: {e}")
+
+            cls._initialized = True
+
+    @classmethod
+    def get_display_pool(cls):
+        """Return the virtual display pool, creating it on first use."""
+        if cls._display_pool is None:
+            config = getattr(settings, 'EXECUTOR_CONFIG', {})
+            cls._display_pool = DisplayPool(
+                size=config.get('DISPLAY_POOL_SIZE', cls.MAX_CONCURRENT_EXECUTIONS),
+                warm_spares=config.get('DISPLAY_WARM_SPARES', 1),
+            )
+        return cls._display_pool
+
+    @classmethod
+    def get_scheduler(cls):
+        """Return the process-wide execution scheduler, creating it on first use."""
+        if cls._scheduler is None:
+            cls._scheduler = ExecutionScheduler(
+                max_concurrent=cls.MAX_CONCURRENT_EXECUTIONS,
+                max_queued=cls.MAX_QUEUED_EXECUTIONS,
+                notify=cls._notify_queue_position,
+                retry_after=cls.QUEUE_RETRY_AFTER,
+            )
+        return cls._scheduler
+
+    @classmethod
+    def get_prefix_pool(cls):
+        """Return the pool of per-execution Wine prefix clones, creating it on first use."""
+        if cls._prefix_pool is None:
+            config = getattr(settings, 'EXECUTOR_CONFIG', {})
+            golden = getattr(settings, 'WINE_PREFIX', os.path.expanduser('~/.wine'))
+            cloner = PrefixCloner(
+                golden,
+                config.get('WINE_PREFIX_CLONES_DIR') or f'{golden.rstrip(os.sep)}-clones',
+                strategy=config.get('WINE_PREFIX_CLONE_STRATEGY', 'auto'),
+            )
+            cls._prefix_pool = PrefixPool(
+                cloner,
+                wineserver_pool,
+                warm_spares=config.get('WINE_PREFIX_WARM_SPARES', 1),
+                policy=config.get('WINE_PREFIX_POLICY', 'discard'),
+                arch=getattr(settings, 'WINE_ARCH', 'win64'),
+            )
+        return cls._prefix_pool
+
+    @classmethod
+    def get_transport(cls):
+        """Return the transport that delivers execution events to consumers."""
+        if cls._transport is None:
+            cls._transport = OutputTransport(cls.OUTPUT_TRANSPORT)
+        return cls._transport
+
+    @classmethod
+    def get_output_blobs(cls):
+        """Return the store of compressed output of finished executions."""
+        if cls._output_blobs is None:
+            cls._output_blobs = OutputBlobStore(
+                storage=storages[cls.OUTPUT_STORAGE],
+                codec=cls.OUTPUT_CODEC,
+                segment_size=cls.OUTPUT_SEGMENT_SIZE,
+            )
+        return cls._output_blobs
+
+    @classmethod
+    def get_log_archiver(cls):
+        """Return the archiver applying the retention policy to execution logs."""
+        if cls._log_archiver is None:
+            cls._log_archiver = LogArchiver(
+                OutputBlobStore(
+                    storage=storages[cls.OUTPUT_STORAGE],
+                    codec=cls.OUTPUT_CODEC,
+                    segment_size=cls.OUTPUT_SEGMENT_SIZE,
+                    location='execution_logs/archive',
+                    suffix='.ndjson',
+                ),
+                cls.get_output_blobs(),
+                assemble=cls.assemble_output,
+                default_days=cls.LOG_RETENTION_DAYS,
+                archive=cls.LOG_RETENTION_ARCHIVE,
+                batch_size=cls.LOG_RETENTION_BATCH_SIZE,
+                batch_pause=cls.LOG_RETENTION_BATCH_PAUSE,
+                segment_logs=cls.LOG_ARCHIVE_SEGMENT_LOGS,
+            )
+        return cls._log_archiver
+
     @staticmethod
-    def ensure_virtual_display():
-        """Ensure virtual display is running."""
-        if not IS_WINDOWS and not virtual_display.is_running:
-            virtual_display.start()
-            if virtual_display.is_running:
-                os.environ['DISPLAY'] = XVFB_DISPLAY
+    def find_log(execution_id, fields=None):
+        """
+        Return the ExecutionLog of an execution (only ``fields`` if given), or
+        None. Archived logs are read back from their archive, unsaved and whole.
+        """
+        from .models import ExecutionLog
+
+        logs = ExecutionLog.objects.filter(execution_uuid=execution_id)
+        if fields:
+            logs = logs.only(*fields)
+        log = logs.first()
+        if log is None:
+            log = ExecutionManager.get_log_archiver().load(execution_id)
+        return log
+
+    @staticmethod
+    def is_active(execution_id):
+        """Whether an execution is queued or running in this process."""
+        scheduler = ExecutionManager.get_scheduler()
+        return scheduler.is_running(execution_id) or bool(scheduler.position(execution_id))
+
+    @staticmethod
+    def is_local(execution_id):
+        """Whether an execution is queued, running or recently finished in this process."""
+        return execution_id in ExecutionManager.replays or ExecutionManager.is_active(execution_id)
+
+    @staticmethod
+    async def publish(execution_id, event):
+        """Send an event, tagged with its execution ID, to the consumers of an execution."""
+        event['execution_id'] = execution_id
+        await ExecutionManager.get_transport().publish(f'execution_{execution_id}', event)
+
+    @staticmethod
+    async def _notify_queue_position(execution_id, position, queued):
+        """Send the current queue position of an execution to its WebSocket group."""
+        try:
+            await ExecutionManager.publish(execution_id, {
+                'type': 'execution_queue',
+                'position': position,
+                'queued': queued,
+                'message': (f'En cola: posición {position} de {queued}' if position
+                            else 'Saliendo de la cola, iniciando ejecución'),
+            })
+        except Exception as e:
+            logger.error(f"Error sending queue position: {e}")
+
+    @classmethod
+    def warm_virtual_displays(cls):
+        """
+        Start warming spare displays in a worker thread and return the task doing it.
+
+        Starting Xvfb, x11vnc and websockify blocks, so it never runs on the event
+        loop. While a warm-up is in flight every caller gets the same task, so only
+        one of them spawns processes; once it finishes the next call checks the
+        pool again. Must be called from the event loop.
+        """
+        if cls._display_ready is None or cls._display_ready.done():
+            pool = cls.get_display_pool()
+            if not pool.available or pool.has_spares():
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(None)
+                return future
+            cls._display_ready = asyncio.ensure_future(asyncio.to_thread(pool.ensure_spares))
+        return cls._display_ready
+
+    @staticmethod
+    async def lease_display(execution_id):
+        """
+        Lease a virtual display to an execution, waiting up to
+        DISPLAY_LEASE_TIMEOUT seconds for one to be released when all are in
+        use. Returns None if the display pool is disabled.
+
+        Raises:
+            DisplayUnavailableError: if no display could be leased
+        """
+        pool = ExecutionManager.get_display_pool()
+        if not pool.enabled:
+            return None
+        deadline = time.monotonic() + ExecutionManager.DISPLAY_LEASE_TIMEOUT
+        waiting = False
+        while True:
+            display = await asyncio.to_thread(pool.lease, execution_id)
+            if display is not None:
+                return display
+            if time.monotonic() >= deadline:
+                raise DisplayUnavailableError(
+                    f"Todas las pantallas virtuales ({len(pool.displays)}) siguen ocupadas tras "
+                    f"{ExecutionManager.DISPLAY_LEASE_TIMEOUT:g} s de espera"
+                )
+            if not waiting:
+                logger.info(f"Display pool exhausted, execution {execution_id} waits for a display")
+                waiting = True
+            await asyncio.sleep(0.25)
+
+    @staticmethod
+    async def ensure_virtual_display():
+        """Wait until the display pool has warm spare displays ready to lease."""
+        # Shield the shared task: a caller giving up must not cancel it for the others
+        await asyncio.shield(ExecutionManager.warm_virtual_displays())
 
     @staticmethod
     def validate_executable(executable_path):
@@ -158,7 +564,8 @@ class ExecutionManager:
         return True
 
     @staticmethod
-    def execute_file_async(executable_path, arguments=None, execution_id=None):
+    def execute_file_async(executable_path, arguments=None, execution_id=None, live_view=None,
+                           interactive=False):
         """
         Execute a file asynchronously and stream output in real-time.
 
@@ -166,9 +573,15 @@ class ExecutionManager:
             executable_path: Path to the executable file
             arguments: Command line arguments as string
             execution_id: Unique ID for this execution
+            live_view: LiveViewLimiter options (policy, max_rate, interval); full by default
+            interactive: run attached to a pseudo-terminal that accepts stdin (POSIX only)
+
+        Must be called from the event loop that runs the executions. The run is
+        admitted through the scheduler, so it may wait in the queue before starting.
 
         Returns:
-            dict: execution info including ID and VNC URL
+            dict: execution info including ID and status ('started', 'queued',
+            'rejected' or 'error')
         """
         if execution_id is None:
             execution_id = str(uuid.uuid4())
@@ -177,24 +590,35 @@ class ExecutionManager:
             # Validate executable
             ExecutionManager.validate_executable(executable_path)
             
-            # Ensure virtual display is running for GUI applications
-            ExecutionManager.ensure_virtual_display()
+            # Warm a display for GUI applications in the background; lease() waits if needed
+            ExecutionManager.warm_virtual_displays()
 
-            # Start async execution
-            asyncio.create_task(ExecutionManager._execute_and_stream(
-                executable_path, arguments, execution_id
-            ))
+            # Admit the execution; it starts now or waits for a free slot
+            position = ExecutionManager.get_scheduler().submit(
+                execution_id,
+                lambda: ExecutionManager._execute_and_persist(
+                    executable_path, arguments, execution_id, live_view, interactive
+                )
+            )
 
             result = {
                 'execution_id': execution_id,
-                'status': 'started'
+                'status': 'queued' if position else 'started'
             }
-            
-            # Add VNC URL only if not on Windows and virtual display is running
-            if not IS_WINDOWS and virtual_display.is_running:
-                result['vnc_url'] = f'http://localhost:{NOVNC_PORT}/vnc.html'
+            if position:
+                result['queue_position'] = position
             
             return result
+
+        except QueueFullError as e:
+            logger.warning(f"Execution {execution_id} rejected: {e}")
+            return {
+                'execution_id': execution_id,
+                'status': 'rejected',
+                'error': str(e),
+                'code': 429,
+                'retry_after': e.retry_after
+            }
             
         except Exception as e:
             logger.error(f"Error starting execution: {e}")
@@ -205,29 +629,97 @@ class ExecutionManager:
             }
 
     @staticmethod
-    async def _execute_and_stream(executable_path, arguments, execution_id):
+    def start_execution(executable, arguments, user, ip_address=None):
+        """
+        Register and submit an execution of an ExecutableFile from synchronous code.
+
+        Returns:
+            str: the execution ID
+
+        Raises:
+            QueueFullError: if the admission queue is full
+        """
+        from .models import ExecutionLog
+
+        execution_id = str(uuid.uuid4())
+        log = ExecutionLog.objects.create(
+            execution_uuid=execution_id,
+            executable=executable,
+            user=user if user and user.is_authenticated else None,
+            ip_address=ip_address,
+            is_realtime=True,
+        )
+
+        async def submit():
+            return ExecutionManager.execute_file_async(
+                executable.get_full_path(), arguments, execution_id,
+                live_view=executable.live_view_options(),
+                interactive=executable.interactive
+            )
+
+        result = async_to_sync(submit)()
+
+        if result['status'] == 'rejected':
+            log.delete()
+            raise QueueFullError(
+                ExecutionManager.get_scheduler().queued_count,
+                ExecutionManager.MAX_QUEUED_EXECUTIONS,
+                result.get('retry_after')
+            )
+        if result['status'] == 'error':
+            log.success = False
+            log.completed = True
+            log.exit_code = -1
+            ExecutionManager._store_output(log, text=result['error'])
+            log.save(update_fields=['success', 'completed', 'exit_code',
+                                    'output_path', 'output_bytes', 'output_lines'])
+
+        return execution_id
+
+    @staticmethod
+    async def _execute_and_stream(executable_path, arguments, execution_id, output, live_view=None,
+                                  interactive=False):
         """
         Execute the file and stream output via WebSockets.
+
+        Output lines are appended to ``output``, an OutputStore, in full; the
+        live stream is thinned according to ``live_view`` (LiveViewLimiter options).
+        With ``interactive`` the process runs on a pseudo-terminal: stdout and
+        stderr arrive merged as STDOUT, and input is written with ``write_stdin``.
+
+        Returns:
+            dict with 'success' and 'exit_code'. The output stays in ``output``
+            and is never loaded whole; 'output' only carries the message of a
+            run that failed before or while starting.
         """
-        channel_layer = get_channel_layer()
-        group_name = f'execution_{execution_id}'
-        
         # Track output size
         total_output_size = 0
         max_output_size = ExecutionManager.MAX_OUTPUT_SIZE
 
+        replay = ExecutionManager.replays.get(execution_id)
+
         async def send_message(message_type, **kwargs):
             """Helper to send messages to WebSocket group."""
+            if replay is not None and message_type == 'execution_output' and kwargs.get('complete'):
+                replay.final = {'type': message_type, **kwargs}
             try:
-                await channel_layer.group_send(group_name, {
+                await ExecutionManager.publish(execution_id, {
                     'type': message_type,
                     **kwargs
                 })
             except Exception as e:
                 logger.error(f"Error sending WebSocket message: {e}")
 
+        prefix_clone = None
+        display = None
+        terminal = None
+        running = None
+        success = False
+
         # Prepare command based on platform
         try:
+            await asyncio.to_thread(ExecutionManager.initialize)
+
             if IS_WINDOWS:
                 cmd = [executable_path]
                 env = os.environ.copy()
@@ -235,20 +727,49 @@ class ExecutionManager:
             else:
                 if not WINE_AVAILABLE:
                     error_msg = "Wine no está instalado. No se pueden ejecutar archivos .exe en Linux"
+                    output.append(error_msg)
                     await send_message('execution_output', 
                                      output=f"ERROR: {error_msg}",
                                      complete=True, success=False, exit_code=-1)
                     return {'success': False, 'output': error_msg, 'exit_code': -1}
                 
+                wineprefix = WINE_ENV.get('WINEPREFIX', os.path.expanduser('~/.wine'))
+
+                # Private copy-on-write prefix so concurrent runs do not share state
+                if ExecutionManager.ISOLATED_PREFIXES:
+                    prefix_pool = ExecutionManager.get_prefix_pool()
+                    if prefix_pool.available():
+                        try:
+                            prefix_clone = await prefix_pool.acquire(execution_id)
+                            wineprefix = prefix_clone.path
+                        except Exception as e:
+                            logger.warning(f"Could not clone Wine prefix, using shared prefix: {e}")
+                    else:
+                        logger.warning(f"Golden Wine prefix {prefix_pool.cloner.golden} not found, using shared prefix")
+
+                # Lease a private display so GUI apps do not draw over each other
+                display = await ExecutionManager.lease_display(execution_id)
+
                 cmd = ['wine', executable_path]
                 env = {
                     **os.environ,
+                    **WINE_ENV,
                     'WINEDEBUG': '-all',
-                    'DISPLAY': os.environ.get('DISPLAY', ':0'),
-                    'WINEPREFIX': os.environ.get('WINEPREFIX', os.path.expanduser('~/.wine'))
+                    'WINEPREFIX': wineprefix
                 }
+                # Never the display of the host: with the pool disabled there is none
+                env.pop('DISPLAY', None)
+                if display is not None:
+                    env['DISPLAY'] = display.display
                 creation_flags = 0
 
+                # Reuse a warm wineserver instead of cold-starting one per run
+                if ExecutionManager.WINESERVER_WARM_POOL and wineserver_pool.available():
+                    try:
+                        await wineserver_pool.ensure(env['WINEPREFIX'], env.get('WINEARCH'))
+                    except Exception as e:
+                        logger.warning(f"Persistent wineserver unavailable, cold start: {e}")
+
             # Add arguments if provided
             if arguments:
                 if isinstance(arguments, str):
@@ -257,100 +778,175 @@ class ExecutionManager:
                     cmd.extend(arguments)
 
             # Send initial status
+            status_extra = {'vnc_url': display.vnc_url} if display and display.vnc_url else {}
             await send_message('execution_status', 
                              status='starting',
-                             message=f'Iniciando ejecución de {os.path.basename(executable_path)}')
+                             message=f'Iniciando ejecución de {os.path.basename(executable_path)}',
+                             **status_extra)
 
             logger.info(f"Executing command: {' '.join(cmd)}")
 
+            if interactive and IS_WINDOWS:
+                logger.warning(f"Interactive mode is not available on Windows, running {execution_id} with pipes")
+                interactive = False
+
+            if interactive:
+                # The pty becomes the controlling terminal of a new session
+                terminal = PseudoTerminal()
+                cmd = terminal.command(cmd)
+                stdio = {'stdin': terminal.slave, 'stdout': terminal.slave, 'stderr': terminal.slave,
+                         'start_new_session': True}
+                env['TERM'] = env.get('TERM') or 'xterm'
+            else:
+                # Without a terminal nothing can answer a prompt: let reads hit EOF instead of hanging
+                stdio = {'stdin': asyncio.subprocess.DEVNULL,
+                         'stdout': asyncio.subprocess.PIPE, 'stderr': asyncio.subprocess.PIPE,
+                         # Own session so the whole tree can be killed at once
+                         'start_new_session': not IS_WINDOWS}
+
             # Execute the command with timeout
             process = await asyncio.wait_for(
                 asyncio.create_subprocess_exec(
                     *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
                     env=env,
-                    creationflags=creation_flags if IS_WINDOWS else 0
+                    creationflags=creation_flags if IS_WINDOWS else 0,
+                    **stdio
                 ),
                 timeout=10  # Timeout for process creation
             )
+            running = ExecutionManager.registry.register(
+                execution_id, process, wineprefix=env.get('WINEPREFIX')
+            )
+            running.display = display
+            if terminal is not None:
+                terminal.spawned()
+                running.terminal = terminal
 
             await send_message('execution_status', 
                              status='running', 
                              message='Proceso iniciado')
 
-            output_buffer = []
+            async def send_batch(lines, progress, seq):
+                extra = {'progress': progress} if progress else {}
+                if replay is not None:
+                    replay.append(seq, {'type': 'execution_output', 'lines': lines, 'seq': seq, **extra},
+                                  sum(map(utf8_size, lines)))
+                await send_message('execution_output', lines=lines, seq=seq, **extra)
+
+            # Coalesce lines into one message per size threshold or latency deadline
+            batcher = OutputBatcher(
+                send_batch,
+                max_lines=ExecutionManager.OUTPUT_BATCH_MAX_LINES,
+                max_bytes=ExecutionManager.OUTPUT_BATCH_MAX_BYTES,
+                max_delay=ExecutionManager.OUTPUT_BATCH_MAX_DELAY,
+            )
+            # Live fan-out policy of the executable; storage below is unaffected
+            live = LiveViewLimiter(batcher, **(live_view or {}))
             
-            async def read_stream(stream, prefix):
-                """Read and stream output from subprocess."""
+            async def read_stream(stream, prefix, prompt_delay=None):
+                """
+                Read subprocess output in chunks and stream it line by line. With
+                ``prompt_delay``, an unfinished line left idle that long (a prompt
+                waiting for input) is shown as a progress update of the line.
+                """
                 nonlocal total_output_size
-                
+                splitter = LineSplitter(ExecutionManager.MAX_LINE_LENGTH)
+
                 while True:
                     try:
-                        line = await asyncio.wait_for(stream.readline(), timeout=1.0)
-                        if not line:
-                            break
-                            
-                        decoded_line = line.decode('utf-8', errors='replace').rstrip()
-                        if not decoded_line:
-                            continue
-                            
-                        # Check output size limit
-                        line_size = len(decoded_line.encode('utf-8'))
-                        if total_output_size + line_size > max_output_size:
-                            truncation_msg = f"\n[OUTPUT TRUNCADO - Límite de {max_output_size} bytes alcanzado]"
-                            output_buffer.append(truncation_msg)
-                            await send_message('execution_output', output=truncation_msg)
+                        if prompt_delay and splitter.pending:
+                            try:
+                                chunk = await asyncio.wait_for(
+                                    stream.read(ExecutionManager.READ_CHUNK_SIZE), prompt_delay
+                                )
+                            except asyncio.TimeoutError:
+                                prompt = splitter.pending.decode('utf-8', errors='replace').rstrip()
+                                if prompt:
+                                    await live.add(f"{prefix}: {prompt}", progress=True, key=prefix)
+                                chunk = await stream.read(ExecutionManager.READ_CHUNK_SIZE)
+                        else:
+                            chunk = await stream.read(ExecutionManager.READ_CHUNK_SIZE)
+                        lines = splitter.feed(chunk) if chunk else splitter.flush()
+
+                        for raw_line, progress in lines:
+                            decoded_line = raw_line.decode('utf-8', errors='replace').rstrip()
+                            if not decoded_line:
+                                continue
+
+                            # Check output size limit
+                            line_size = len(raw_line)
+                            if total_output_size + line_size > max_output_size:
+                                truncation_msg = f"\n[OUTPUT TRUNCADO - Límite de {max_output_size} bytes alcanzado]"
+                                output.append(truncation_msg)
+                                await live.add(truncation_msg, always=True)
+                                return
+
+                            formatted_line = f"{prefix}: {decoded_line}"
+                            if progress:
+                                # Progress updates are shown live but not stored
+                                await live.add(formatted_line, progress=True, key=prefix)
+                                continue
+
+                            total_output_size += line_size
+                            output.append(formatted_line)
+                            await live.add(formatted_line, key=prefix)
+
+                        if not chunk:
                             break
-                            
-                        total_output_size += line_size
-                        formatted_line = f"{prefix}: {decoded_line}"
-                        output_buffer.append(formatted_line)
-
-                        await send_message('execution_output', output=formatted_line)
-                        
-                    except asyncio.TimeoutError:
-                        continue
+
                     except Exception as e:
                         logger.error(f"Error reading stream: {e}")
                         break
 
-            # Create tasks to read both stdout and stderr
-            stdout_task = asyncio.create_task(read_stream(process.stdout, "STDOUT"))
-            stderr_task = asyncio.create_task(read_stream(process.stderr, "STDERR"))
+            if terminal is not None:
+                # A terminal carries both streams; wine helpers may keep it open after exit
+                reader_tasks = [
+                    asyncio.create_task(read_stream(terminal.reader, "STDOUT", ExecutionManager.PTY_PROMPT_DELAY)),
+                    asyncio.create_task(ExecutionManager._close_terminal_on_exit(process, terminal)),
+                ]
+            else:
+                # Create tasks to read both stdout and stderr
+                reader_tasks = [
+                    asyncio.create_task(read_stream(process.stdout, "STDOUT")),
+                    asyncio.create_task(read_stream(process.stderr, "STDERR")),
+                ]
+            running.reader_tasks = reader_tasks
 
             try:
                 # Wait for process completion with timeout
                 await asyncio.wait_for(
-                    asyncio.gather(stdout_task, stderr_task, return_exceptions=True),
+                    asyncio.gather(*reader_tasks, return_exceptions=True),
                     timeout=ExecutionManager.MAX_EXECUTION_TIME
                 )
                 
                 exit_code = await asyncio.wait_for(process.wait(), timeout=5)
-                success = exit_code == 0
+                success = exit_code == 0 and not running.cancelled
 
             except asyncio.TimeoutError:
-                # Kill the process if it times out
-                try:
-                    process.terminate()
-                    await asyncio.wait_for(process.wait(), timeout=5)
-                except asyncio.TimeoutError:
-                    process.kill()
-                    await process.wait()
-                
+                # Kill the whole process tree if it times out
+                await ExecutionManager.registry.kill(execution_id)
+                await process.wait()
+                await live.flush()
+
                 timeout_msg = f'Ejecución cancelada por timeout ({ExecutionManager.MAX_EXECUTION_TIME}s)'
-                output_buffer.append(timeout_msg)
-                await send_message('execution_output', 
-                                 output=timeout_msg,
-                                 complete=True, success=False, exit_code=-1)
-                return {'success': False, 'output': '\n'.join(output_buffer), 'exit_code': -1}
-
-            # Send final results
-            final_output = '\n'.join(output_buffer)
-            
-            await send_message('execution_output',
-                             output=final_output,
-                             complete=True, success=success, exit_code=exit_code)
+                output.append(timeout_msg)
+                await live.add(timeout_msg, always=True)
+                await live.flush()
+
+                await send_message('execution_output', complete=True, success=False, exit_code=-1,
+                                 **ExecutionManager._output_summary(output, batcher.seq, live))
+                return {'success': False, 'exit_code': -1}
+
+            if running.cancelled:
+                cancel_msg = 'Ejecución cancelada por el usuario'
+                output.append(cancel_msg)
+                await live.add(cancel_msg, always=True)
+
+            await live.flush()
+
+            # Send a completion summary; the full text is served by the output endpoint
+            await send_message('execution_output', complete=True, success=success, exit_code=exit_code,
+                             **ExecutionManager._output_summary(output, batcher.seq, live))
 
             await send_message('execution_status',
                              status='completed',
@@ -360,13 +956,16 @@ class ExecutionManager:
             
             return {
                 'success': success,
-                'output': final_output,
                 'exit_code': exit_code
             }
 
+        except asyncio.CancelledError:
+            raise
+
         except Exception as e:
             error_msg = f'Error durante la ejecución: {str(e)}'
             logger.error(f"Execution error: {e}")
+            output.append(error_msg)
             
             await send_message('execution_output',
                              output=error_msg,
@@ -382,12 +981,384 @@ class ExecutionManager:
                 'exit_code': -1
             }
 
+        finally:
+            # Cancelled or failed while the process runs: do not leave its tree behind
+            if running is not None and running.process.returncode is None:
+                ExecutionManager.registry.terminate(execution_id)
+            ExecutionManager.registry.unregister(execution_id)
+            if terminal is not None:
+                terminal.close()
+            if display is not None:
+                ExecutionManager.get_display_pool().release(execution_id)
+            if prefix_clone is not None:
+                try:
+                    await ExecutionManager.get_prefix_pool().release(prefix_clone, success)
+                except Exception as e:
+                    logger.error(f"Error releasing Wine prefix clone: {e}")
+
+    @staticmethod
+    async def _close_terminal_on_exit(process, terminal, grace_period=1.0):
+        """End the terminal's output shortly after the process exits, even if a helper holds it."""
+        await process.wait()
+        try:
+            await asyncio.wait_for(terminal.finished.wait(), grace_period)
+        except asyncio.TimeoutError:
+            terminal.finish()
+
+    @staticmethod
+    def _output_summary(output, last_seq, live=None):
+        """Size information sent with the completion message instead of the output itself."""
+        summary = {
+            'output_bytes': output.size,
+            'output_lines': output.line_count,
+            'last_seq': last_seq,
+        }
+        if live is not None and live.skipped_total:
+            summary['live_skipped_lines'] = live.skipped_total
+        return summary
+
+    @staticmethod
+    def _create_output_store(name, sink=None):
+        return OutputStore(
+            os.path.join(ExecutionManager.OUTPUT_SPILL_DIR, f'{name}.log'),
+            tail_bytes=ExecutionManager.OUTPUT_TAIL_BYTES,
+            sink=sink,
+        )
+
+    @staticmethod
+    async def _start_chunk_writer(execution_id):
+        """Start persisting the output of an execution as chunks; None if it has no log."""
+        from .models import ExecutionLog
+
+        log_id = await ExecutionLog.objects.filter(
+            execution_uuid=execution_id).values_list('id', flat=True).afirst()
+        if log_id is None:
+            return None
+        return chunks.ChunkWriter(
+            log_id,
+            flush_lines=ExecutionManager.OUTPUT_CHUNK_FLUSH_LINES,
+            flush_interval=ExecutionManager.OUTPUT_CHUNK_FLUSH_INTERVAL,
+            max_chunk_bytes=ExecutionManager.OUTPUT_CHUNK_MAX_BYTES,
+            max_retries=ExecutionManager.OUTPUT_CHUNK_MAX_RETRIES,
+        ).start()
+
+    @staticmethod
+    async def _execute_and_persist(executable_path, arguments, execution_id, live_view=None,
+                                   interactive=False):
+        """
+        Run an execution and store its result in its ExecutionLog. The output
+        is also persisted as chunks while it runs, so other nodes can read it
+        and it survives a crash of this process.
+        """
+        writer = await ExecutionManager._start_chunk_writer(execution_id)
+        output = ExecutionManager._create_output_store(execution_id, sink=writer and writer.write)
+        ExecutionManager.outputs[execution_id] = output
+        ExecutionManager.replays[execution_id] = ReplayBuffer(
+            max_batches=ExecutionManager.REPLAY_MAX_BATCHES,
+            max_bytes=ExecutionManager.REPLAY_MAX_BYTES,
+        )
+        try:
+            result = await ExecutionManager._execute_and_stream(
+                executable_path, arguments, execution_id, output=output, live_view=live_view,
+                interactive=interactive
+            )
+            if writer is not None:
+                await writer.close()
+            await ExecutionManager._save_result(execution_id, result, output)
+            return result
+        finally:
+            if writer is not None:
+                await writer.close()
+            ExecutionManager.outputs.pop(execution_id, None)
+            output.discard()
+            # Keep the replay buffer a little longer for clients reconnecting late
+            asyncio.get_running_loop().call_later(
+                ExecutionManager.REPLAY_RETENTION, ExecutionManager.replays.pop, execution_id, None
+            )
+
+    @staticmethod
+    def _store_output(log, output=None, text=''):
+        """
+        Compress the output of a finished execution into a blob and point ``log``
+        at it (without saving the row), then add it to the full-text index.
+        ``output`` is its OutputStore; ``text`` is stored instead when there is
+        none or it is empty.
+        """
+        blobs = ExecutionManager.get_output_blobs()
+        if output is not None and output.size:
+            blob = blobs.save(log.execution_uuid, output.iter_chunks())
+            head = output.read(0, ExecutionManager.SEARCH_INDEX_MAX_BYTES)
+        else:
+            blob = blobs.save_text(log.execution_uuid, text)
+            head = text.encode('utf-8')[:ExecutionManager.SEARCH_INDEX_MAX_BYTES]
+        log.output_path = blob['path'] if blob else ''
+        log.output_bytes = blob['size'] if blob else 0
+        log.output_lines = blob['lines'] if blob else 0
+
+        try:
+            search.index_output(log.pk, head)
+        except Exception as e:
+            logger.warning(f"Could not index output of execution {log.execution_uuid}: {e}")
+
+    @staticmethod
+    @database_sync_to_async
+    def _save_result(execution_id, result, output=None):
+        from .models import ExecutionLog, ExecutionOutputChunk
+
+        try:
+            log = ExecutionLog.objects.only('id', 'execution_uuid').get(execution_uuid=execution_id)
+            ExecutionManager._store_output(log, output, result.get('output', ''))
+            log.exit_code = result['exit_code']
+            log.success = result['success']
+            log.completed = True
+            log.save(update_fields=['output_path', 'output_bytes', 'output_lines',
+                                    'exit_code', 'success', 'completed'])
+            # The blob now holds the whole output
+            ExecutionOutputChunk.objects.filter(log_id=log.pk).delete()
+        except Exception as e:
+            logger.error(f"Error saving result of execution {execution_id}: {e}")
+
+    @staticmethod
+    def assemble_output(log):
+        """
+        Build the blob of a log whose output only exists as chunks (its run was
+        interrupted, or saving the result failed), index it and drop the chunks.
+
+        Returns:
+            bool: True if the log had chunks to assemble
+        """
+        from .models import ExecutionOutputChunk
+
+        if log.output_path or not ExecutionOutputChunk.objects.filter(log_id=log.pk).exists():
+            return False
+        blob = ExecutionManager.get_output_blobs().save(log.execution_uuid, chunks.iter_chunks(log.pk))
+        log.output_path = blob['path'] if blob else ''
+        log.output_bytes = blob['size'] if blob else 0
+        log.output_lines = blob['lines'] if blob else 0
+        log.save(update_fields=['output_path', 'output_bytes', 'output_lines'])
+        try:
+            search.index_output(log.pk, chunks.read_chunks(log.pk, 0, ExecutionManager.SEARCH_INDEX_MAX_BYTES))
+        except Exception as e:
+            logger.warning(f"Could not index output of execution {log.execution_uuid}: {e}")
+        ExecutionOutputChunk.objects.filter(log_id=log.pk).delete()
+        return True
+
+    @staticmethod
+    def read_output(execution_id, offset=0, length=None):
+        """
+        Read a byte range of an execution's output (UTF-8, lines joined with newlines).
+
+        Served from memory while the execution runs here, from its persisted
+        chunks while it runs elsewhere (or if it was interrupted) and from its
+        compressed blob afterwards. A completed log left with only chunks is
+        assembled into a blob first. The range end is moved back so no
+        character is split.
+
+        Returns:
+            dict with 'data', 'offset', 'next_offset', 'total' and 'complete',
+            or None if the execution does not exist
+        """
+        output = ExecutionManager.outputs.get(execution_id)
+        if output is not None:
+            total, complete = output.size, False
+            read = output.read
+        else:
+            log = ExecutionManager.find_log(execution_id, [
+                'execution_uuid', 'output_path', 'output_bytes', 'output_lines', 'completed'])
+            if log is None:
+                return None
+            if log.completed and not log.output_path:
+                ExecutionManager.assemble_output(log)
+            total, complete = log.output_bytes, log.completed
+            if log.output_path:
+                read = functools.partial(ExecutionManager.get_output_blobs().read, log.output_path)
+            else:
+                total = chunks.chunked_size(log.pk)[0]
+                read = functools.partial(chunks.read_chunks, log.pk)
+
+        offset = max(0, min(offset, total))
+        try:
+            # Read a few extra bytes so the end can be moved to a character boundary
+            data = read(offset, None if length is None else length + 4)
+        except OutputDiscardedError:
+            # The run finished meanwhile; by now its output is stored
+            return ExecutionManager.read_output(execution_id, offset, length)
+        data_start = offset
+
+        end = total if length is None else min(total, offset + max(0, length))
+        while offset < end < total and (data[end - data_start] & 0xC0) == 0x80:
+            end -= 1
+
+        return {
+            'data': data[offset - data_start:end - data_start].decode('utf-8', errors='replace'),
+            'offset': offset,
+            'next_offset': end,
+            'total': total,
+            'complete': complete,
+        }
+
+    @staticmethod
+    def iter_output(execution_id, block_size=256 * 1024):
+        """
+        Yield the whole output of an execution as UTF-8 byte blocks: from memory
+        or its persisted chunks while it runs, decompressing its blob segment
+        by segment afterwards.
+        """
+        output = ExecutionManager.outputs.get(execution_id)
+        if output is not None:
+            try:
+                blocks = output.iter_chunks(block_size)
+            except OutputDiscardedError:
+                # The run finished meanwhile; by now its output is stored
+                blocks = None
+            if blocks is not None:
+                yield from blocks
+                return
+        log = ExecutionManager.find_log(execution_id, ['execution_uuid', 'output_path', 'completed'])
+        if log is None:
+            return
+        if log.completed and not log.output_path:
+            ExecutionManager.assemble_output(log)
+        if log.output_path:
+            yield from ExecutionManager.get_output_blobs().iter_chunks(log.output_path)
+        else:
+            yield from chunks.iter_chunks(log.pk)
+
+    @staticmethod
+    async def stream_events(execution_id, since=0, keepalive=15.0):
+        """
+        Yield the events of an execution for read-only HTTP streaming.
+
+        Replays the batches after ``since`` and then follows the execution live,
+        like a WebSocket consumer reconnecting with ``?since=``; an
+        ``execution_resync`` event marks batches that can no longer be replayed.
+        A finished execution that is no longer buffered is read back from its
+        stored output. Yields ``{'type': 'keepalive'}`` after ``keepalive``
+        idle seconds and stops after the completion event.
+        """
+        transport = ExecutionManager.get_transport()
+        local = ExecutionManager.is_local(execution_id)
+        group = f'execution_{execution_id}'
+
+        # Listen before looking at the current state so no event falls in between
+        async with GroupListener(transport, group, local) as listener:
+            buffer = ExecutionManager.replays.get(execution_id)
+            if buffer is None and not local:
+                log = await database_sync_to_async(ExecutionManager.find_log)(
+                    execution_id, ['completed', 'success', 'exit_code'])
+                if log is not None and log.completed:
+                    async for event in ExecutionManager._stored_output_events(execution_id):
+                        yield event
+                    yield {'type': 'execution_output', 'execution_id': execution_id, 'complete': True,
+                           'success': log.success, 'exit_code': log.exit_code}
+                    return
+
+            last_seq = since
+            events, gap = buffer.since(since) if buffer else ([], since > 0)
+            if gap:
+                yield {'type': 'execution_resync', 'execution_id': execution_id,
+                       'last_seq': buffer.last_seq if buffer else None}
+                last_seq = buffer.last_seq if buffer else since
+            for event in events:
+                last_seq = event['seq']
+                yield event
+            if buffer and buffer.final:
+                yield buffer.final
+                return
+
+            while True:
+                event = await listener.get(timeout=keepalive)
+                if event is None:
+                    yield {'type': 'keepalive'}
+                    continue
+                seq = event.get('seq')
+                if seq is not None:
+                    if seq <= last_seq:
+                        continue
+                    last_seq = seq
+                yield event
+                if event.get('complete'):
+                    return
+
+    @staticmethod
+    async def _stored_output_events(execution_id, page_size=256 * 1024):
+        """Yield the stored output of an execution as batches of whole lines."""
+        offset, rest = 0, ''
+        while True:
+            page = await database_sync_to_async(ExecutionManager.read_output)(execution_id, offset, page_size)
+            if page is None:
+                return
+            lines = (rest + page['data']).split('\n')
+            done = page['next_offset'] >= page['total'] or page['next_offset'] == offset
+            rest = '' if done else lines.pop()
+            if lines and lines != ['']:
+                yield {'type': 'execution_output', 'execution_id': execution_id, 'lines': lines}
+            if done:
+                return
+            offset = page['next_offset']
+
     @staticmethod
     async def kill_execution(execution_id):
         """
-        Kill a running execution by ID.
-        This is a placeholder - you'd need to track running processes.
+        Kill a running execution by ID, or drop it from the queue if it has not started.
+
+        Returns:
+            bool: True if the execution was found and cancelled
         """
-        # TODO: Implement process tracking and killing
         logger.info(f"Kill requested for execution {execution_id}")
-        pass
\ No newline at end of file
+        scheduler = ExecutionManager.get_scheduler()
+
+        if scheduler.cancel(execution_id):
+            await ExecutionManager._save_cancelled(execution_id)
+            return True
+
+        if await ExecutionManager.registry.kill(execution_id):
+            return True
+
+        # Admitted but without a process yet (waiting for a display or a prefix clone)
+        task = scheduler.abort(execution_id)
+        if task is None:
+            return False
+        # Let the run release its display and prefix before recording the result
+        await asyncio.wait([task])
+        await ExecutionManager._save_cancelled(execution_id)
+        return True
+
+    @staticmethod
+    async def _save_cancelled(execution_id):
+        """Tell the clients and record that an execution was cancelled before it started."""
+        cancel_msg = 'Ejecución cancelada antes de iniciar'
+        try:
+            await ExecutionManager.publish(execution_id, {
+                'type': 'execution_output',
+                'output': cancel_msg,
+                'complete': True, 'success': False, 'exit_code': -1
+            })
+        except Exception as e:
+            logger.error(f"Error sending WebSocket message: {e}")
+        await ExecutionManager._save_result(
+            execution_id, {'success': False, 'output': cancel_msg, 'exit_code': -1}
+        )
+
+    @staticmethod
+    async def write_stdin(execution_id, data):
+        """
+        Send input to an interactive execution running in this process.
+
+        Returns:
+            bool: False if the execution is not running here or has no terminal
+        """
+        running = ExecutionManager.registry.get(execution_id)
+        if running is None or running.terminal is None:
+            return False
+        await running.terminal.write(data.encode('utf-8'))
+        return True
+
+    @staticmethod
+    def resize_terminal(execution_id, rows, cols):
+        """Resize the terminal of an interactive execution; False if it has none here."""
+        running = ExecutionManager.registry.get(execution_id)
+        if running is None or running.terminal is None:
+            return False
+        running.terminal.resize(rows, cols)
+        return True
\ No newline at end of file
@@ -1,7 +1,11 @@
 """
 Forms for the ejecutor app.
 """
+from datetime import datetime, time, timedelta
 from django import forms
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import ExecutableFile, ExecutableCategory
 import os
 
@@ -85,3 +89,61 @@ class ExecutableArgumentsForm(forms.Form):
         widget=forms.TextInput(attrs={'class': 'form-control'}),
         label="Argumentos adicionales"
     )
+
+class ExecutionLogFilterForm(forms.Form):
+    """Filters of the execution log list."""
+    executable = forms.ModelChoiceField(
+        queryset=ExecutableFile.objects.order_by('name'),
+        required=False,
+        empty_label="Todos los ejecutables",
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label="Ejecutable"
+    )
+    user = forms.ModelChoiceField(
+        queryset=User.objects.order_by('username'),
+        required=False,
+        empty_label="Todos los usuarios",
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label="Usuario"
+    )
+    success = forms.TypedChoiceField(
+        choices=[('', 'Todos los estados'), ('1', 'Éxito'), ('0', 'Error')],
+        coerce=lambda value: value == '1',
+        empty_value=None,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label="Estado"
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'}),
+        label="Desde"
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'}),
+        label="Hasta"
+    )
+
+    def filter(self, queryset):
+        """Apply the valid filters to an ExecutionLog queryset."""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data['executable']:
+            queryset = queryset.filter(executable=data['executable'])
+        if data['user']:
+            queryset = queryset.filter(user=data['user'])
+        if data['success'] is not None:
+            queryset = queryset.filter(success=data['success'])
+        # Compare with day boundaries so the executed_at index can be used
+        if data['date_from']:
+            queryset = queryset.filter(executed_at__gte=self._day_start(data['date_from']))
+        if data['date_to']:
+            queryset = queryset.filter(executed_at__lt=self._day_start(data['date_to'] + timedelta(days=1)))
+        return queryset
+
+    @staticmethod
+    def _day_start(day):
+        start = datetime.combine(day, time.min)
+        return timezone.make_aware(start) if settings.USE_TZ else start
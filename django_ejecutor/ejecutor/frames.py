@@ -0,0 +1,126 @@
+"""
+Binary WebSocket framing of execution output batches.
+
+Frame layout (big-endian)::
+
+    version:u8  flags:u8  seq:u32  body
+
+``body`` is zlib-compressed when ``flags & FLAG_COMPRESSED``. Uncompressed, it
+is a sequence of line records::
+
+    line_flags:u8  length:u32  utf-8 text
+
+where ``line_flags & 0x03`` is the stream id (see ``STREAMS``) whose
+``"STDOUT: "``/``"STDERR: "`` prefix was stripped from the text, and
+``line_flags & 0x80`` marks a progress update.
+"""
+import json
+import struct
+import zlib
+from collections import OrderedDict
+
+FRAME_VERSION = 1
+FLAG_COMPRESSED = 0x01
+LINE_PROGRESS = 0x80
+
+# Stream id -> line prefix; id 0 is a line without prefix (system messages)
+STREAMS = {1: 'STDOUT: ', 2: 'STDERR: '}
+
+# WebSocket subprotocols offered by clients that understand binary frames
+SUBPROTOCOL_BINARY = 'ejecutor.binary'
+SUBPROTOCOL_DEFLATE = 'ejecutor.binary+deflate'
+
+_HEADER = struct.Struct('!BBI')
+_LINE = struct.Struct('!BI')
+
+
+def negotiate(subprotocols):
+    """Pick the best subprotocol offered by a client, or None for JSON text frames."""
+    for subprotocol in (SUBPROTOCOL_DEFLATE, SUBPROTOCOL_BINARY):
+        if subprotocol in (subprotocols or ()):
+            return subprotocol
+    return None
+
+
+def encode_output_frame(seq, lines, progress=(), compress=False, min_compress_size=512, level=6):
+    """Encode one output batch as a binary frame."""
+    progress = set(progress)
+    body = bytearray()
+    for index, line in enumerate(lines):
+        stream = 0
+        for stream_id, prefix in STREAMS.items():
+            if line.startswith(prefix):
+                stream, line = stream_id, line[len(prefix):]
+                break
+        data = line.encode('utf-8')
+        body += _LINE.pack(stream | (LINE_PROGRESS if index in progress else 0), len(data))
+        body += data
+
+    flags = 0
+    if compress and len(body) >= min_compress_size:
+        compressed = zlib.compress(bytes(body), level)
+        if len(compressed) < len(body):
+            body, flags = compressed, FLAG_COMPRESSED
+    return _HEADER.pack(FRAME_VERSION, flags, seq) + bytes(body)
+
+
+def decode_output_frame(frame):
+    """Decode a frame into ``(seq, lines, progress)``; the inverse of ``encode_output_frame``."""
+    version, flags, seq = _HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    body = frame[_HEADER.size:]
+    if flags & FLAG_COMPRESSED:
+        body = zlib.decompress(body)
+
+    lines, progress = [], []
+    pos = 0
+    while pos < len(body):
+        line_flags, length = _LINE.unpack_from(body, pos)
+        pos += _LINE.size
+        text = bytes(body[pos:pos + length]).decode('utf-8')
+        pos += length
+        if line_flags & LINE_PROGRESS:
+            progress.append(len(lines))
+        lines.append(STREAMS.get(line_flags & 0x03, '') + text)
+    return seq, lines, progress
+
+
+class FrameCache:
+    """
+    Remember recently encoded frames so an event delivered to several
+    consumers of the same process is encoded and compressed only once.
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self._frames = OrderedDict()
+        self._texts = OrderedDict()
+
+    def text(self, event):
+        """
+        Return the JSON text frame of an event. Events fanned out in-process are
+        the same object for every consumer, so they are cached by identity (the
+        event is kept alongside so its id cannot be reused meanwhile).
+        """
+        cached = self._texts.get(id(event))
+        if cached is not None and cached[0] is event:
+            return cached[1]
+        text = json.dumps(event)
+        self._texts[id(event)] = (event, text)
+        if len(self._texts) > self.size:
+            self._texts.popitem(last=False)
+        return text
+
+    def encode(self, execution_id, event, compress):
+        key = (execution_id, event['seq'], compress)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = encode_output_frame(event['seq'], event['lines'], event.get('progress', ()), compress)
+            self._frames[key] = frame
+            if len(self._frames) > self.size:
+                self._frames.popitem(last=False)
+        return frame
+
+
+frame_cache = FrameCache()
@@ -0,0 +1,85 @@
+"""
+Comando para aplicar la retención del historial de ejecuciones.
+"""
+import copy
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ejecutor import retention, search
+from ejecutor.execution import ExecutionManager
+
+class Command(BaseCommand):
+    help = (
+        'Archiva en NDJSON comprimido y elimina de la base de datos los registros de '
+        'ejecución que superan su periodo de retención (LOG_RETENTION_DAYS o el del ejecutable).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Días de retención para los ejecutables sin valor propio (sustituye LOG_RETENTION_DAYS)')
+        parser.add_argument('--limit', type=int, help='Procesar como máximo este número de registros')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo contar los registros que se archivarían')
+        parser.add_argument('--delete', action='store_true',
+                            help='Eliminar los registros y su salida sin archivarlos')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Ejecutar VACUUM completo al terminar (bloquea la base de datos mientras dura)')
+        parser.add_argument('--reindex-search', action='store_true',
+                            help='Reconstruir el índice de búsqueda sin las entradas de registros eliminados')
+        parser.add_argument('--loop', action='store_true',
+                            help='Aplicar la retención cada LOG_RETENTION_INTERVAL segundos hasta que se '
+                                 'interrumpa; con varios procesos así solo uno a la vez la aplica')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days no puede ser negativo')
+
+        archiver = copy.copy(ExecutionManager.get_log_archiver())
+        if options['days'] is not None:
+            archiver.default_days = options['days']
+        if options['delete']:
+            archiver.archive = False
+
+        if options['loop']:
+            self.loop(archiver, options)
+            return
+
+        if options['dry_run']:
+            expired = archiver.expired().count()
+            if options['limit'] is not None:
+                expired = min(expired, options['limit'])
+            self.stdout.write(f'Registros fuera del periodo de retención: {expired}')
+            return
+
+        stats = archiver.run(limit=options['limit'])
+        if archiver.archive:
+            self.stdout.write(self.style.SUCCESS(
+                f"Archivados {stats['logs']} registros; {stats['archives']} archivo(s) nuevo(s) "
+                f"({stats['bytes'] / 1024:.1f} KB sin comprimir)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Eliminados {stats['logs']} registros y su salida"))
+
+        if options['reindex_search']:
+            indexed = search.rebuild_index(ExecutionManager.get_output_blobs(),
+                                           ExecutionManager.SEARCH_INDEX_MAX_BYTES)
+            self.stdout.write(f'Índice de búsqueda reconstruido: {indexed} registros')
+
+        if stats['logs'] or options['vacuum']:
+            done = retention.reclaim_space(full=options['vacuum'])
+            if done:
+                self.stdout.write(f'Espacio recuperado con {done}')
+
+    def loop(self, archiver, options):
+        if options['dry_run'] or options['limit'] is not None or options['reindex_search'] or options['vacuum']:
+            raise CommandError('--loop no admite --dry-run, --limit, --reindex-search ni --vacuum')
+        if not ExecutionManager.LOG_RETENTION_INTERVAL:
+            raise CommandError('LOG_RETENTION_INTERVAL es 0: la retención periódica está desactivada')
+
+        self.stdout.write(f'Aplicando la retención cada {ExecutionManager.LOG_RETENTION_INTERVAL} segundos '
+                          '(Ctrl+C para terminar)')
+        job = retention.RetentionJob(archiver, ExecutionManager.LOG_RETENTION_INTERVAL, initial_delay=0)
+        try:
+            job.run()
+        except KeyboardInterrupt:
+            job.stop()
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0002_alter_executablefile_file_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executablefile',
+            name='live_view_interval_ms',
+            field=models.PositiveIntegerField(default=500, verbose_name='Intervalo de Últimas Líneas (ms)'),
+        ),
+        migrations.AddField(
+            model_name='executablefile',
+            name='live_view_max_rate',
+            field=models.PositiveIntegerField(default=1000, verbose_name='Máximo de Líneas por Segundo'),
+        ),
+        migrations.AddField(
+            model_name='executablefile',
+            name='live_view_policy',
+            field=models.CharField(choices=[('full', 'Completa'), ('rate', 'Limitada (líneas por segundo)'), ('tail', 'Solo últimas líneas periódicamente')], default='full', max_length=10, verbose_name='Vista en Vivo'),
+        ),
+    ]
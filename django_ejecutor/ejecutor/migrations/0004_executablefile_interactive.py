@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0003_executablefile_live_view_interval_ms_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executablefile',
+            name='interactive',
+            field=models.BooleanField(default=False, verbose_name='Consola Interactiva'),
+        ),
+    ]
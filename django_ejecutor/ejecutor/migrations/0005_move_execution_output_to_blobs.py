@@ -0,0 +1,110 @@
+import gzip
+import json
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import migrations, models
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Blob layout written by ejecutor.blobs.OutputBlobStore when this migration was
+# created, copied here so later changes to that module cannot change what this
+# migration writes or reads: independently compressed segments concatenated in
+# one file, plus a JSON index next to it.
+BLOB_LOCATION = 'execution_output/archive'
+SEGMENT_SIZE = 256 * 1024
+
+
+def output_storage():
+    return storages[getattr(settings, 'EXECUTOR_CONFIG', {}).get('OUTPUT_STORAGE', 'default')]
+
+
+def save_blob(storage, execution_id, data):
+    """Store ``data`` as a gzip blob; return its path, size and line count."""
+    segments = []
+    blob = bytearray()
+    for start in range(0, len(data), SEGMENT_SIZE):
+        compressed = gzip.compress(data[start:start + SEGMENT_SIZE], compresslevel=6, mtime=0)
+        segments.append([start, len(blob), len(compressed)])
+        blob += compressed
+    path = storage.save(f'{BLOB_LOCATION}/{execution_id[:2]}/{execution_id}.log.gz', ContentFile(bytes(blob)))
+    index = {'version': 1, 'codec': 'gzip', 'size': len(data),
+             'lines': data.count(b'\n') + 1, 'segments': segments}
+    storage.save(path + '.idx', ContentFile(json.dumps(index).encode('utf-8')))
+    return path, index
+
+
+def read_blob(storage, path):
+    with storage.open(path + '.idx', 'rb') as f:
+        index = json.loads(f.read())
+    data = bytearray()
+    with storage.open(path, 'rb') as f:
+        for _raw_offset, blob_offset, blob_length in index['segments']:
+            f.seek(blob_offset)
+            segment = f.read(blob_length)
+            if index['codec'] == 'zstd':
+                data += zstandard.ZstdDecompressor().decompress(segment)
+            else:
+                data += gzip.decompress(segment)
+    return bytes(data)
+
+
+def output_to_blobs(apps, schema_editor):
+    """Compress the output stored in each row into a blob and keep only a pointer."""
+    ExecutionLog = apps.get_model('ejecutor', 'ExecutionLog')
+    storage = output_storage()
+    logs = ExecutionLog.objects.exclude(output='').only('id', 'execution_uuid', 'output')
+    for log in logs.iterator(chunk_size=100):
+        path, index = save_blob(storage, log.execution_uuid, log.output.encode('utf-8'))
+        ExecutionLog.objects.filter(pk=log.pk).update(
+            output='',
+            output_path=path,
+            output_bytes=index['size'],
+            output_lines=index['lines'],
+        )
+
+
+def blobs_to_output(apps, schema_editor):
+    """Read the blobs back into the rows."""
+    ExecutionLog = apps.get_model('ejecutor', 'ExecutionLog')
+    storage = output_storage()
+    logs = ExecutionLog.objects.exclude(output_path='').only('id', 'output_path')
+    for log in logs.iterator(chunk_size=100):
+        output = read_blob(storage, log.output_path).decode('utf-8', errors='replace')
+        ExecutionLog.objects.filter(pk=log.pk).update(output=output, output_path='')
+        for name in (log.output_path, log.output_path + '.idx'):
+            storage.delete(name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0004_executablefile_interactive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executionlog',
+            name='output_bytes',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Tamaño de la Salida (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='executionlog',
+            name='output_lines',
+            field=models.PositiveIntegerField(default=0, verbose_name='Líneas de Salida'),
+        ),
+        migrations.AddField(
+            model_name='executionlog',
+            name='output_path',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Archivo de Salida'),
+        ),
+        migrations.RunPython(output_to_blobs, blobs_to_output),
+        migrations.RemoveField(
+            model_name='executionlog',
+            name='output',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0005_move_execution_output_to_blobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='executionlog',
+            index=models.Index(fields=['executed_at', 'id'], name='ejecutor_log_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='executionlog',
+            index=models.Index(fields=['executable', 'executed_at', 'id'], name='ejecutor_log_exe_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='executionlog',
+            index=models.Index(fields=['user', 'executed_at', 'id'], name='ejecutor_log_user_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,109 @@
+import gzip
+import json
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import migrations
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Index tables as ejecutor.search defined them when this migration was
+# created, copied here so later changes to that module cannot change this step.
+FTS_TABLE = 'ejecutor_output_fts'
+PG_TABLE = 'ejecutor_output_search'
+
+
+def search_backend(connection):
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return 'fts5'
+        # Builds may ship FTS5 without advertising it; trying is the only sure test
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp._ejecutor_fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp._ejecutor_fts5_probe")
+            return 'fts5'
+        except Exception:
+            return None
+
+
+def read_blob_head(storage, path, limit):
+    """Return the first ``limit`` bytes of an output blob (see migration 0005)."""
+    with storage.open(path + '.idx', 'rb') as f:
+        index = json.loads(f.read())
+    data = bytearray()
+    with storage.open(path, 'rb') as f:
+        for _raw_offset, blob_offset, blob_length in index['segments']:
+            if len(data) >= limit:
+                break
+            f.seek(blob_offset)
+            segment = f.read(blob_length)
+            if index['codec'] == 'zstd':
+                data += zstandard.ZstdDecompressor().decompress(segment)
+            else:
+                data += gzip.decompress(segment)
+    return bytes(data[:limit])
+
+
+def create_search_index(apps, schema_editor):
+    """Create the full-text index of the database backend and index existing output."""
+    kind = search_backend(schema_editor.connection)
+    if kind == 'fts5':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"output, content='', tokenize='unicode61 remove_diacritics 2')"
+        )
+        insert = f"INSERT INTO {FTS_TABLE} (rowid, output) VALUES (%s, %s)"
+    elif kind == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            f"log_id bigint PRIMARY KEY REFERENCES ejecutor_executionlog (id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_idx ON {PG_TABLE} USING GIN (document)"
+        )
+        insert = f"INSERT INTO {PG_TABLE} (log_id, document) VALUES (%s, to_tsvector('simple', %s))"
+    else:
+        return
+
+    config = getattr(settings, 'EXECUTOR_CONFIG', {})
+    storage = storages[config.get('OUTPUT_STORAGE', 'default')]
+    limit = config.get('SEARCH_INDEX_MAX_BYTES', 1024 * 1024)
+    ExecutionLog = apps.get_model('ejecutor', 'ExecutionLog')
+    logs = ExecutionLog.objects.exclude(output_path='').only('id', 'output_path')
+    with schema_editor.connection.cursor() as cursor:
+        for log in logs.iterator(chunk_size=100):
+            try:
+                text = read_blob_head(storage, log.output_path, limit).decode('utf-8', errors='replace')
+            except Exception:
+                continue
+            if text:
+                cursor.execute(insert, [log.pk, text])
+
+
+def drop_search_index(apps, schema_editor):
+    kind = search_backend(schema_editor.connection)
+    if kind == 'fts5':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif kind == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0006_executionlog_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
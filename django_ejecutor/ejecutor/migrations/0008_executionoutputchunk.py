@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0007_output_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecutionOutputChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField(verbose_name='Secuencia')),
+                ('offset', models.PositiveBigIntegerField(verbose_name='Posición (bytes)')),
+                ('newlines', models.PositiveIntegerField(default=0, verbose_name='Saltos de Línea')),
+                ('data', models.BinaryField(verbose_name='Datos')),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='output_chunks', to='ejecutor.executionlog', verbose_name='Registro de Ejecución')),
+            ],
+            options={
+                'verbose_name': 'Fragmento de Salida',
+                'verbose_name_plural': 'Fragmentos de Salida',
+                'indexes': [models.Index(fields=['log', 'offset'], name='ejecutor_chunk_log_offset_idx')],
+                'constraints': [models.UniqueConstraint(fields=('log', 'seq'), name='ejecutor_chunk_log_seq_uniq')],
+            },
+        ),
+    ]
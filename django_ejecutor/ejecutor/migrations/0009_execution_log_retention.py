@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0008_executionoutputchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecutionLogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, verbose_name='Archivo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Archivo')),
+                ('log_count', models.PositiveIntegerField(default=0, verbose_name='Registros')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Tamaño sin Comprimir (bytes)')),
+                ('first_executed_at', models.DateTimeField(null=True, verbose_name='Primera Ejecución')),
+                ('last_executed_at', models.DateTimeField(null=True, verbose_name='Última Ejecución')),
+            ],
+            options={
+                'verbose_name': 'Archivo de Historial',
+                'verbose_name_plural': 'Archivos de Historial',
+            },
+        ),
+        migrations.AddField(
+            model_name='executablefile',
+            name='retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Vacío para usar el valor global; 0 para conservar siempre', null=True, verbose_name='Días de Retención del Historial'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedExecutionLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('execution_uuid', models.CharField(max_length=36, unique=True, verbose_name='ID de Ejecución')),
+                ('offset', models.PositiveBigIntegerField(verbose_name='Posición (bytes)')),
+                ('length', models.PositiveIntegerField(verbose_name='Longitud (bytes)')),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='ejecutor.executionlogarchive', verbose_name='Archivo de Historial')),
+            ],
+            options={
+                'verbose_name': 'Registro Archivado',
+                'verbose_name_plural': 'Registros Archivados',
+            },
+        ),
+    ]
@@ -0,0 +1,105 @@
+import gzip
+import json
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import migrations
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Copied from ejecutor.search as of this migration (see 0007)
+FTS_TABLE = 'ejecutor_output_fts'
+DOCS_TABLE = 'ejecutor_output_fts_docs'
+FTS_OPTIONS = "content='', tokenize='unicode61 remove_diacritics 2'"
+CONTENTLESS_DELETE_VERSION = (3, 43, 0)
+
+
+def has_fts_table(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def read_blob_head(storage, path, limit):
+    """Return the first ``limit`` bytes of an output blob (see migration 0005)."""
+    with storage.open(path + '.idx', 'rb') as f:
+        index = json.loads(f.read())
+    data = bytearray()
+    with storage.open(path, 'rb') as f:
+        for _raw_offset, blob_offset, blob_length in index['segments']:
+            if len(data) >= limit:
+                break
+            f.seek(blob_offset)
+            segment = f.read(blob_length)
+            if index['codec'] == 'zstd':
+                data += zstandard.ZstdDecompressor().decompress(segment)
+            else:
+                data += gzip.decompress(segment)
+    return bytes(data[:limit])
+
+
+def reindex(apps, schema_editor, record_docs):
+    config = getattr(settings, 'EXECUTOR_CONFIG', {})
+    storage = storages[config.get('OUTPUT_STORAGE', 'default')]
+    limit = config.get('SEARCH_INDEX_MAX_BYTES', 1024 * 1024)
+    ExecutionLog = apps.get_model('ejecutor', 'ExecutionLog')
+    logs = ExecutionLog.objects.exclude(output_path='').only('id', 'output_path')
+    with schema_editor.connection.cursor() as cursor:
+        for log in logs.iterator(chunk_size=100):
+            try:
+                data = read_blob_head(storage, log.output_path, limit)
+            except Exception:
+                continue
+            if not data:
+                continue
+            cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, output) VALUES (%s, %s)",
+                           [log.pk, data.decode('utf-8', errors='replace')])
+            if record_docs:
+                cursor.execute(f"INSERT INTO {DOCS_TABLE} (log_id, indexed_bytes) VALUES (%s, %s)",
+                               [log.pk, len(data)])
+
+
+def make_index_deletable(apps, schema_editor):
+    """
+    Recreate the FTS5 table so entries can be removed with their logs:
+    with contentless_delete=1 where SQLite supports it, and with a table of
+    indexed lengths in any case. The old table also held entries of deleted
+    logs, so everything is indexed again.
+    """
+    if not has_fts_table(schema_editor.connection):
+        return
+    options = FTS_OPTIONS
+    if schema_editor.connection.Database.sqlite_version_info >= CONTENTLESS_DELETE_VERSION:
+        options += ", contentless_delete=1"
+    schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+    schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(output, {options})")
+    schema_editor.execute(
+        f"CREATE TABLE IF NOT EXISTS {DOCS_TABLE} ("
+        f"log_id integer PRIMARY KEY, indexed_bytes integer NOT NULL)"
+    )
+    reindex(apps, schema_editor, record_docs=True)
+
+
+def restore_contentless_index(apps, schema_editor):
+    if not has_fts_table(schema_editor.connection):
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {DOCS_TABLE}")
+    schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+    schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(output, {FTS_OPTIONS})")
+    reindex(apps, schema_editor, record_docs=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0009_execution_log_retention'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_index_deletable, restore_contentless_index),
+    ]
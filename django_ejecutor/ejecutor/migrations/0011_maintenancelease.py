@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejecutor', '0010_output_search_deletable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Tarea')),
+                ('holder', models.CharField(max_length=100, verbose_name='Proceso')),
+                ('expires_at', models.DateTimeField(verbose_name='Expira')),
+            ],
+            options={
+                'verbose_name': 'Turno de Mantenimiento',
+                'verbose_name_plural': 'Turnos de Mantenimiento',
+            },
+        ),
+    ]
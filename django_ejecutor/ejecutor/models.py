@@ -31,6 +31,11 @@ class ExecutableFile(models.Model):
         ('uploaded', 'Subido'),
         ('preinstalled', 'Pre-instalado'),
     ]
+    LIVE_VIEW_CHOICES = [
+        ('full', 'Completa'),
+        ('rate', 'Limitada (líneas por segundo)'),
+        ('tail', 'Solo últimas líneas periódicamente'),
+    ]
     name = models.CharField(max_length=200, verbose_name="Nombre")
     description = models.TextField(blank=True, verbose_name="Descripción")
     file = models.FileField(upload_to=executable_file_path, null=True, blank=True, verbose_name="Archivo")
@@ -43,6 +48,15 @@ class ExecutableFile(models.Model):
     execution_count = models.IntegerField(default=0, verbose_name="Número de Ejecuciones")
     is_active = models.BooleanField(default=True, verbose_name="Activo")
     command_args = models.CharField(max_length=500, blank=True, verbose_name="Argumentos de Ejecución")
+    # Solo afecta a la salida enviada en vivo; la salida se almacena completa
+    live_view_policy = models.CharField(max_length=10, choices=LIVE_VIEW_CHOICES, default='full', verbose_name="Vista en Vivo")
+    live_view_max_rate = models.PositiveIntegerField(default=1000, verbose_name="Máximo de Líneas por Segundo")
+    live_view_interval_ms = models.PositiveIntegerField(default=500, verbose_name="Intervalo de Últimas Líneas (ms)")
+    # Ejecuta en una pseudo-terminal que acepta entrada desde el navegador (solo Linux)
+    interactive = models.BooleanField(default=False, verbose_name="Consola Interactiva")
+    # Vacío: se usa LOG_RETENTION_DAYS de EXECUTOR_CONFIG; 0: el historial se conserva siempre
+    retention_days = models.PositiveIntegerField(null=True, blank=True, verbose_name="Días de Retención del Historial",
+                                                 help_text="Vacío para usar el valor global; 0 para conservar siempre")
 
     class Meta:
         verbose_name = "Archivo Ejecutable"
@@ -57,6 +71,14 @@ class ExecutableFile(models.Model):
             return self.file.path
         return os.path.join(settings.PREINSTALLED_FILES_DIR, self.file_path)
 
+    def live_view_options(self):
+        """Return the live view options used by the execution manager."""
+        return {
+            'policy': self.live_view_policy,
+            'max_rate': self.live_view_max_rate,
+            'interval': self.live_view_interval_ms / 1000,
+        }
+
     def save(self, *args, **kwargs):
         """Override save method to update file_path for uploaded files."""
         super().save(*args, **kwargs)
@@ -71,7 +93,10 @@ class ExecutionLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name="Usuario")
     executed_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Ejecución")
     success = models.BooleanField(null=True, blank=True, verbose_name="Éxito")
-    output = models.TextField(blank=True, verbose_name="Salida")
+    # La salida se guarda comprimida fuera de la base de datos (ver ejecutor.blobs)
+    output_path = models.CharField(max_length=255, blank=True, verbose_name="Archivo de Salida")
+    output_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Tamaño de la Salida (bytes)")
+    output_lines = models.PositiveIntegerField(default=0, verbose_name="Líneas de Salida")
     exit_code = models.IntegerField(null=True, blank=True, verbose_name="Código de Salida")
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name="Dirección IP")
     is_realtime = models.BooleanField(default=False, verbose_name="Visualización en tiempo real")
@@ -80,6 +105,79 @@ class ExecutionLog(models.Model):
     class Meta:
         verbose_name = "Registro de Ejecución"
         verbose_name_plural = "Registros de Ejecuciones"
+        # Paginación por cursor sobre (executed_at, id), con y sin filtro por ejecutable o usuario
+        indexes = [
+            models.Index(fields=['executed_at', 'id'], name='ejecutor_log_keyset_idx'),
+            models.Index(fields=['executable', 'executed_at', 'id'], name='ejecutor_log_exe_keyset_idx'),
+            models.Index(fields=['user', 'executed_at', 'id'], name='ejecutor_log_user_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"{self.executable.name} - {self.executed_at}"
+
+class ExecutionOutputChunk(models.Model):
+    """Append-only piece of the output of an execution, written while it runs."""
+    log = models.ForeignKey(ExecutionLog, on_delete=models.CASCADE, related_name='output_chunks', verbose_name="Registro de Ejecución")
+    seq = models.PositiveIntegerField(verbose_name="Secuencia")
+    # Posición del fragmento en la salida completa (bytes UTF-8, líneas unidas con \n)
+    offset = models.PositiveBigIntegerField(verbose_name="Posición (bytes)")
+    newlines = models.PositiveIntegerField(default=0, verbose_name="Saltos de Línea")
+    data = models.BinaryField(verbose_name="Datos")
+
+    class Meta:
+        verbose_name = "Fragmento de Salida"
+        verbose_name_plural = "Fragmentos de Salida"
+        constraints = [
+            models.UniqueConstraint(fields=['log', 'seq'], name='ejecutor_chunk_log_seq_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['log', 'offset'], name='ejecutor_chunk_log_offset_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.log_id} #{self.seq}"
+
+class ExecutionLogArchive(models.Model):
+    """Compressed NDJSON archive of execution logs removed from the database."""
+    # Blob en el almacenamiento de salidas (ver ejecutor.retention)
+    path = models.CharField(max_length=255, verbose_name="Archivo")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Archivo")
+    log_count = models.PositiveIntegerField(default=0, verbose_name="Registros")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Tamaño sin Comprimir (bytes)")
+    first_executed_at = models.DateTimeField(null=True, verbose_name="Primera Ejecución")
+    last_executed_at = models.DateTimeField(null=True, verbose_name="Última Ejecución")
+
+    class Meta:
+        verbose_name = "Archivo de Historial"
+        verbose_name_plural = "Archivos de Historial"
+
+    def __str__(self):
+        return f"{self.path} ({self.log_count})"
+
+class ArchivedExecutionLog(models.Model):
+    """Where an archived execution log is stored inside its archive."""
+    execution_uuid = models.CharField(max_length=36, unique=True, verbose_name="ID de Ejecución")
+    archive = models.ForeignKey(ExecutionLogArchive, on_delete=models.CASCADE, related_name='entries', verbose_name="Archivo de Historial")
+    # Rango de bytes de la línea NDJSON dentro del archivo descomprimido
+    offset = models.PositiveBigIntegerField(verbose_name="Posición (bytes)")
+    length = models.PositiveIntegerField(verbose_name="Longitud (bytes)")
+
+    class Meta:
+        verbose_name = "Registro Archivado"
+        verbose_name_plural = "Registros Archivados"
+
+    def __str__(self):
+        return self.execution_uuid
+
+class MaintenanceLease(models.Model):
+    """Lease that lets only one process (on any node) run a periodic task at a time."""
+    name = models.CharField(max_length=50, unique=True, verbose_name="Tarea")
+    holder = models.CharField(max_length=100, verbose_name="Proceso")
+    expires_at = models.DateTimeField(verbose_name="Expira")
+
+    class Meta:
+        verbose_name = "Turno de Mantenimiento"
+        verbose_name_plural = "Turnos de Mantenimiento"
+
+    def __str__(self):
+        return f"{self.name} ({self.holder})"
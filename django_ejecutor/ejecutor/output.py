@@ -0,0 +1,203 @@
+"""
+Per-execution output storage with a bounded in-memory tail and a spill file.
+"""
+import os
+import logging
+import threading
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows: a file open elsewhere cannot be deleted anyway
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class OutputDiscardedError(Exception):
+    """The spill file of an OutputStore was discarded; read the stored output instead."""
+
+
+class OutputStore:
+    """
+    Output of one execution: lines joined with ``\\n`` and encoded as UTF-8.
+
+    Every line is appended to a spill file; only the last ``tail_bytes`` bytes
+    of lines stay in memory for ``tail()``. Writes are buffered up to
+    ``buffer_size`` bytes. ``read()`` and ``tail()`` may be called from
+    another thread (e.g. a synchronous view) while the execution appends.
+
+    ``sink``, if given, is called with the bytes of every append exactly as
+    they are added to the file (separator included), e.g. to persist them
+    elsewhere as well.
+
+    The spill file is opened for reading under the same lock that guards the
+    writer, so a read never races ``close()`` or ``discard()``; once the store
+    is discarded, reads raise OutputDiscardedError. The writer holds an
+    exclusive ``flock`` on the file, which tells remove_stale_spill_files()
+    that it is still in use.
+    """
+
+    def __init__(self, path, tail_bytes=64 * 1024, buffer_size=64 * 1024, sink=None):
+        self.path = path
+        self.tail_bytes = tail_bytes
+        self.buffer_size = buffer_size
+        self.sink = sink
+        self.size = 0
+        self.line_count = 0
+        self._tail = deque()
+        self._tail_size = 0
+        self._pending = bytearray()
+        self._lock = threading.Lock()
+        self._discarded = False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'wb', buffering=0)
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def append(self, line):
+        """Append a line and return the byte offset where it starts."""
+        data = line.encode('utf-8')
+        with self._lock:
+            separator = b'\n' if self.size else b''
+            self._pending += separator
+            self.size += len(separator)
+            offset = self.size
+            self._pending += data
+            self.size += len(data)
+            self.line_count += 1
+            if self.sink is not None:
+                self.sink(separator + data)
+
+            self._tail.append(data)
+            self._tail_size += len(data)
+            while self._tail_size > self.tail_bytes and len(self._tail) > 1:
+                self._tail_size -= len(self._tail.popleft())
+
+            if len(self._pending) >= self.buffer_size:
+                self._flush_locked()
+        return offset
+
+    def _flush_locked(self):
+        if self._pending and self._file:
+            self._file.write(self._pending)
+            self._pending.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _open_locked(self):
+        """Flush and open the spill file for reading; returns it with the current size."""
+        if self._discarded:
+            raise OutputDiscardedError(self.path)
+        self._flush_locked()
+        return open(self.path, 'rb'), self.size
+
+    def read(self, offset=0, length=None):
+        """Return ``length`` bytes (all if None) starting at byte ``offset``."""
+        with self._lock:
+            f, size = self._open_locked()
+        with f:
+            offset = max(0, min(offset, size))
+            end = size if length is None else min(size, offset + max(0, length))
+            if end <= offset:
+                return b''
+            f.seek(offset)
+            return f.read(end - offset)
+
+    def iter_chunks(self, block_size=256 * 1024):
+        """
+        Return an iterator over the whole output in blocks of up to
+        ``block_size`` bytes. The file is opened right away, so a discarded
+        store raises here rather than on the first block.
+        """
+        with self._lock:
+            f, size = self._open_locked()
+        return self._iter_file(f, size, block_size)
+
+    @staticmethod
+    def _iter_file(f, remaining, block_size):
+        with f:
+            while remaining > 0:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+
+    def tail(self, n):
+        """Return the last ``n`` lines, reading back from the spill file if needed."""
+        with self._lock:
+            if n <= len(self._tail) or len(self._tail) == self.line_count:
+                return [line.decode('utf-8', errors='replace') for line in list(self._tail)[-n:]] if n else []
+            f, size = self._open_locked()
+
+        block = 64 * 1024
+        start = size
+        data = b''
+        with f:
+            while start > 0 and data.count(b'\n') < n:
+                start = max(0, start - block)
+                f.seek(start)
+                data = f.read(size - start)
+        return [line.decode('utf-8', errors='replace') for line in data.split(b'\n')[-n:]]
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """Close and delete the spill file; readers that already opened it keep their copy."""
+        with self._lock:
+            self._flush_locked()
+            if self._file:
+                self._file.close()
+                self._file = None
+            self._discarded = True
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete output spill file {self.path}: {e}")
+
+
+def remove_stale_spill_files(directory, suffix='.log'):
+    """
+    Delete the spill files (names ending in ``suffix``) left in ``directory``
+    by crashed processes; returns how many. Files of live stores, in this or
+    another process, are locked by their writer (on Windows, cannot be
+    deleted while open) and are skipped.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    for name in names:
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if fcntl is not None:
+                with open(path, 'rb') as f:
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    os.unlink(path)
+            else:
+                os.unlink(path)
+            removed += 1
+        except (IsADirectoryError, FileNotFoundError, PermissionError):
+            continue
+        except OSError as e:
+            logger.warning(f"Could not delete stale output spill file {path}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} stale output spill files from {directory}")
+    return removed
@@ -0,0 +1,71 @@
+"""
+Keyset (cursor) pagination of execution logs, newest first.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(log):
+    """Opaque cursor pointing at a log by its ``(executed_at, id)`` key."""
+    key = f'{log.executed_at.isoformat()}|{log.pk}'
+    return base64.urlsafe_b64encode(key.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the ``(executed_at, id)`` key of a cursor; raises ValueError if malformed."""
+    try:
+        key = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        executed_at, pk = key.rsplit('|', 1)
+        return datetime.fromisoformat(executed_at), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class KeysetPage:
+    """
+    One page of a queryset ordered by ``(-executed_at, -id)``.
+
+    Pages are located with ``WHERE (executed_at, id) < cursor`` instead of
+    ``OFFSET``, so every page costs the same however deep it is. ``after``
+    moves to older rows and ``before`` back to newer ones; only one of them
+    is used.
+    """
+
+    def __init__(self, queryset, after=None, before=None, size=50):
+        self.size = size
+        if before is not None:
+            executed_at, pk = decode_cursor(before)
+            rows = list(queryset.filter(
+                Q(executed_at__gt=executed_at) | Q(executed_at=executed_at, pk__gt=pk)
+            ).order_by('executed_at', 'id')[:size + 1])
+            self.has_newer = len(rows) > size
+            self.items = rows[:size][::-1]
+            self.has_older = True
+        else:
+            if after is not None:
+                executed_at, pk = decode_cursor(after)
+                queryset = queryset.filter(
+                    Q(executed_at__lt=executed_at) | Q(executed_at=executed_at, pk__lt=pk)
+                )
+            rows = list(queryset.order_by('-executed_at', '-id')[:size + 1])
+            self.has_older = len(rows) > size
+            self.items = rows[:size]
+            self.has_newer = after is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def next_cursor(self):
+        """Cursor of the page of older rows, or None."""
+        return encode_cursor(self.items[-1]) if self.has_older and self.items else None
+
+    @property
+    def previous_cursor(self):
+        """Cursor of the page of newer rows, or None."""
+        return encode_cursor(self.items[0]) if self.has_newer and self.items else None
@@ -0,0 +1,165 @@
+"""
+In-process registry of running executions and process tree termination.
+"""
+import os
+import asyncio
+import signal
+import logging
+import platform
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+IS_WINDOWS = platform.system() == 'Windows'
+
+
+def session_pids(sid):
+    """Return the PIDs of every live process in session ``sid`` (Linux only)."""
+    pids = set()
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return pids
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the parenthesised command name: state ppid pgrp session ...
+        fields = stat[stat.rfind(b')') + 2:].split()
+        if len(fields) > 3 and fields[0] != b'Z' and int(fields[3]) == sid:
+            pids.add(int(entry))
+    return pids
+
+
+class RunningExecution:
+    """Book-keeping for one running execution."""
+
+    def __init__(self, execution_id, process, wineprefix=None):
+        self.execution_id = execution_id
+        self.process = process
+        # Processes are started in their own session, so pgid == sid == pid
+        self.pgid = None if IS_WINDOWS else process.pid
+        self.wineprefix = wineprefix
+        self.display = None
+        # PseudoTerminal of an interactive execution
+        self.terminal = None
+        self.children = set()
+        self.reader_tasks = []
+        self.started_at = time.monotonic()
+        self.cancelled = False
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def refresh_children(self):
+        """Record wine helper processes (wineserver children) spawned in our session."""
+        if self.pgid is not None:
+            self.children |= session_pids(self.pgid) - {self.process.pid}
+        return self.children
+
+
+class ExecutionRegistry:
+    """Map execution IDs to their running process tree."""
+
+    def __init__(self):
+        self._executions = {}
+
+    def register(self, execution_id, process, wineprefix=None):
+        entry = RunningExecution(execution_id, process, wineprefix)
+        self._executions[execution_id] = entry
+        return entry
+
+    def unregister(self, execution_id):
+        return self._executions.pop(execution_id, None)
+
+    def get(self, execution_id):
+        return self._executions.get(execution_id)
+
+    def __contains__(self, execution_id):
+        return execution_id in self._executions
+
+    def __len__(self):
+        return len(self._executions)
+
+    def items(self):
+        return list(self._executions.items())
+
+    async def kill(self, execution_id, grace_period=2.0):
+        """
+        Terminate the whole process tree of an execution.
+
+        Sends SIGTERM to the process group and every process of its session,
+        then SIGKILL to whatever is still alive after ``grace_period`` seconds.
+        Returns False if the execution is not registered.
+        """
+        entry = self._executions.get(execution_id)
+        if entry is None:
+            return False
+
+        entry.cancelled = True
+        process = entry.process
+
+        if IS_WINDOWS:
+            await asyncio.to_thread(
+                subprocess.run,
+                ['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        else:
+            entry.refresh_children()
+            self._signal_tree(entry, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), timeout=grace_period)
+            except asyncio.TimeoutError:
+                pass
+            entry.refresh_children()
+            self._signal_tree(entry, signal.SIGKILL)
+
+        for task in entry.reader_tasks:
+            if not task.done():
+                task.cancel()
+
+        logger.info(f"Execution {execution_id} killed after {entry.elapsed:.1f}s")
+        return True
+
+    def terminate(self, execution_id):
+        """
+        Kill the process tree of an execution at once, without waiting for it.
+        For cleanup paths that cannot await, e.g. a task being cancelled.
+        Returns False if the execution is not registered.
+        """
+        entry = self._executions.get(execution_id)
+        if entry is None:
+            return False
+
+        entry.cancelled = True
+        if IS_WINDOWS:
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(entry.process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            entry.refresh_children()
+            self._signal_tree(entry, signal.SIGKILL)
+        for task in entry.reader_tasks:
+            if not task.done():
+                task.cancel()
+        logger.warning(f"Execution {execution_id} terminated after {entry.elapsed:.1f}s")
+        return True
+
+    @staticmethod
+    def _signal_tree(entry, sig):
+        try:
+            os.killpg(entry.pgid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        for pid in entry.children:
+            try:
+                os.kill(pid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
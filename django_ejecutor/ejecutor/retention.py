@@ -0,0 +1,301 @@
+"""
+Retention of execution logs.
+
+Logs older than the retention period of their executable are streamed into
+compressed NDJSON archives (one log per line, in Django's ``jsonl``
+serialization) and then deleted from the database in small batches, so the
+hot table stays small and no write lock is held for long. Archives are
+OutputBlobStore blobs, so reading one log back only decompresses the segment
+holding its line; ArchivedExecutionLog maps execution ids to that line.
+
+The output blobs of archived logs are kept, so their output stays readable;
+their full-text index entries are removed with the rows (see signals). Only
+finished logs expire: a running execution is never archived. Archiving is
+idempotent: logs already archived by an interrupted run are only deleted,
+and two archivers racing on the same logs collide on the unique execution id
+and the loser rolls back.
+
+Periodic retention is a RetentionJob run by ``manage.py archive_execution_logs
+--loop`` in a process of its own, not by the server. A job only runs while it
+holds a MaintenanceLease row, so even with one such process per node a single
+one applies retention at a time.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core import serializers
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def expired_logs(default_days=None, now=None):
+    """
+    Return the queryset of finished ExecutionLogs past retention: older than
+    the ``retention_days`` of their executable, or ``default_days`` when it
+    is not set. 0 days (or no default) keeps logs forever.
+    """
+    from .models import ExecutableFile, ExecutionLog
+
+    now = now or timezone.now()
+    by_days = {}
+    for pk, days in ExecutableFile.objects.filter(retention_days__isnull=False).values_list('pk', 'retention_days'):
+        by_days.setdefault(days, []).append(pk)
+
+    conditions = [
+        Q(executable_id__in=ids, executed_at__lt=now - timedelta(days=days))
+        for days, ids in by_days.items() if days
+    ]
+    if default_days:
+        overridden = [pk for ids in by_days.values() for pk in ids]
+        conditions.append(Q(executed_at__lt=now - timedelta(days=default_days)) & ~Q(executable_id__in=overridden))
+    if not conditions:
+        return ExecutionLog.objects.none()
+    condition = conditions.pop()
+    for other in conditions:
+        condition |= other
+    return ExecutionLog.objects.filter(condition, completed=True)
+
+
+def acquire_lease(name, holder, duration, now=None):
+    """
+    Take the lease ``name`` for ``duration`` seconds, or renew it if
+    ``holder`` already has it. Returns False while another holder's lease
+    has not expired.
+    """
+    from .models import MaintenanceLease
+
+    now = now or timezone.now()
+    expires_at = now + timedelta(seconds=duration)
+    taken = MaintenanceLease.objects.filter(
+        Q(holder=holder) | Q(expires_at__lte=now), name=name
+    ).update(holder=holder, expires_at=expires_at)
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            MaintenanceLease.objects.create(name=name, holder=holder, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    return True
+
+
+def reclaim_space(full=False, using=None):
+    """
+    Give the pages freed by deleted logs back to the filesystem.
+
+    On SQLite this runs ``PRAGMA incremental_vacuum`` when the database uses
+    incremental auto-vacuum. ``full`` switches it to incremental auto-vacuum
+    and runs ``VACUUM``, which rewrites the whole file and locks it meanwhile,
+    so later runs only need the incremental step. On PostgreSQL ``full`` runs
+    ``VACUUM ANALYZE`` on the log tables and autovacuum handles the rest.
+
+    Returns:
+        str: what was run, or None
+    """
+    from .models import ExecutionLog, ExecutionOutputChunk
+
+    using = using or connection
+    with using.cursor() as cursor:
+        if using.vendor == 'sqlite':
+            cursor.execute("PRAGMA auto_vacuum")
+            incremental = cursor.fetchone()[0] == 2
+            if full:
+                if not incremental:
+                    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                cursor.execute("VACUUM")
+                return 'VACUUM'
+            if incremental:
+                cursor.execute("PRAGMA incremental_vacuum")
+                # The pragma frees one page per step
+                cursor.fetchall()
+                return 'incremental_vacuum'
+        elif using.vendor == 'postgresql' and full:
+            for model in (ExecutionLog, ExecutionOutputChunk):
+                cursor.execute(f"VACUUM ANALYZE {using.ops.quote_name(model._meta.db_table)}")
+            return 'VACUUM ANALYZE'
+    return None
+
+
+class LogArchiver:
+    """
+    Archive (or, with ``archive=False``, delete along with their output)
+    the execution logs past retention.
+
+    ``archive_blobs`` stores the archives and ``output_blobs`` holds the
+    output of the logs. ``assemble`` is called with each log whose output
+    only exists as chunks before it is archived. Up to ``segment_logs`` logs
+    go into each archive; rows are read and deleted ``batch_size`` at a time,
+    sleeping ``batch_pause`` seconds between deletions to let other writers in.
+    """
+
+    def __init__(self, archive_blobs, output_blobs, assemble=None, default_days=None, archive=True,
+                 batch_size=500, batch_pause=0.0, segment_logs=10000):
+        self.archive_blobs = archive_blobs
+        self.output_blobs = output_blobs
+        self.assemble = assemble
+        self.default_days = default_days
+        self.archive = archive
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.segment_logs = segment_logs
+
+    def expired(self, now=None):
+        return expired_logs(self.default_days, now)
+
+    def run(self, now=None, limit=None):
+        """
+        Process every expired log, or the oldest ``limit`` of them.
+
+        Returns:
+            dict with 'logs' (removed from the database), 'archives' and
+            'bytes' (uncompressed size of the new archives)
+        """
+        stats = {'logs': 0, 'archives': 0, 'bytes': 0}
+        expired = self.expired(now).order_by('executed_at', 'id')
+        while limit is None or stats['logs'] < limit:
+            size = self.segment_logs if limit is None else min(self.segment_logs, limit - stats['logs'])
+            ids = list(expired.values_list('id', flat=True)[:size])
+            if not ids:
+                break
+            if self.archive:
+                archive = self._archive(ids)
+                if archive is not None:
+                    stats['archives'] += 1
+                    stats['bytes'] += archive.size
+            self._delete(ids)
+            stats['logs'] += len(ids)
+        return stats
+
+    def _archive(self, ids):
+        """Write the logs ``ids`` into a new archive; None if all were already archived."""
+        from .models import ArchivedExecutionLog, ExecutionLog, ExecutionLogArchive
+
+        entries = []
+        span = {}
+
+        def lines():
+            offset = 0
+            for batch in batched(ids, self.batch_size):
+                logs = list(ExecutionLog.objects.filter(pk__in=batch).order_by('executed_at', 'id'))
+                archived = set(ArchivedExecutionLog.objects.filter(
+                    execution_uuid__in=[log.execution_uuid for log in logs]
+                ).values_list('execution_uuid', flat=True))
+                for log in logs:
+                    if log.execution_uuid in archived:
+                        continue
+                    if not log.output_path and self.assemble is not None:
+                        self.assemble(log)
+                    line = serializers.serialize('jsonl', [log]).encode('utf-8')
+                    entries.append(ArchivedExecutionLog(execution_uuid=log.execution_uuid,
+                                                        offset=offset, length=len(line)))
+                    offset += len(line)
+                    span.setdefault('first', log.executed_at)
+                    span['last'] = log.executed_at
+                    yield line
+
+        blob = self.archive_blobs.save(uuid.uuid4().hex, lines())
+        if blob is None:
+            return None
+        try:
+            with transaction.atomic():
+                archive = ExecutionLogArchive.objects.create(
+                    path=blob['path'], log_count=len(entries), size=blob['size'],
+                    first_executed_at=span['first'], last_executed_at=span['last'],
+                )
+                for entry in entries:
+                    entry.archive = archive
+                ArchivedExecutionLog.objects.bulk_create(entries, batch_size=self.batch_size)
+        except Exception:
+            self.archive_blobs.delete(blob['path'])
+            raise
+        logger.info(f"Archived {len(entries)} execution logs into {blob['path']}")
+        return archive
+
+    def _delete(self, ids):
+        """
+        Delete the logs ``ids`` in batches. The signal receivers drop their
+        index entries and, unless an archived copy still uses them, their
+        output blobs.
+        """
+        from .models import ExecutionLog
+
+        for batch in batched(ids, self.batch_size):
+            with transaction.atomic():
+                ExecutionLog.objects.filter(pk__in=batch).delete()
+            if self.batch_pause:
+                time.sleep(self.batch_pause)
+
+    def load(self, execution_id):
+        """Return an archived log as an unsaved ExecutionLog, or None if it is not archived."""
+        from django.contrib.auth.models import User
+        from .models import ArchivedExecutionLog, ExecutableFile
+
+        entry = ArchivedExecutionLog.objects.select_related('archive').filter(execution_uuid=execution_id).first()
+        if entry is None:
+            return None
+        line = self.archive_blobs.read(entry.archive.path, entry.offset, entry.length)
+        log = next(serializers.deserialize('jsonl', line.decode('utf-8'), ignorenonexistent=True)).object
+        # Executables take their logs with them when deleted; archived ones go as well
+        if not ExecutableFile.objects.filter(pk=log.executable_id).exists():
+            return None
+        if log.user_id is not None and not User.objects.filter(pk=log.user_id).exists():
+            log.user_id = None
+        return log
+
+
+class RetentionJob:
+    """
+    Run a LogArchiver every ``interval`` seconds, then reclaim space. Each
+    run first takes the ``lease`` for one interval and is skipped if another
+    process holds it. ``run()`` blocks until ``stop()``; ``start()`` runs it
+    in a daemon thread instead.
+    """
+
+    def __init__(self, archiver, interval, initial_delay=60.0, lease='log-retention'):
+        self.archiver = archiver
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.lease = lease
+        self.holder = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='log-retention', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        delay = min(self.initial_delay, self.interval)
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                if not acquire_lease(self.lease, self.holder, self.interval):
+                    continue
+                stats = self.archiver.run()
+                if stats['logs']:
+                    reclaim_space()
+                    logger.info(f"Log retention removed {stats['logs']} logs "
+                                f"({stats['archives']} archives written)")
+            except Exception as e:
+                logger.error(f"Error applying log retention: {e}")
+            finally:
+                connection.close()
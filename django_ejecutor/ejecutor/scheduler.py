@@ -0,0 +1,130 @@
+"""
+Admission control and FIFO scheduling for executable runs.
+"""
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue cannot accept more executions."""
+
+    def __init__(self, queued, limit, retry_after=None):
+        self.queued = queued
+        self.limit = limit
+        self.retry_after = retry_after
+        super().__init__(
+            f"Cola de ejecución llena ({queued}/{limit}). Intente de nuevo más tarde."
+        )
+
+
+class ExecutionScheduler:
+    """
+    Bound the number of concurrent executions and queue the rest in FIFO order.
+
+    Jobs are zero-argument callables returning a coroutine. The scheduler must be
+    used from the event loop that runs the executions.
+    """
+
+    def __init__(self, max_concurrent, max_queued, notify=None, retry_after=None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queued = max(0, int(max_queued))
+        self.retry_after = retry_after
+        self._notify = notify
+        self._running = {}
+        self._queue = deque()
+        # The event loop keeps only weak references to tasks
+        self._notifications = set()
+
+    @property
+    def running_count(self):
+        return len(self._running)
+
+    @property
+    def queued_count(self):
+        return len(self._queue)
+
+    def is_running(self, execution_id):
+        return execution_id in self._running
+
+    def position(self, execution_id):
+        """Return the 1-based queue position of an execution, or 0 if not queued."""
+        for index, (queued_id, _job) in enumerate(self._queue, start=1):
+            if queued_id == execution_id:
+                return index
+        return 0
+
+    def submit(self, execution_id, job):
+        """
+        Admit a job. Returns 0 if it started immediately, otherwise its queue position.
+
+        Raises:
+            QueueFullError: if the backlog already holds ``max_queued`` jobs.
+        """
+        if len(self._running) < self.max_concurrent and not self._queue:
+            self._start(execution_id, job)
+            return 0
+
+        if len(self._queue) >= self.max_queued:
+            raise QueueFullError(len(self._queue), self.max_queued, self.retry_after)
+
+        self._queue.append((execution_id, job))
+        position = len(self._queue)
+        logger.info(f"Execution {execution_id} queued at position {position}")
+        self._publish(execution_id, position)
+        return position
+
+    def cancel(self, execution_id):
+        """Drop a queued job. Returns True if it was waiting in the queue."""
+        for entry in self._queue:
+            if entry[0] == execution_id:
+                self._queue.remove(entry)
+                self._publish_positions()
+                return True
+        return False
+
+    def abort(self, execution_id):
+        """Cancel a started job. Returns its task, or None if it is not running."""
+        task = self._running.get(execution_id)
+        if task is None:
+            return None
+        task.cancel()
+        return task
+
+    def _start(self, execution_id, job):
+        self._running[execution_id] = asyncio.create_task(self._run(execution_id, job))
+
+    async def _run(self, execution_id, job):
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled execution {execution_id} failed: {e}")
+        finally:
+            self._running.pop(execution_id, None)
+            self._dispatch()
+
+    def _dispatch(self):
+        """Start queued jobs while there are free slots."""
+        started = False
+        while self._queue and len(self._running) < self.max_concurrent:
+            execution_id, job = self._queue.popleft()
+            self._publish(execution_id, 0)
+            self._start(execution_id, job)
+            started = True
+        if started:
+            self._publish_positions()
+
+    def _publish_positions(self):
+        for position, (execution_id, _job) in enumerate(self._queue, start=1):
+            self._publish(execution_id, position)
+
+    def _publish(self, execution_id, position):
+        if self._notify is None:
+            return
+        task = asyncio.create_task(self._notify(execution_id, position, len(self._queue)))
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
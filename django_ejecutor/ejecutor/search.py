@@ -0,0 +1,302 @@
+"""
+Full-text index over the output of finished executions.
+
+SQLite uses an FTS5 virtual table and PostgreSQL a ``tsvector`` column with
+a GIN index; on other backends search is unavailable. The index only holds
+terms: the text stays in the compressed output blobs and snippets are cut
+from there, so output is not stored in the database a second time.
+
+Rows are keyed by ExecutionLog id and removed when their log is deleted.
+The FTS5 table is contentless, so on SQLite 3.43+ it is created with
+``contentless_delete=1`` and rows are deleted by id; on older versions a
+row can only be removed by handing FTS5 the exact text that was indexed.
+That text is always the first bytes of the (immutable) output blob, so
+``ejecutor_output_fts_docs`` records how many were indexed and the text is
+read back from the blob to delete the row.
+"""
+import html
+import logging
+import re
+import unicodedata
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'ejecutor_output_fts'
+DOCS_TABLE = 'ejecutor_output_fts_docs'
+PG_TABLE = 'ejecutor_output_search'
+# First SQLite version whose FTS5 supports contentless_delete=1
+CONTENTLESS_DELETE_VERSION = (3, 43, 0)
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def backend(using=None):
+    """Return ``'fts5'``, ``'postgresql'`` or None if the database cannot index output."""
+    using = using or connection
+    if using.vendor == 'postgresql':
+        return 'postgresql'
+    if using.vendor == 'sqlite' and _sqlite_has_fts5(using):
+        return 'fts5'
+    return None
+
+
+def _sqlite_has_fts5(using):
+    if not hasattr(using, '_ejecutor_fts5'):
+        with using.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            compiled = bool(cursor.fetchone()[0])
+            if not compiled:
+                # Builds may ship FTS5 without advertising it; trying is the only sure test
+                try:
+                    cursor.execute("CREATE VIRTUAL TABLE temp._ejecutor_fts5_probe USING fts5(x)")
+                    cursor.execute("DROP TABLE temp._ejecutor_fts5_probe")
+                    compiled = True
+                except Exception:
+                    pass
+        using._ejecutor_fts5 = compiled
+    return using._ejecutor_fts5
+
+
+def _contentless_delete(using):
+    """True if the FTS5 table was created with contentless_delete=1."""
+    with using.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        row = cursor.fetchone()
+    return bool(row) and 'contentless_delete' in row[0]
+
+
+def create_index(schema_editor):
+    kind = backend(schema_editor.connection)
+    if kind == 'fts5':
+        options = "content='', tokenize='unicode61 remove_diacritics 2'"
+        if schema_editor.connection.Database.sqlite_version_info >= CONTENTLESS_DELETE_VERSION:
+            options += ", contentless_delete=1"
+        schema_editor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(output, {options})")
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {DOCS_TABLE} ("
+            f"log_id integer PRIMARY KEY, indexed_bytes integer NOT NULL)"
+        )
+    elif kind == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            f"log_id bigint PRIMARY KEY REFERENCES ejecutor_executionlog (id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_idx ON {PG_TABLE} USING GIN (document)"
+        )
+    else:
+        logger.warning("Full-text search of execution output is not available on this database")
+
+
+def drop_index(schema_editor):
+    kind = backend(schema_editor.connection)
+    if kind == 'fts5':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {DOCS_TABLE}")
+    elif kind == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+
+def index_output(log_id, data):
+    """
+    Add the output of one log to the index; no-op without a backend.
+    ``data`` must be the leading bytes of the log's output blob. On SQLite
+    a log is indexed once and later calls are ignored.
+    """
+    kind = backend()
+    if kind is None or not data:
+        return
+    text = data.decode('utf-8', errors='replace')
+    with connection.cursor() as cursor:
+        if kind == 'fts5':
+            cursor.execute(f"INSERT OR IGNORE INTO {DOCS_TABLE} (log_id, indexed_bytes) VALUES (%s, %s)",
+                           [log_id, len(data)])
+            if cursor.rowcount:
+                cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, output) VALUES (%s, %s)", [log_id, text])
+        else:
+            cursor.execute(
+                f"INSERT INTO {PG_TABLE} (log_id, document) VALUES (%s, to_tsvector('simple', %s)) "
+                f"ON CONFLICT (log_id) DO UPDATE SET document = EXCLUDED.document",
+                [log_id, text]
+            )
+
+
+def remove_outputs(logs, blobs):
+    """
+    Remove the index entries of ``logs`` (ExecutionLogs about to be deleted,
+    with their ``output_path``). ``blobs`` is the OutputBlobStore holding their
+    output, read back on SQLite versions without contentless_delete. An entry
+    whose blob cannot be read is left behind; it matches no log and is dropped
+    by ``rebuild_index``. Returns the number of entries removed.
+    """
+    if backend() != 'fts5':
+        # The PostgreSQL table cascades with the logs
+        return 0
+    paths = {log.pk: log.output_path for log in logs}
+    if not paths:
+        return 0
+    placeholders = ', '.join(['%s'] * len(paths))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT log_id, indexed_bytes FROM {DOCS_TABLE} WHERE log_id IN ({placeholders})",
+                       list(paths))
+        indexed = cursor.fetchall()
+        if not indexed:
+            return 0
+        if _contentless_delete(connection):
+            removed = [log_id for log_id, _ in indexed]
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(removed))})",
+                           removed)
+        else:
+            removed = []
+            for log_id, indexed_bytes in indexed:
+                try:
+                    text = blobs.read(paths[log_id], 0, indexed_bytes).decode('utf-8', errors='replace')
+                except Exception as e:
+                    logger.warning(f"Could not read output of log {log_id} to remove it from the index: {e}")
+                    continue
+                cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, output) VALUES ('delete', %s, %s)",
+                               [log_id, text])
+                removed.append(log_id)
+        cursor.execute(f"DELETE FROM {DOCS_TABLE} WHERE log_id IN ({placeholders})", list(paths))
+    return len(removed)
+
+
+def clear_index():
+    kind = backend()
+    if kind is None:
+        return
+    with connection.cursor() as cursor:
+        if kind == 'fts5':
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('delete-all')")
+            cursor.execute(f"DELETE FROM {DOCS_TABLE}")
+        else:
+            cursor.execute(f"DELETE FROM {PG_TABLE}")
+
+
+def rebuild_index(blobs, max_bytes):
+    """
+    Empty the index and index the output of every log again, reading the
+    first ``max_bytes`` of each blob. This also drops entries left behind by
+    logs whose output could not be read when they were deleted. Returns the
+    number of logs indexed.
+    """
+    from .models import ExecutionLog
+
+    if backend() is None:
+        return 0
+    clear_index()
+    indexed = 0
+    logs = ExecutionLog.objects.exclude(output_path='').only('id', 'output_path')
+    for log in logs.iterator(chunk_size=100):
+        try:
+            data = blobs.read(log.output_path, 0, max_bytes)
+        except Exception as e:
+            logger.warning(f"Could not read output of log {log.pk} to index it: {e}")
+            continue
+        index_output(log.pk, data)
+        indexed += 1
+    return indexed
+
+
+def fts5_query(query):
+    """
+    Turn user input into an FTS5 query: every word or "quoted phrase" must
+    appear; a trailing ``*`` on a word matches it as a prefix.
+    """
+    terms = []
+    for phrase, word in _QUERY_TOKEN.findall(query):
+        prefix = not phrase and word.endswith('*')
+        text = (phrase or word.rstrip('*')).strip()
+        if text:
+            terms.append('"' + text.replace('"', '""') + '"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def query_terms(query):
+    """Words and phrases of a query, for highlighting."""
+    terms = [(phrase or word.rstrip('*')).strip() for phrase, word in _QUERY_TOKEN.findall(query)]
+    return [term for term in terms if term]
+
+
+def search_ids(query, limit=50, before_id=None):
+    """
+    Return ids of logs whose output matches ``query``, newest first.
+    ``before_id`` continues a previous result list.
+    """
+    kind = backend()
+    if kind is None:
+        raise RuntimeError("Full-text search is not available on this database")
+    params = []
+    if kind == 'fts5':
+        match = fts5_query(query)
+        if not match:
+            return []
+        sql = f"SELECT DISTINCT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        params.append(match)
+        if before_id is not None:
+            sql += " AND rowid < %s"
+            params.append(before_id)
+        sql += " ORDER BY rowid DESC LIMIT %s"
+    else:
+        sql = f"SELECT log_id FROM {PG_TABLE} WHERE document @@ websearch_to_tsquery('simple', %s)"
+        params.append(query)
+        if before_id is not None:
+            sql += " AND log_id < %s"
+            params.append(before_id)
+        sql += " ORDER BY log_id DESC LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def iter_lines(chunks):
+    """Split an iterable of UTF-8 byte chunks into text lines."""
+    rest = b''
+    for chunk in chunks:
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line.decode('utf-8', errors='replace')
+    if rest:
+        yield rest.decode('utf-8', errors='replace')
+
+
+def _fold(text):
+    """Lowercase and strip accents one character at a time, so positions are kept."""
+    return ''.join(unicodedata.normalize('NFKD', char)[:1] or char for char in text.lower())
+
+
+def snippets(lines, terms, limit=3, width=200):
+    """
+    Return up to ``limit`` HTML snippets: lines containing any of ``terms``
+    (ignoring case and accents, like the index), escaped, with matches wrapped
+    in ``<mark>`` and long lines cut to about ``width`` characters around the
+    first match.
+    """
+    if not terms:
+        return []
+    pattern = re.compile('|'.join(re.escape(_fold(term)) for term in sorted(terms, key=len, reverse=True)))
+    found = []
+    for line in lines:
+        folded = _fold(line)
+        match = pattern.search(folded)
+        if match is None:
+            continue
+        start = max(0, match.start() - width // 2)
+        end = min(len(line), start + width)
+        text = line[start:end]
+        parts, pos = [], 0
+        for hit in pattern.finditer(folded, start, end):
+            parts.append(html.escape(text[pos:hit.start() - start]))
+            parts.append(f'<mark>{html.escape(text[hit.start() - start:hit.end() - start])}</mark>')
+            pos = hit.end() - start
+        parts.append(html.escape(text[pos:]))
+        found.append(('…' if start else '') + ''.join(parts) + ('…' if end < len(line) else ''))
+        if len(found) >= limit:
+            break
+    return found
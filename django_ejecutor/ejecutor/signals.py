@@ -0,0 +1,41 @@
+"""
+Signal receivers of the ejecutor app, connected in EjecutorConfig.ready().
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import search
+from .models import ArchivedExecutionLog, ExecutionLog
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_delete, sender=ExecutionLog)
+def remove_output_from_index(sender, instance, **kwargs):
+    """Drop the full-text index entry of a log while its output blob can still be read."""
+    from .execution import ExecutionManager
+
+    try:
+        search.remove_outputs([instance], ExecutionManager.get_output_blobs())
+    except Exception as e:
+        logger.warning(f"Could not remove execution {instance.execution_uuid} from the search index: {e}")
+
+
+@receiver(post_delete, sender=ExecutionLog)
+def delete_output_blob(sender, instance, using, **kwargs):
+    """
+    Delete the output blob of a log once its deletion is committed, however it
+    was deleted (a cascade, a queryset delete). An archived copy of the log
+    keeps pointing at the blob, so then it stays.
+    """
+    from .execution import ExecutionManager
+
+    path = instance.output_path
+    if not path or ArchivedExecutionLog.objects.using(using).filter(
+            execution_uuid=instance.execution_uuid).exists():
+        return
+    blobs = ExecutionManager.get_output_blobs()
+    transaction.on_commit(lambda: blobs.delete(path), using=using)
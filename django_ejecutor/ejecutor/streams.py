@@ -0,0 +1,313 @@
+"""
+Incremental line splitting and batching of subprocess output.
+"""
+import asyncio
+import re
+import time
+from collections import deque
+
+_NEWLINE = re.compile(rb'\r\n|\r|\n')
+
+
+def utf8_size(text):
+    """Size of ``text`` encoded as UTF-8, without encoding ASCII text."""
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+class LineSplitter:
+    """
+    Split a byte stream into lines as chunks arrive.
+
+    ``\\n`` and ``\\r\\n`` end a line. A lone ``\\r`` rewinds the line, as a
+    terminal progress bar does: the segment is reported as a progress update
+    and dropped if something else follows it in the same chunk. A chunk
+    ending in ``\\r`` reports its last segment as progress right away; if the
+    next chunk starts with ``\\n`` the pair was a split ``\\r\\n`` and the
+    segment is reported again as a finished line. Lines longer than
+    ``max_line_length`` bytes are cut into several lines.
+    """
+
+    def __init__(self, max_line_length=16 * 1024):
+        self.max_line_length = max_line_length
+        self._buffer = b''
+        # Segment ended by the \r at the end of the last chunk, already reported as progress
+        self._progress = None
+
+    def feed(self, data):
+        """Consume a chunk and return a list of ``(line_bytes, is_progress)``."""
+        lines = []
+        if self._progress is not None:
+            segment, self._progress = self._progress, None
+            if data.startswith(b'\n'):
+                self._emit(lines, segment, False)
+                data = data[1:]
+        buf = self._buffer + data if self._buffer else data
+
+        pos = 0
+        for match in _NEWLINE.finditer(buf):
+            self._emit(lines, buf[pos:match.start()], match.group() == b'\r')
+            if match.end() == len(buf) and match.group() == b'\r':
+                self._progress = buf[pos:match.start()]
+            pos = match.end()
+
+        rest = buf[pos:]
+        while len(rest) > self.max_line_length:
+            cut = self._safe_cut(rest, self.max_line_length)
+            self._emit(lines, rest[:cut], False)
+            rest = rest[cut:]
+
+        self._buffer = rest
+        return lines
+
+    def _emit(self, lines, segment, progress):
+        # A pending progress update is superseded by whatever follows it
+        if lines and lines[-1][1]:
+            lines.pop()
+        while len(segment) > self.max_line_length:
+            cut = self._safe_cut(segment, self.max_line_length)
+            lines.append((segment[:cut], False))
+            segment = segment[cut:]
+        lines.append((segment, progress))
+
+    @property
+    def pending(self):
+        """Bytes of the unfinished line received so far."""
+        return self._buffer
+
+    def flush(self):
+        """Return whatever is left once the stream is closed; a last progress update is kept as a line."""
+        rest = self._buffer or self._progress
+        self._buffer, self._progress = b'', None
+        return [(rest, False)] if rest else []
+
+    @staticmethod
+    def _safe_cut(data, limit):
+        """Move a cut point back so it does not split a UTF-8 sequence."""
+        cut = limit
+        while cut > limit - 4 and cut > 0 and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        return cut if cut > 0 else limit
+
+
+class OutputBatcher:
+    """
+    Coalesce output lines into batches sent as a single message.
+
+    A batch is flushed when it reaches ``max_lines`` lines or ``max_bytes``
+    bytes of UTF-8, or ``max_delay`` seconds after its first line, whichever comes
+    first. ``send`` is awaited as ``send(lines, progress, seq)`` where
+    ``progress`` lists the indexes of lines that are progress updates and
+    ``seq`` increases by one per batch.
+    """
+
+    def __init__(self, send, max_lines=500, max_bytes=64 * 1024, max_delay=0.05):
+        self._send = send
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.seq = 0
+        self._lines = []
+        self._progress = {}
+        self._bytes = 0
+        self._timer = None
+        self._timer_task = None
+
+    async def add(self, line, progress=False, key=None):
+        """
+        Queue a line. ``key`` names the line a progress update rewrites; the next
+        line with the same key, progress or not, replaces it in the batch.
+        """
+        pending = self._progress.pop(key, None)
+        if pending is not None:
+            # Whatever follows a progress update rewrites its line, as on a terminal
+            self._bytes += utf8_size(line) - utf8_size(self._lines[pending])
+            self._lines[pending] = line
+            if progress:
+                self._progress[key] = pending
+            return
+
+        if progress:
+            self._progress[key] = len(self._lines)
+        self._lines.append(line)
+        self._bytes += utf8_size(line)
+
+        if len(self._lines) >= self.max_lines or self._bytes >= self.max_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._timer_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Send the pending batch, if any."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._lines:
+            return
+
+        lines, progress = self._lines, sorted(self._progress.values())
+        self._lines, self._progress, self._bytes = [], {}, 0
+        self.seq += 1
+        await self._send(lines, progress, self.seq)
+
+
+class LiveViewLimiter:
+    """
+    Thin out the live view of very chatty output before it reaches an
+    OutputBatcher. Only what is sent live is affected; callers store every
+    line themselves.
+
+    Policies:
+
+    - ``full``: every line is sent.
+    - ``rate``: at most ``max_rate`` lines per second (token bucket); the
+      number of lines skipped is reported in a marker line before the next
+      line that is sent.
+    - ``tail``: lines are held back and every ``interval`` seconds only the
+      last ``tail_lines`` of them are sent, after a marker with the number
+      skipped.
+    """
+
+    POLICIES = ('full', 'rate', 'tail')
+
+    def __init__(self, batcher, policy='full', max_rate=1000, interval=0.5, tail_lines=20,
+                 clock=time.monotonic):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown live view policy: {policy}")
+        self.batcher = batcher
+        self.policy = policy
+        self.max_rate = max(1, int(max_rate))
+        self.interval = max(0.01, float(interval))
+        self.skipped_total = 0
+        self._clock = clock
+        self._tokens = float(self.max_rate)
+        self._last_refill = clock()
+        self._skipped = 0
+        self._held = deque(maxlen=max(1, int(tail_lines)))
+        self._timer = None
+        self._timer_task = None
+
+    async def add(self, line, progress=False, key=None, always=False):
+        """Offer a line to the live view; ``always`` bypasses the policy (system messages)."""
+        if self.policy == 'full':
+            await self.batcher.add(line, progress, key)
+        elif always:
+            await self._release()
+            await self.batcher.add(line, progress, key)
+        elif self.policy == 'rate':
+            if self._take_token():
+                await self._report_skipped()
+                await self.batcher.add(line, progress, key)
+            else:
+                self._skip(1)
+        else:
+            if len(self._held) == self._held.maxlen:
+                self._skip(1)
+            self._held.append((line, progress, key))
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.interval, self._on_timer)
+
+    def _take_token(self):
+        now = self._clock()
+        self._tokens = min(float(self.max_rate), self._tokens + (now - self._last_refill) * self.max_rate)
+        self._last_refill = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _skip(self, count):
+        self._skipped += count
+        self.skipped_total += count
+
+    async def _report_skipped(self):
+        if self._skipped:
+            skipped, self._skipped = self._skipped, 0
+            await self.batcher.add(f"[... {skipped} líneas omitidas en la vista en vivo ...]")
+
+    def _on_timer(self):
+        self._timer = None
+        self._timer_task = asyncio.create_task(self._release())
+
+    async def _release(self):
+        """Send the skipped-lines marker and whatever tail is held back."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        held, self._held = list(self._held), deque(maxlen=self._held.maxlen)
+        await self._report_skipped()
+        for line, progress, key in held:
+            await self.batcher.add(line, progress, key)
+
+    async def flush(self):
+        """Release everything held back and flush the batcher."""
+        await self._release()
+        await self.batcher.flush()
+
+
+class ReplayBuffer:
+    """
+    Recent output batches of one execution, kept so that clients reconnecting
+    with the last sequence number they saw can catch up before going live.
+
+    Holds at most ``max_batches`` batches and ``max_bytes`` bytes of lines;
+    the completion event is kept separately so it is always replayed.
+    """
+
+    def __init__(self, max_batches=1000, max_bytes=1024 * 1024):
+        self.max_batches = max_batches
+        self.max_bytes = max_bytes
+        self.final = None
+        self._events = deque()
+        self._bytes = 0
+
+    @property
+    def last_seq(self):
+        return self._events[-1][0] if self._events else 0
+
+    def append(self, seq, event, size):
+        self._events.append((seq, event, size))
+        self._bytes += size
+        while len(self._events) > 1 and (
+                len(self._events) > self.max_batches or self._bytes > self.max_bytes):
+            self._bytes -= self._events.popleft()[2]
+
+    def since(self, seq):
+        """
+        Return ``(events, gap)``: the batches after ``seq`` in order, and whether
+        some batches after ``seq`` were already evicted.
+        """
+        gap = bool(self._events) and self._events[0][0] > seq + 1
+        return [event for event_seq, event, _size in self._events if event_seq > seq], gap
+
+
+class FlowControl:
+    """
+    Track bytes sent to one client that it has not acknowledged yet.
+
+    The client acknowledges by sequence number once it has rendered a batch.
+    ``lagging`` turns true when more than ``window`` bytes are outstanding.
+    """
+
+    def __init__(self, window=1024 * 1024):
+        self.window = window
+        self.outstanding = 0
+        self.acked = 0
+        self._sent = deque()
+
+    @property
+    def lagging(self):
+        return self.outstanding > self.window
+
+    def sent(self, seq, size):
+        self._sent.append((seq, size))
+        self.outstanding += size
+
+    def ack(self, seq):
+        """Release everything sent up to and including ``seq``."""
+        self.acked = max(self.acked, seq)
+        while self._sent and self._sent[0][0] <= seq:
+            self.outstanding -= self._sent.popleft()[1]
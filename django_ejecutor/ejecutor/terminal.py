@@ -0,0 +1,115 @@
+"""
+Pseudo-terminal for interactive console executions (POSIX only).
+"""
+import asyncio
+import errno
+import fcntl
+import os
+import struct
+import sys
+import termios
+
+DEFAULT_ROWS = 24
+DEFAULT_COLS = 80
+
+# Runs in the child right after it starts in its own session: takes the
+# terminal on stdin as controlling tty, then execs the real command in place
+_CONTROLLING_TTY_EXEC = '''
+import fcntl, os, sys, termios
+fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+try:
+    os.execvp(sys.argv[1], sys.argv[1:])
+except OSError as e:
+    os.write(2, f"{sys.argv[1]}: {e.strerror}\\r\\n".encode())
+    os._exit(127)
+'''
+
+
+class PseudoTerminal:
+    """
+    A pty pair whose slave end becomes the stdin, stdout and stderr of the
+    child process. Programs see a terminal, so they line-buffer their output
+    and can prompt for input.
+
+    ``reader`` is an asyncio StreamReader fed from the master end; it reaches
+    EOF once every process holding the slave end has exited.
+    """
+
+    def __init__(self, rows=DEFAULT_ROWS, cols=DEFAULT_COLS):
+        self.master, self.slave = os.openpty()
+        os.set_blocking(self.master, False)
+        self.resize(rows, cols)
+        self.reader = asyncio.StreamReader()
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.master, self._on_readable)
+        self._write_lock = asyncio.Lock()
+        self._closed = False
+        # Set when the master end stops producing output
+        self.finished = asyncio.Event()
+
+    def command(self, cmd):
+        """
+        Wrap ``cmd`` so that, spawned with ``start_new_session=True``, it makes
+        the terminal its controlling tty and resizes deliver SIGWINCH to it.
+
+        A ``preexec_fn`` would do the same, but it is unsafe to fork with one
+        while other threads run; the wrapper does it after exec instead.
+        """
+        return [sys.executable, '-I', '-c', _CONTROLLING_TTY_EXEC, *cmd]
+
+    def spawned(self):
+        """Close the parent's copy of the slave end once the child holds it."""
+        if self.slave is not None:
+            os.close(self.slave)
+            self.slave = None
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.master, 64 * 1024)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            # Linux reports EIO on the master once the slave side is closed
+            if e.errno != errno.EIO:
+                self._loop.remove_reader(self.master)
+                self.reader.set_exception(e)
+                self.finished.set()
+                return
+            data = b''
+        if data:
+            self.reader.feed_data(data)
+        else:
+            self.finish()
+
+    def finish(self):
+        """Stop reading and end ``reader`` with whatever it already holds."""
+        if self.finished.is_set():
+            return
+        self._loop.remove_reader(self.master)
+        self.reader.feed_eof()
+        self.finished.set()
+
+    async def write(self, data):
+        """Write bytes to the program's stdin, waiting while the terminal buffer is full."""
+        async with self._write_lock:
+            while data and not self._closed:
+                try:
+                    written = os.write(self.master, data)
+                except BlockingIOError:
+                    await asyncio.sleep(0.01)
+                    continue
+                data = data[written:]
+
+    def resize(self, rows, cols):
+        """Set the terminal size (TIOCSWINSZ); the foreground program gets SIGWINCH."""
+        rows = max(1, min(int(rows), 1000))
+        cols = max(1, min(int(cols), 1000))
+        fcntl.ioctl(self.master, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.spawned()
+        self.finish()
+        os.close(self.master)
@@ -0,0 +1,71 @@
+import gzip
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.test import SimpleTestCase
+
+from ejecutor.blobs import INDEX_SUFFIX, OutputBlobStore
+
+
+class OutputBlobStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        self.blobs = OutputBlobStore(storage=self.storage, segment_size=10)
+        self.data = b''.join(b'line %02d\n' % n for n in range(20))
+
+    def test_round_trip(self):
+        blob = self.blobs.save('abcdef', [self.data[:7], b'', self.data[7:]])
+
+        self.assertEqual(blob['path'], 'execution_output/archive/ab/abcdef.log.gz')
+        self.assertEqual(blob['size'], len(self.data))
+        self.assertEqual(blob['lines'], 21)
+        self.assertEqual(self.blobs.read(blob['path']), self.data)
+        self.assertEqual(b''.join(self.blobs.iter_chunks(blob['path'])), self.data)
+        # Segments are independent gzip members, so the blob is a valid gzip file
+        with self.storage.open(blob['path'], 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.data)
+
+    def test_range_reads(self):
+        path = self.blobs.save('abcdef', [self.data])['path']
+
+        for offset, length in [(0, 1), (5, 10), (9, 2), (10, 10), (33, 57), (len(self.data) - 3, 100)]:
+            with self.subTest(offset=offset, length=length):
+                self.assertEqual(self.blobs.read(path, offset, length), self.data[offset:offset + length])
+        self.assertEqual(self.blobs.read(path, 100), self.data[100:])
+        self.assertEqual(self.blobs.read(path, len(self.data) + 5, 10), b'')
+        self.assertEqual(self.blobs.read(path, -4, 3), self.data[:3])
+        self.assertEqual(self.blobs.read(path, 10, 0), b'')
+
+    def test_range_read_decompresses_only_covering_segments(self):
+        path = self.blobs.save('abcdef', [self.data])['path']
+        index = self.blobs.index(path)
+        # Corrupt every segment but the third; a read inside it must still work
+        with self.storage.open(path, 'rb') as f:
+            blob = bytearray(f.read())
+        for n, (_raw, blob_offset, blob_length) in enumerate(index['segments']):
+            if n != 2:
+                blob[blob_offset:blob_offset + blob_length] = b'\0' * blob_length
+        self.storage.delete(path)
+        self.storage.save(path, ContentFile(bytes(blob)))
+
+        self.assertEqual(self.blobs.read(path, 22, 6), self.data[22:28])
+
+    def test_empty_output_is_not_stored(self):
+        self.assertIsNone(self.blobs.save('abcdef', [b'', b'']))
+        self.assertIsNone(self.blobs.save_text('abcdef', ''))
+        self.assertEqual(self.storage.listdir('')[0], [])
+
+    def test_save_text_and_delete(self):
+        blob = self.blobs.save_text('abcdef', 'Error: ejecución fallida')
+        self.assertEqual(self.blobs.read(blob['path']).decode('utf-8'), 'Error: ejecución fallida')
+        self.assertEqual(blob['lines'], 1)
+
+        self.blobs.delete(blob['path'])
+        self.assertFalse(self.storage.exists(blob['path']))
+        self.assertFalse(self.storage.exists(blob['path'] + INDEX_SUFFIX))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            OutputBlobStore(storage=self.storage, codec='lz4')
+
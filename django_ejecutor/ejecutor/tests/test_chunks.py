@@ -0,0 +1,79 @@
+import asyncio
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TransactionTestCase
+
+from ejecutor import chunks
+from ejecutor.models import ExecutableFile, ExecutionLog, ExecutionOutputChunk
+
+
+class ChunkWriterTests(TransactionTestCase):
+
+    def setUp(self):
+        executable = ExecutableFile.objects.create(name='app', file_path='app.exe', type='preinstalled')
+        self.log = ExecutionLog.objects.create(execution_uuid='00000000-0000-0000-0000-000000000001',
+                                               executable=executable)
+
+    def writer(self, **kwargs):
+        kwargs.setdefault('flush_interval', 10)
+        return chunks.ChunkWriter(self.log.pk, **kwargs).start()
+
+    def write_lines(self, writer, lines):
+        for n, line in enumerate(lines):
+            writer.write((b'\n' if n else b'') + line)
+        return b'\n'.join(lines)
+
+    def stored(self):
+        return list(ExecutionOutputChunk.objects.filter(log_id=self.log.pk)
+                    .order_by('seq').values_list('seq', 'offset', 'newlines'))
+
+    async def test_flush_on_line_count_and_close(self):
+        writer = self.writer(flush_lines=3, max_chunk_bytes=10)
+        data = self.write_lines(writer, [b'uno', b'dos', b'tres'])
+        await asyncio.sleep(0.1)
+        # Split into rows of up to 10 bytes
+        self.assertEqual(await asyncio.to_thread(self.stored), [(1, 0, 2), (2, 10, 0)])
+
+        writer.write(b'\ncuatro')
+        data += b'\ncuatro'
+        await writer.close()
+        self.assertEqual(await asyncio.to_thread(self.stored), [(1, 0, 2), (2, 10, 0), (3, 12, 1)])
+        self.assertEqual(await asyncio.to_thread(chunks.chunked_size, self.log.pk), (len(data), 4))
+        self.assertEqual(await asyncio.to_thread(chunks.read_chunks, self.log.pk), data)
+        self.assertEqual(await asyncio.to_thread(chunks.read_chunks, self.log.pk, 5, 8), data[5:13])
+
+    async def test_failed_rows_are_retried_in_order(self):
+        writer = self.writer(flush_interval=0.01)
+        insert = chunks.ChunkWriter._insert
+
+        def fail_once(rows):
+            if not failed:
+                failed.append(rows)
+                raise OperationalError('locked')
+            insert(rows)
+
+        failed = []
+        with mock.patch.object(chunks.ChunkWriter, '_insert', side_effect=fail_once), \
+                self.assertLogs('ejecutor.chunks', 'ERROR'):
+            writer.write(b'uno')
+            await asyncio.sleep(0.05)
+            writer.write(b'\ndos')
+            await writer.close()
+
+        self.assertEqual(writer.failures, 0)
+        self.assertEqual(await asyncio.to_thread(chunks.read_chunks, self.log.pk), b'uno\ndos')
+
+    async def test_gives_up_after_max_retries(self):
+        writer = self.writer(flush_interval=0.01, max_retries=3)
+        with mock.patch.object(chunks.ChunkWriter, '_insert', side_effect=OperationalError('down')) as insert, \
+                self.assertLogs('ejecutor.chunks', 'ERROR') as logs:
+            writer.write(b'x' * 100)
+            await asyncio.sleep(0.2)
+            writer.write(b'\nignorada')
+            await writer.close()
+
+        self.assertTrue(writer.given_up)
+        self.assertEqual(insert.call_count, 3)
+        self.assertEqual((writer._failed, bytes(writer._pending)), ([], b''))
+        self.assertIn('dropped 1 chunks (100 bytes) from offset 0', logs.output[-1])
@@ -0,0 +1,85 @@
+import asyncio
+import json
+from unittest import mock
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+
+from ejecutor.consumers import ExecutionConsumer
+from ejecutor.execution import ExecutionManager
+from ejecutor.streams import ReplayBuffer
+from ejecutor.transport import OutputTransport
+
+IN_MEMORY_LAYER = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+def batch(seq):
+    return {'type': 'execution_output', 'seq': seq, 'lines': [f'STDOUT: linea {seq}']}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class ExecutionConsumerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.transport = OutputTransport('local')
+        self.replay = ReplayBuffer()
+        patches = [
+            mock.patch.object(ExecutionManager, '_transport', self.transport),
+            mock.patch.dict(ExecutionManager.replays, {'x': self.replay}),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def communicator(self, query=''):
+        communicator = WebsocketCommunicator(ExecutionConsumer.as_asgi(), f'/ws/execution/x/{query}')
+        communicator.scope['user'] = User(username='user')
+        communicator.scope['url_route'] = {'kwargs': {'execution_id': 'x'}}
+        return communicator
+
+    async def receive_all(self, communicator):
+        messages = []
+        while not await communicator.receive_nothing(0.1):
+            messages.append(json.loads(await communicator.receive_from()))
+        return messages
+
+    async def test_output_during_connect_is_sent_once_and_in_order(self):
+        for seq in (1, 2):
+            self.replay.append(seq, batch(seq), 10)
+        replay = ExecutionConsumer.replay
+
+        async def replay_with_live_output(consumer, since):
+            # Output published while the client is being resumed
+            for seq in (2, 3):
+                self.transport.hub.publish('execution_x', batch(seq))
+            # Sending to a real socket lets other tasks run
+            await asyncio.sleep(0)
+            await replay(consumer, since)
+
+        communicator = self.communicator('?since=0')
+        with mock.patch.object(ExecutionConsumer, 'replay', replay_with_live_output):
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            messages = await self.receive_all(communicator)
+        await communicator.disconnect()
+
+        self.assertEqual(messages[0]['type'], 'connection_established')
+        self.assertEqual([message['seq'] for message in messages[1:]], [1, 2, 3])
+
+    async def test_output_before_accept_waits_for_the_handshake(self):
+        accept = ExecutionConsumer.accept
+
+        async def accept_after_live_output(consumer, *args, **kwargs):
+            self.transport.hub.publish('execution_x', batch(1))
+            await asyncio.sleep(0)
+            await accept(consumer, *args, **kwargs)
+
+        communicator = self.communicator()
+        with mock.patch.object(ExecutionConsumer, 'accept', accept_after_live_output):
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            messages = await self.receive_all(communicator)
+        await communicator.disconnect()
+
+        self.assertEqual([message['type'] for message in messages], ['connection_established', 'execution_output'])
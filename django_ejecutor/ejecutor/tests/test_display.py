@@ -0,0 +1,62 @@
+import asyncio
+import atexit
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ejecutor.execution import DisplayPool, DisplayUnavailableError, ExecutionManager, VirtualDisplay
+
+
+class LeaseDisplayTests(SimpleTestCase):
+
+    def use_pool(self, size, xvfb=True, starts=True):
+        with mock.patch('ejecutor.execution.shutil.which', return_value='/usr/bin/Xvfb' if xvfb else None):
+            pool = DisplayPool(size, warm_spares=0)
+        atexit.unregister(pool.cleanup)
+        patches = [
+            mock.patch.object(ExecutionManager, '_display_pool', pool),
+            mock.patch.object(ExecutionManager, 'DISPLAY_LEASE_TIMEOUT', 0.3),
+            mock.patch.object(VirtualDisplay, 'ensure_started', return_value=starts),
+            mock.patch.object(VirtualDisplay, 'is_healthy', return_value=starts),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return pool
+
+    async def test_leases_a_private_display(self):
+        pool = self.use_pool(2)
+        first = await ExecutionManager.lease_display('a')
+        second = await ExecutionManager.lease_display('b')
+
+        self.assertEqual((first.display, second.display), (':100', ':101'))
+        self.assertIs(pool.get('a'), first)
+
+    async def test_disabled_pool_runs_without_display(self):
+        self.use_pool(0)
+        self.assertIsNone(await ExecutionManager.lease_display('a'))
+
+    async def test_fails_without_xvfb(self):
+        self.use_pool(2, xvfb=False)
+        with self.assertRaisesMessage(DisplayUnavailableError, 'Xvfb no está instalado'):
+            await ExecutionManager.lease_display('a')
+
+    async def test_fails_when_the_display_does_not_start(self):
+        pool = self.use_pool(1, starts=False)
+        with self.assertRaises(DisplayUnavailableError):
+            await ExecutionManager.lease_display('a')
+        self.assertIsNone(pool.get('a'))
+
+    async def test_waits_for_a_released_display(self):
+        pool = self.use_pool(1)
+        first = await ExecutionManager.lease_display('a')
+        asyncio.get_running_loop().call_later(0.1, pool.release, 'a')
+
+        self.assertIs(await ExecutionManager.lease_display('b'), first)
+
+    async def test_fails_when_every_display_stays_leased(self):
+        self.use_pool(1)
+        await ExecutionManager.lease_display('a')
+
+        with self.assertRaisesMessage(DisplayUnavailableError, 'siguen ocupadas'):
+            await ExecutionManager.lease_display('b')
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from django.test import SimpleTestCase
+
+from ejecutor.output import OutputDiscardedError, OutputStore, fcntl, remove_stale_spill_files
+
+
+class OutputStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def make_store(self, **kwargs):
+        store = OutputStore(os.path.join(self.dir.name, 'run.log'), **kwargs)
+        self.addCleanup(store.discard)
+        return store
+
+    def test_offsets_and_ranges(self):
+        store = self.make_store(buffer_size=16)
+        offsets = [store.append(f'línea {i}') for i in range(100)]
+        data = '\n'.join(f'línea {i}' for i in range(100)).encode('utf-8')
+
+        self.assertEqual(store.size, len(data))
+        self.assertEqual(store.line_count, 100)
+        self.assertEqual(offsets[0], 0)
+        self.assertEqual(offsets[1], len('línea 0'.encode('utf-8')) + 1)
+        self.assertEqual(store.read(), data)
+        self.assertEqual(store.read(50, 30), data[50:80])
+        self.assertEqual(store.read(len(data) + 10, 5), b'')
+        self.assertEqual(b''.join(store.iter_chunks(block_size=7)), data)
+
+    def test_tail_is_bounded_and_reads_back_from_file(self):
+        store = self.make_store(tail_bytes=64)
+        for i in range(1000):
+            store.append(f'linea {i:04d}')
+
+        self.assertLessEqual(store._tail_size, 64 + len('linea 0000'))
+        self.assertEqual(store.tail(3), ['linea 0997', 'linea 0998', 'linea 0999'])
+        self.assertEqual(store.tail(50), [f'linea {i:04d}' for i in range(950, 1000)])
+        self.assertEqual(store.tail(0), [])
+
+    def test_sink_receives_exact_bytes(self):
+        received = bytearray()
+        store = self.make_store(sink=received.extend)
+        for line in ('a', '', 'ñ'):
+            store.append(line)
+        self.assertEqual(bytes(received), store.read())
+
+    def test_discarded_store_refuses_reads(self):
+        store = self.make_store()
+        store.append('salida')
+        blocks = store.iter_chunks()
+        store.discard()
+
+        self.assertFalse(os.path.exists(store.path))
+        for read in (store.read, store.iter_chunks):
+            with self.assertRaises(OutputDiscardedError):
+                read()
+        # A reader that opened the file before the discard keeps its copy
+        if fcntl is not None:
+            self.assertEqual(b''.join(blocks), b'salida')
+
+    @unittest.skipIf(fcntl is None, "Live spill files are recognised by their flock")
+    def test_remove_stale_spill_files(self):
+        live = self.make_store()
+        stale = os.path.join(self.dir.name, 'crashed.log')
+        other = os.path.join(self.dir.name, 'other.txt')
+        for path in (stale, other):
+            with open(path, 'w') as f:
+                f.write('x')
+
+        self.assertEqual(remove_stale_spill_files(self.dir.name), 1)
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ['other.txt', 'run.log'])
+        live.append('sigue viva')
+        self.assertEqual(live.read(), b'sigue viva')
+        self.assertEqual(remove_stale_spill_files(os.path.join(self.dir.name, 'missing')), 0)
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from ejecutor.models import ExecutableFile, ExecutionLog
+from ejecutor.pagination import KeysetPage, decode_cursor, encode_cursor
+
+
+class CursorTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        log = ExecutionLog(pk=42, executed_at=timezone.now())
+        self.assertEqual(decode_cursor(encode_cursor(log)), (log.executed_at, 42))
+
+    def test_malformed_cursor(self):
+        for cursor in ('', 'not-a-cursor', encode_cursor(ExecutionLog(pk=1, executed_at=timezone.now()))[:-4]):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class KeysetPageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        executable = ExecutableFile.objects.create(name='app', file_path='app.exe', type='preinstalled')
+        now = timezone.now()
+        logs = [ExecutionLog.objects.create(execution_uuid=f'00000000-0000-0000-0000-{n:012d}',
+                                            executable=executable) for n in range(7)]
+        # Pairs of logs share a timestamp, so the id has to break the ties
+        for n, log in enumerate(logs):
+            ExecutionLog.objects.filter(pk=log.pk).update(executed_at=now - timedelta(minutes=n // 2))
+        cls.newest_first = [logs[n].pk for n in (1, 0, 3, 2, 5, 4, 6)]
+
+    def page(self, **kwargs):
+        return KeysetPage(ExecutionLog.objects.all(), size=3, **kwargs)
+
+    def ids(self, page):
+        return [log.pk for log in page]
+
+    def test_walks_older_and_back(self):
+        first = self.page()
+        self.assertEqual(self.ids(first), self.newest_first[:3])
+        self.assertIsNone(first.previous_cursor)
+
+        second = self.page(after=first.next_cursor)
+        self.assertEqual(self.ids(second), self.newest_first[3:6])
+        third = self.page(after=second.next_cursor)
+        self.assertEqual(self.ids(third), self.newest_first[6:])
+        self.assertIsNone(third.next_cursor)
+
+        back = self.page(before=third.previous_cursor)
+        self.assertEqual(self.ids(back), self.newest_first[3:6])
+        self.assertEqual(self.ids(self.page(before=back.previous_cursor)), self.newest_first[:3])
+        self.assertFalse(self.page(before=back.previous_cursor).has_newer)
+
+    def test_page_size_is_exact(self):
+        page = KeysetPage(ExecutionLog.objects.all(), size=7)
+        self.assertEqual(len(page), 7)
+        self.assertFalse(page.has_older)
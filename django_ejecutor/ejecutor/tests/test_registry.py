@@ -0,0 +1,95 @@
+import asyncio
+import sys
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ejecutor.execution import ExecutionManager
+from ejecutor.registry import IS_WINDOWS, ExecutionRegistry
+from ejecutor.scheduler import ExecutionScheduler
+
+
+@unittest.skipIf(IS_WINDOWS, "Process groups are POSIX only")
+class ExecutionRegistryTests(SimpleTestCase):
+
+    async def spawn(self):
+        # A child that forks a grandchild, both in the new session
+        return await asyncio.create_subprocess_exec(
+            sys.executable, '-c', 'import subprocess, time; subprocess.Popen(["sleep", "30"]); time.sleep(30)',
+            start_new_session=True,
+        )
+
+    async def test_terminate_kills_the_tree_at_once(self):
+        registry = ExecutionRegistry()
+        process = await self.spawn()
+        entry = registry.register('a', process)
+        await asyncio.sleep(0.2)
+        children = entry.refresh_children()
+        self.assertTrue(children)
+
+        with self.assertLogs('ejecutor.registry', 'WARNING'):
+            self.assertTrue(registry.terminate('a'))
+        self.assertTrue(entry.cancelled)
+        self.assertEqual(await asyncio.wait_for(process.wait(), 5), -9)
+        await asyncio.sleep(0.1)
+        self.assertFalse([pid for pid in children if self.alive(pid)])
+
+    def test_terminate_unknown_execution(self):
+        self.assertFalse(ExecutionRegistry().terminate('x'))
+
+    @staticmethod
+    def alive(pid):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+        except OSError:
+            return False
+
+
+class KillExecutionTests(SimpleTestCase):
+
+    def setUp(self):
+        self.scheduler = ExecutionScheduler(max_concurrent=1, max_queued=5)
+        self.started = asyncio.Event()
+        self.cleaned_up = False
+        patches = [
+            mock.patch.object(ExecutionManager, '_scheduler', self.scheduler),
+            mock.patch.object(ExecutionManager, 'registry', ExecutionRegistry()),
+            mock.patch.object(ExecutionManager, 'publish'),
+            mock.patch.object(ExecutionManager, '_save_result'),
+        ]
+        for patcher in patches:
+            self.addCleanup(patcher.stop)
+        self.publish, self.save_result = [patcher.start() for patcher in patches][2:]
+
+    async def preparing(self):
+        """A run still waiting for its display or prefix clone."""
+        self.started.set()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.cleaned_up = True
+
+    async def test_cancels_a_run_that_has_no_process_yet(self):
+        self.scheduler.submit('a', self.preparing)
+        await self.started.wait()
+
+        self.assertTrue(await ExecutionManager.kill_execution('a'))
+        self.assertTrue(self.cleaned_up)
+        self.assertFalse(self.scheduler.is_running('a'))
+        self.save_result.assert_awaited_once_with(
+            'a', {'success': False, 'output': 'Ejecución cancelada antes de iniciar', 'exit_code': -1})
+
+    async def test_cancels_a_queued_run(self):
+        self.scheduler.submit('a', self.preparing)
+        self.scheduler.submit('b', self.preparing)
+
+        self.assertTrue(await ExecutionManager.kill_execution('b'))
+        self.assertEqual(self.scheduler.queued_count, 0)
+        self.save_result.assert_awaited_once()
+        self.assertTrue(await ExecutionManager.kill_execution('a'))
+
+    async def test_unknown_execution(self):
+        self.assertFalse(await ExecutionManager.kill_execution('x'))
+        self.save_result.assert_not_called()
@@ -0,0 +1,186 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.storage import InMemoryStorage
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ejecutor import retention, search
+from ejecutor.blobs import OutputBlobStore
+from ejecutor.execution import ExecutionManager
+from ejecutor.models import ArchivedExecutionLog, ExecutableFile, ExecutionLog, ExecutionLogArchive
+
+
+class RetentionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user')
+        cls.default = ExecutableFile.objects.create(name='default', file_path='a.exe', type='preinstalled')
+        cls.short = ExecutableFile.objects.create(name='short', file_path='b.exe', type='preinstalled',
+                                                  retention_days=1)
+        cls.forever = ExecutableFile.objects.create(name='forever', file_path='c.exe', type='preinstalled',
+                                                    retention_days=0)
+        cls.now = timezone.now()
+
+    def setUp(self):
+        storage = InMemoryStorage()
+        self.output_blobs = OutputBlobStore(storage=storage)
+        self.archive_blobs = OutputBlobStore(storage=storage, location='execution_logs/archive', suffix='.ndjson')
+        patcher = mock.patch.object(ExecutionManager, '_output_blobs', self.output_blobs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.count = 0
+
+    def create_log(self, executable, days_ago, output='salida'):
+        self.count += 1
+        log = ExecutionLog.objects.create(execution_uuid=f'00000000-0000-0000-0000-{self.count:012d}',
+                                          executable=executable, user=self.user, success=True, exit_code=0,
+                                          completed=True)
+        blob = self.output_blobs.save(log.execution_uuid, [output.encode('utf-8')])
+        # auto_now_add ignores the value given on create
+        ExecutionLog.objects.filter(pk=log.pk).update(executed_at=self.now - timedelta(days=days_ago),
+                                                      output_path=blob['path'], output_bytes=blob['size'])
+        search.index_output(log.pk, output.encode('utf-8'))
+        return ExecutionLog.objects.get(pk=log.pk)
+
+    def archiver(self, **kwargs):
+        kwargs.setdefault('default_days', 5)
+        return retention.LogArchiver(self.archive_blobs, self.output_blobs, **kwargs)
+
+    def test_expired_logs_follow_executable_and_default_policies(self):
+        logs = {
+            (executable.name, days): self.create_log(executable, days)
+            for executable in (self.default, self.short, self.forever) for days in (0.5, 2, 10)
+        }
+
+        def expired(default_days):
+            ids = set(retention.expired_logs(default_days, self.now).values_list('id', flat=True))
+            return {key for key, log in logs.items() if log.pk in ids}
+
+        self.assertEqual(expired(5), {('default', 10), ('short', 2), ('short', 10)})
+        self.assertEqual(expired(None), {('short', 2), ('short', 10)})
+        self.assertEqual(expired(0), {('short', 2), ('short', 10)})
+
+    def test_running_executions_never_expire(self):
+        log = self.create_log(self.short, 3)
+        ExecutionLog.objects.filter(pk=log.pk).update(completed=False)
+
+        self.assertFalse(retention.expired_logs(5, self.now).exists())
+        self.assertEqual(self.archiver().run(now=self.now)['logs'], 0)
+
+    def test_archive_and_load(self):
+        old = [self.create_log(self.default, 10 + n, output=f'antigua {n}') for n in range(5)]
+        recent = self.create_log(self.default, 1, output='reciente')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = self.archiver(segment_logs=2, batch_size=2).run(now=self.now)
+
+        self.assertEqual(stats['logs'], 5)
+        self.assertEqual(stats['archives'], 3)
+        self.assertEqual(ExecutionLogArchive.objects.count(), 3)
+        self.assertEqual(ArchivedExecutionLog.objects.count(), 5)
+        self.assertEqual(list(ExecutionLog.objects.values_list('pk', flat=True)), [recent.pk])
+
+        archiver = self.archiver()
+        for n, log in enumerate(old):
+            loaded = archiver.load(log.execution_uuid)
+            self.assertEqual(loaded.pk, log.pk)
+            # Django's JSON serializer keeps milliseconds
+            self.assertEqual(loaded.executed_at, log.executed_at.replace(
+                microsecond=log.executed_at.microsecond // 1000 * 1000))
+            self.assertEqual((loaded.executable_id, loaded.user_id), (self.default.pk, self.user.pk))
+            # The output blob is kept
+            self.assertEqual(self.output_blobs.read(loaded.output_path), f'antigua {n}'.encode('utf-8'))
+        self.assertIsNone(archiver.load('no-existe'))
+
+        if search.backend() is not None:
+            self.assertEqual(search.search_ids('antigua'), [])
+            self.assertEqual(search.search_ids('reciente'), [recent.pk])
+
+    def test_run_again_archives_nothing(self):
+        self.create_log(self.short, 3)
+        self.assertEqual(self.archiver().run(now=self.now)['logs'], 1)
+        self.assertEqual(self.archiver().run(now=self.now), {'logs': 0, 'archives': 0, 'bytes': 0})
+
+    def test_logs_already_archived_are_only_deleted(self):
+        log = self.create_log(self.short, 3)
+        archiver = self.archiver()
+        archiver._archive([log.pk])
+
+        stats = archiver.run(now=self.now)
+        self.assertEqual((stats['logs'], stats['archives']), (1, 0))
+        self.assertEqual(ArchivedExecutionLog.objects.count(), 1)
+        self.assertFalse(ExecutionLog.objects.exists())
+
+    def test_load_clears_deleted_user(self):
+        log = self.create_log(self.short, 3)
+        self.archiver().run(now=self.now)
+        User.objects.filter(pk=self.user.pk).delete()
+
+        self.assertIsNone(self.archiver().load(log.execution_uuid).user_id)
+
+    def test_delete_mode_removes_output(self):
+        log = self.create_log(self.short, 3)
+
+        # The blob is deleted once the deletion is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = self.archiver(archive=False).run(now=self.now)
+        self.assertEqual((stats['logs'], stats['archives']), (1, 0))
+        self.assertFalse(ExecutionLog.objects.exists())
+        self.assertFalse(ExecutionLogArchive.objects.exists())
+        self.assertFalse(self.output_blobs.storage.exists(log.output_path))
+
+    def test_limit(self):
+        for days in (3, 4, 5):
+            self.create_log(self.short, days)
+
+        self.assertEqual(self.archiver().run(now=self.now, limit=2)['logs'], 2)
+        self.assertEqual(ExecutionLog.objects.count(), 1)
+
+
+class LeaseTests(TestCase):
+
+    def test_one_holder_at_a_time(self):
+        now = timezone.now()
+        self.assertTrue(retention.acquire_lease('job', 'a', 60, now=now))
+        self.assertFalse(retention.acquire_lease('job', 'b', 60, now=now + timedelta(seconds=30)))
+        # The holder renews its own lease
+        self.assertTrue(retention.acquire_lease('job', 'a', 60, now=now + timedelta(seconds=30)))
+        self.assertFalse(retention.acquire_lease('job', 'b', 60, now=now + timedelta(seconds=80)))
+        # Another process takes it over once it expires
+        self.assertTrue(retention.acquire_lease('job', 'b', 60, now=now + timedelta(seconds=90)))
+        self.assertFalse(retention.acquire_lease('job', 'a', 60, now=now + timedelta(seconds=100)))
+
+    def test_leases_are_independent(self):
+        self.assertTrue(retention.acquire_lease('job', 'a', 60))
+        self.assertTrue(retention.acquire_lease('other', 'b', 60))
+
+    def run_job(self, has_lease):
+        archiver = mock.Mock()
+        archiver.run.return_value = {'logs': 0, 'archives': 0, 'bytes': 0}
+        job = retention.RetentionJob(archiver, interval=0.01, initial_delay=0)
+        with mock.patch('ejecutor.retention.acquire_lease', return_value=has_lease) as acquire, \
+                mock.patch('ejecutor.retention.connection'):
+            job.start()
+            job._stop.wait(0.1)
+            job.stop()
+            job._thread.join()
+        acquire.assert_called_with('log-retention', job.holder, 0.01)
+        return archiver
+
+    def test_job_runs_only_with_the_lease(self):
+        self.run_job(has_lease=False).run.assert_not_called()
+        self.run_job(has_lease=True).run.assert_called()
+
+    def test_command_loop_runs_the_job_in_the_foreground(self):
+        with mock.patch('ejecutor.retention.RetentionJob.run', side_effect=KeyboardInterrupt) as run, \
+                mock.patch.object(ExecutionManager, 'LOG_RETENTION_INTERVAL', 3600):
+            call_command('archive_execution_logs', '--loop', stdout=StringIO())
+        run.assert_called_once_with()
+
+        with self.assertRaises(CommandError):
+            call_command('archive_execution_logs', '--loop', '--limit', '5')
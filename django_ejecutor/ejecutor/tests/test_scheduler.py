@@ -0,0 +1,112 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from ejecutor.scheduler import ExecutionScheduler, QueueFullError
+
+
+class ExecutionSchedulerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.started = []
+        self.releases = {}
+        self.notifications = []
+
+    def job(self, execution_id, fail=False):
+        """A job that records its start and waits until released."""
+        release = self.releases[execution_id] = asyncio.Event()
+
+        async def run():
+            self.started.append(execution_id)
+            await release.wait()
+            if fail:
+                raise RuntimeError('boom')
+        return run
+
+    async def notify(self, execution_id, position, queued):
+        self.notifications.append((execution_id, position, queued))
+
+    async def finish(self, scheduler, execution_id):
+        self.releases[execution_id].set()
+        await scheduler._running[execution_id]
+        # Let the jobs dispatched by the finished one start
+        await asyncio.sleep(0)
+
+    async def drain(self, scheduler):
+        """Release every job and wait until the scheduler is idle."""
+        while scheduler._running:
+            for release in self.releases.values():
+                release.set()
+            await asyncio.gather(*scheduler._running.values(), return_exceptions=True)
+
+    async def test_runs_in_fifo_order(self):
+        scheduler = ExecutionScheduler(max_concurrent=1, max_queued=5)
+
+        self.assertEqual([scheduler.submit(name, self.job(name)) for name in 'abcd'], [0, 1, 2, 3])
+        await asyncio.sleep(0)
+        self.assertEqual(self.started, ['a'])
+        self.assertEqual((scheduler.running_count, scheduler.queued_count), (1, 3))
+        self.assertEqual(scheduler.position('c'), 2)
+
+        for name in 'abc':
+            await self.finish(scheduler, name)
+        self.assertEqual(self.started, ['a', 'b', 'c', 'd'])
+        self.assertTrue(scheduler.is_running('d'))
+        await self.finish(scheduler, 'd')
+        self.assertEqual((scheduler.running_count, scheduler.queued_count), (0, 0))
+
+    async def test_rejects_when_the_queue_is_full(self):
+        scheduler = ExecutionScheduler(max_concurrent=1, max_queued=1, retry_after=30)
+        scheduler.submit('a', self.job('a'))
+        scheduler.submit('b', self.job('b'))
+
+        with self.assertRaises(QueueFullError) as raised:
+            scheduler.submit('c', self.job('c'))
+        self.assertEqual((raised.exception.queued, raised.exception.limit, raised.exception.retry_after), (1, 1, 30))
+        self.assertEqual(scheduler.queued_count, 1)
+        await self.drain(scheduler)
+
+    async def test_cancel_queued_job(self):
+        scheduler = ExecutionScheduler(max_concurrent=1, max_queued=5, notify=self.notify)
+        for name in 'abc':
+            scheduler.submit(name, self.job(name))
+        await asyncio.sleep(0)
+
+        self.assertTrue(scheduler.cancel('b'))
+        # Running and unknown executions are not in the queue
+        self.assertFalse(scheduler.cancel('a'))
+        self.assertFalse(scheduler.cancel('x'))
+        self.assertEqual(scheduler.position('c'), 1)
+
+        await self.finish(scheduler, 'a')
+        await self.finish(scheduler, 'c')
+        self.assertEqual(self.started, ['a', 'c'])
+
+    async def test_failed_job_frees_its_slot(self):
+        scheduler = ExecutionScheduler(max_concurrent=1, max_queued=5)
+        scheduler.submit('a', self.job('a', fail=True))
+        scheduler.submit('b', self.job('b'))
+        await asyncio.sleep(0)
+
+        with self.assertLogs('ejecutor.scheduler', 'ERROR'):
+            await self.finish(scheduler, 'a')
+        self.assertEqual(self.started, ['a', 'b'])
+        await self.drain(scheduler)
+
+    async def test_notifies_queue_positions(self):
+        scheduler = ExecutionScheduler(max_concurrent=1, max_queued=5, notify=self.notify)
+        for name in 'abc':
+            scheduler.submit(name, self.job(name))
+        # Pending notifications are referenced until they have run
+        self.assertEqual(len(scheduler._notifications), 2)
+        await asyncio.sleep(0)
+        self.assertEqual(self.notifications, [('b', 1, 1), ('c', 2, 2)])
+        # Done callbacks run on the next loop iteration
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler._notifications, set())
+
+        self.notifications.clear()
+        await self.finish(scheduler, 'a')
+        await asyncio.sleep(0)
+        self.assertEqual(self.notifications, [('b', 0, 1), ('c', 1, 1)])
+        await self.drain(scheduler)
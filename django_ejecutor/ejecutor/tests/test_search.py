@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.core.files.storage import InMemoryStorage
+from django.test import SimpleTestCase, TestCase
+
+from ejecutor import search
+from ejecutor.blobs import OutputBlobStore
+from ejecutor.execution import ExecutionManager
+from ejecutor.models import ExecutableFile, ExecutionLog
+
+
+class QueryTests(SimpleTestCase):
+
+    def test_fts5_query(self):
+        cases = [
+            ('error', '"error"'),
+            ('error fatal', '"error" "fatal"'),
+            ('"file not found" code', '"file not found" "code"'),
+            ('err*', '"err"*'),
+            ('"err*"', '"err*"'),
+            ('OR NOT AND', '"OR" "NOT" "AND"'),
+            ('say"hi', '"say""hi"'),
+            ('col:value', '"col:value"'),
+            ('* "" ', ''),
+            ('', ''),
+        ]
+        for query, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual(search.fts5_query(query), expected)
+
+    def test_query_terms(self):
+        self.assertEqual(search.query_terms('  "file not found" err* ""  x'), ['file not found', 'err', 'x'])
+
+    def test_snippets_fold_case_and_accents(self):
+        lines = ['nada', 'Línea con ERROR <b>', 'otra linea']
+        self.assertEqual(search.snippets(lines, ['linea', 'error']), [
+            '<mark>Línea</mark> con <mark>ERROR</mark> &lt;b&gt;',
+            'otra <mark>linea</mark>',
+        ])
+
+    def test_snippets_cut_long_lines(self):
+        line = 'x' * 300 + 'needle' + 'y' * 300
+        [snippet] = search.snippets([line], ['needle'], width=20)
+        self.assertEqual(snippet, '…' + 'x' * 10 + '<mark>needle</mark>' + 'y' * 4 + '…')
+
+    def test_iter_lines_joins_chunks(self):
+        chunks = [b'uno\ndo', b's\n', 'tr\xc3'.encode('latin-1'), b'\xa9s']
+        self.assertEqual(list(search.iter_lines(chunks)), ['uno', 'dos', 'trés'])
+
+
+class IndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.executable = ExecutableFile.objects.create(name='app', file_path='app.exe', type='preinstalled')
+
+    def setUp(self):
+        if search.backend() is None:
+            self.skipTest("Full-text search is not available on this database")
+        self.blobs = OutputBlobStore(storage=InMemoryStorage(), segment_size=64)
+        patcher = mock.patch.object(ExecutionManager, '_output_blobs', self.blobs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_log(self, n, output):
+        log = ExecutionLog.objects.create(execution_uuid=f'00000000-0000-0000-0000-{n:012d}',
+                                          executable=self.executable, completed=True)
+        data = output.encode('utf-8')
+        blob = self.blobs.save(log.execution_uuid, [data])
+        ExecutionLog.objects.filter(pk=log.pk).update(output_path=blob['path'])
+        log.output_path = blob['path']
+        # Index fewer bytes than stored, cutting a character in two, like SEARCH_INDEX_MAX_BYTES does
+        search.index_output(log.pk, data[:len(data) - 3])
+        return log
+
+    def test_deleted_logs_leave_the_index(self):
+        first = self.create_log(1, 'arranque correcto\n' * 20 + 'Excepción en módulo ñandú')
+        second = self.create_log(2, 'arranque fallido\nexcepcion fin')
+
+        self.assertEqual(search.search_ids('arranque'), [second.pk, first.pk])
+        self.assertEqual(search.search_ids('excepcion'), [second.pk, first.pk])
+
+        first.delete()
+        # The ids are read from the index alone, without joining the logs
+        self.assertEqual(search.search_ids('arranque'), [second.pk])
+        self.assertEqual(search.search_ids('correcto'), [])
+        self.assertEqual(search.search_ids('ñandu'), [])
+
+    def test_deleting_the_executable_removes_its_logs_from_the_index(self):
+        self.create_log(1, 'salida uno')
+        self.create_log(2, 'salida dos')
+
+        self.executable.delete()
+        self.assertEqual(search.search_ids('salida'), [])
+
+    def test_output_is_indexed_once(self):
+        log = self.create_log(1, 'primera salida')
+        search.index_output(log.pk, b'segunda salida')
+
+        self.assertEqual(search.search_ids('primera'), [log.pk])
+        self.assertEqual(search.search_ids('segunda'), [])
+
+    def test_rebuild_index(self):
+        log = self.create_log(1, 'salida original')
+        search.clear_index()
+        self.assertEqual(search.search_ids('original'), [])
+
+        self.assertEqual(search.rebuild_index(self.blobs, 1024), 1)
+        self.assertEqual(search.search_ids('original'), [log.pk])
+        log.delete()
+        self.assertEqual(search.search_ids('original'), [])
@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.core.files.storage import InMemoryStorage
+from django.db import transaction
+from django.test import TestCase
+
+from ejecutor.blobs import OutputBlobStore
+from ejecutor.execution import ExecutionManager
+from ejecutor.models import ArchivedExecutionLog, ExecutableFile, ExecutionLog, ExecutionLogArchive
+
+
+class DeleteOutputBlobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.executable = ExecutableFile.objects.create(name='app', file_path='app.exe', type='preinstalled')
+
+    def setUp(self):
+        self.blobs = OutputBlobStore(storage=InMemoryStorage())
+        patcher = mock.patch.object(ExecutionManager, '_output_blobs', self.blobs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_log(self, n):
+        log = ExecutionLog.objects.create(execution_uuid=f'00000000-0000-0000-0000-{n:012d}',
+                                          executable=self.executable, completed=True)
+        log.output_path = self.blobs.save_text(log.execution_uuid, f'salida {n}')['path']
+        log.save(update_fields=['output_path'])
+        return log
+
+    def exists(self, log):
+        return self.blobs.storage.exists(log.output_path)
+
+    def test_cascade_and_queryset_deletes_remove_the_blob(self):
+        first, second = self.create_log(1), self.create_log(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            ExecutionLog.objects.filter(pk=first.pk).delete()
+        self.assertFalse(self.exists(first))
+        self.assertFalse(self.blobs.storage.exists(first.output_path + '.idx'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.executable.delete()
+        self.assertFalse(self.exists(second))
+
+    def test_blob_stays_until_the_delete_is_committed(self):
+        log = self.create_log(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                log.delete()
+                raise RuntimeError
+        self.assertTrue(self.exists(log))
+
+    def test_archived_log_keeps_its_blob(self):
+        log = self.create_log(1)
+        archive = ExecutionLogArchive.objects.create(path='archive.ndjson.gz', log_count=1)
+        ArchivedExecutionLog.objects.create(archive=archive, execution_uuid=log.execution_uuid, offset=0, length=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            log.delete()
+        self.assertTrue(self.exists(log))
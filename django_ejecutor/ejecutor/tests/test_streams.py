@@ -0,0 +1,189 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from ejecutor.streams import FlowControl, LineSplitter, LiveViewLimiter, OutputBatcher, ReplayBuffer
+
+
+class LineSplitterTests(SimpleTestCase):
+
+    def feed(self, splitter, *chunks):
+        return [splitter.feed(chunk) for chunk in chunks] + [splitter.flush()]
+
+    def test_lines_across_chunks(self):
+        splitter = LineSplitter()
+        self.assertEqual(self.feed(splitter, b'uno\ndo', b's\r\ntr', b'es'), [
+            [(b'uno', False)],
+            [(b'dos', False)],
+            [],
+            [(b'tres', False)],
+        ])
+        self.assertEqual(splitter.pending, b'')
+
+    def test_superseded_progress_in_one_chunk_is_dropped(self):
+        splitter = LineSplitter()
+        self.assertEqual(splitter.feed(b'10%\r50%\r100%\nfin\n'), [(b'100%', False), (b'fin', False)])
+        self.assertEqual(splitter.feed(b'10%\r50%\rlisto'), [(b'50%', True)])
+        self.assertEqual(splitter.pending, b'listo')
+
+    def test_trailing_carriage_return_is_reported_at_once(self):
+        splitter = LineSplitter()
+        self.assertEqual(splitter.feed(b'10%\r'), [(b'10%', True)])
+        self.assertEqual(splitter.pending, b'')
+        self.assertEqual(splitter.feed(b'50%\r'), [(b'50%', True)])
+        self.assertEqual(splitter.feed(b'100%\r'), [(b'100%', True)])
+        # The last state of the progress line is kept at the end of the stream
+        self.assertEqual(splitter.flush(), [(b'100%', False)])
+
+    def test_crlf_split_across_chunks(self):
+        splitter = LineSplitter()
+        self.assertEqual(self.feed(splitter, b'linea\r', b'\nsiguiente\r', b'\n'), [
+            [(b'linea', True)],
+            [(b'linea', False), (b'siguiente', True)],
+            [(b'siguiente', False)],
+            [],
+        ])
+
+    def test_long_lines_are_cut_on_character_boundaries(self):
+        splitter = LineSplitter(max_line_length=4)
+        self.assertEqual(splitter.feed('abcñdef\n'.encode('utf-8')),
+                         [(b'abc', False), ('ñde'.encode('utf-8'), False), (b'f', False)])
+        self.assertEqual(splitter.feed(b'0123456789'), [(b'0123', False), (b'4567', False)])
+        self.assertEqual(splitter.flush(), [(b'89', False)])
+
+
+class OutputBatcherTests(SimpleTestCase):
+
+    def setUp(self):
+        self.batches = []
+
+    async def send(self, lines, progress, seq):
+        self.batches.append((lines, progress, seq))
+
+    async def test_flushes_on_line_count(self):
+        batcher = OutputBatcher(self.send, max_lines=2, max_delay=10)
+        for line in ('a', 'b', 'c'):
+            await batcher.add(line)
+        self.assertEqual(self.batches, [(['a', 'b'], [], 1)])
+        await batcher.flush()
+        self.assertEqual(self.batches[1], (['c'], [], 2))
+
+    async def test_flushes_on_size(self):
+        batcher = OutputBatcher(self.send, max_bytes=5, max_delay=10)
+        await batcher.add('abc')
+        self.assertEqual(self.batches, [])
+        await batcher.add('def')
+        self.assertEqual(self.batches, [(['abc', 'def'], [], 1)])
+
+    async def test_size_counts_utf8_bytes(self):
+        batcher = OutputBatcher(self.send, max_bytes=8, max_delay=10)
+        await batcher.add('ñandú')
+        self.assertEqual(self.batches, [])
+        # 'ññ' is 2 characters but 4 bytes
+        await batcher.add('ññ')
+        self.assertEqual(self.batches, [(['ñandú', 'ññ'], [], 1)])
+
+    async def test_flushes_after_delay(self):
+        batcher = OutputBatcher(self.send, max_delay=0.01)
+        await batcher.add('a')
+        self.assertEqual(self.batches, [])
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.batches, [(['a'], [], 1)])
+
+    async def test_progress_updates_rewrite_their_line(self):
+        batcher = OutputBatcher(self.send, max_delay=10)
+        await batcher.add('STDOUT: 10%', progress=True, key='STDOUT')
+        await batcher.add('STDERR: aviso', key='STDERR')
+        await batcher.add('STDOUT: 50%', progress=True, key='STDOUT')
+        await batcher.flush()
+        self.assertEqual(self.batches, [(['STDOUT: 50%', 'STDERR: aviso'], [0], 1)])
+
+        # A finished line replaces the progress line; the next update starts a new one
+        await batcher.add('STDOUT: 90%', progress=True, key='STDOUT')
+        await batcher.add('STDOUT: hecho', key='STDOUT')
+        await batcher.add('STDOUT: 1/3', progress=True, key='STDOUT')
+        await batcher.flush()
+        self.assertEqual(self.batches[1], (['STDOUT: hecho', 'STDOUT: 1/3'], [1], 2))
+
+    async def test_flush_without_lines_sends_nothing(self):
+        batcher = OutputBatcher(self.send)
+        await batcher.flush()
+        self.assertEqual(self.batches, [])
+
+
+class LiveViewLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.batches = []
+
+    async def send(self, lines, progress, seq):
+        self.batches.extend(lines)
+
+    async def test_rate_policy_reports_skipped_lines(self):
+        now = [0.0]
+        live = LiveViewLimiter(OutputBatcher(self.send, max_delay=10), policy='rate', max_rate=2,
+                               clock=lambda: now[0])
+        for n in range(5):
+            await live.add(f'linea {n}')
+        now[0] = 1.0
+        await live.add('linea 5')
+        await live.flush()
+        self.assertEqual(self.batches, ['linea 0', 'linea 1',
+                                        '[... 3 líneas omitidas en la vista en vivo ...]', 'linea 5'])
+        self.assertEqual(live.skipped_total, 3)
+
+    async def test_tail_policy_sends_the_last_lines(self):
+        live = LiveViewLimiter(OutputBatcher(self.send, max_delay=10), policy='tail', tail_lines=2, interval=10)
+        for n in range(5):
+            await live.add(f'linea {n}')
+        await live.add('Fin', always=True)
+        await live.flush()
+        self.assertEqual(self.batches, ['[... 3 líneas omitidas en la vista en vivo ...]',
+                                        'linea 3', 'linea 4', 'Fin'])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            LiveViewLimiter(None, policy='sample')
+
+
+class ReplayBufferTests(SimpleTestCase):
+
+    def test_since(self):
+        replay = ReplayBuffer()
+        for seq in (1, 2, 3):
+            replay.append(seq, {'seq': seq}, 10)
+
+        self.assertEqual(replay.last_seq, 3)
+        self.assertEqual(replay.since(1), ([{'seq': 2}, {'seq': 3}], False))
+        self.assertEqual(replay.since(3), ([], False))
+        self.assertEqual(replay.since(0), ([{'seq': 1}, {'seq': 2}, {'seq': 3}], False))
+
+    def test_eviction_reports_a_gap(self):
+        replay = ReplayBuffer(max_batches=2, max_bytes=25)
+        for seq in (1, 2, 3):
+            replay.append(seq, {'seq': seq}, 10)
+
+        self.assertEqual(replay.since(1), ([{'seq': 2}, {'seq': 3}], False))
+        self.assertEqual(replay.since(0), ([{'seq': 2}, {'seq': 3}], True))
+        replay.append(4, {'seq': 4}, 20)
+        self.assertEqual(replay.since(2), ([{'seq': 4}], True))
+
+    def test_keeps_the_latest_batch_even_if_too_large(self):
+        replay = ReplayBuffer(max_bytes=5)
+        replay.append(1, {'seq': 1}, 100)
+        self.assertEqual(replay.since(0), ([{'seq': 1}], False))
+
+
+class FlowControlTests(SimpleTestCase):
+
+    def test_ack_releases_outstanding_bytes(self):
+        flow = FlowControl(window=100)
+        for seq in (1, 2, 3):
+            flow.sent(seq, 60)
+        self.assertTrue(flow.lagging)
+
+        flow.ack(2)
+        self.assertEqual((flow.outstanding, flow.acked), (60, 2))
+        self.assertFalse(flow.lagging)
+        flow.ack(1)
+        self.assertEqual(flow.acked, 2)
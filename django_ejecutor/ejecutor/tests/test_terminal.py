@@ -0,0 +1,39 @@
+import asyncio
+import sys
+import unittest
+
+from django.test import SimpleTestCase
+
+from ejecutor.registry import IS_WINDOWS
+
+if not IS_WINDOWS:
+    from ejecutor.terminal import PseudoTerminal
+
+
+@unittest.skipIf(IS_WINDOWS, "Pseudo-terminals are POSIX only")
+class PseudoTerminalTests(SimpleTestCase):
+
+    async def run_in_terminal(self, *cmd):
+        terminal = PseudoTerminal()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *terminal.command(cmd), stdin=terminal.slave, stdout=terminal.slave, stderr=terminal.slave,
+                start_new_session=True,
+            )
+            terminal.spawned()
+            output = await asyncio.wait_for(terminal.reader.read(), 5)
+            return await process.wait(), output.decode().strip()
+        finally:
+            terminal.close()
+
+    async def test_command_gets_the_terminal_as_controlling_tty(self):
+        code, output = await self.run_in_terminal(
+            sys.executable, '-c',
+            'import os; open("/dev/tty").close(); print(os.getsid(0) == os.getpid() == os.tcgetpgrp(0))',
+        )
+        self.assertEqual((code, output), (0, 'True'))
+
+    async def test_missing_command(self):
+        code, output = await self.run_in_terminal('/nonexistent/app')
+        self.assertEqual(code, 127)
+        self.assertIn('/nonexistent/app', output)
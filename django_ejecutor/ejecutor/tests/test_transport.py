@@ -0,0 +1,81 @@
+import asyncio
+
+from django.test import SimpleTestCase, override_settings
+
+from ejecutor.transport import LocalHub, OutputTransport
+
+IN_MEMORY_LAYER = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+async def drain(subscription, timeout=0.2):
+    """Return every event delivered to a subscription until it stays idle for ``timeout``."""
+    events = []
+    while True:
+        try:
+            events.append(await asyncio.wait_for(subscription.get(), timeout))
+        except asyncio.TimeoutError:
+            return events
+
+
+class LocalHubTests(SimpleTestCase):
+
+    async def test_publish_filters_by_relayed(self):
+        hub = LocalHub()
+        direct = hub.subscribe('g')
+        relayed = hub.subscribe('g')
+        relayed.relayed = True
+
+        self.assertEqual(hub.publish('g', {'n': 1}, relayed=False), 1)
+        self.assertEqual(hub.publish('g', {'n': 2}, relayed=True), 1)
+        self.assertEqual(hub.publish('g', {'n': 3}), 2)
+
+        self.assertEqual(await drain(direct, 0.05), [{'n': 1}, {'n': 3}])
+        self.assertEqual(await drain(relayed, 0.05), [{'n': 2}, {'n': 3}])
+
+    async def test_unsubscribe_drops_empty_group(self):
+        hub = LocalHub()
+        subscription = hub.subscribe('g')
+        subscription.close()
+        self.assertEqual(hub.subscriber_count('g'), 0)
+        self.assertEqual(hub.publish('g', {}), 0)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class OutputTransportTests(SimpleTestCase):
+
+    async def test_hybrid_delivers_once_to_relayed_and_direct_subscribers(self):
+        transport = OutputTransport('hybrid')
+        # A viewer that subscribed before the execution became local to this process
+        relayed = await transport.subscribe('execution_x', is_local_execution=False)
+        direct = await transport.subscribe('execution_x', is_local_execution=True)
+        try:
+            for n in range(3):
+                await transport.publish('execution_x', {'type': 'execution_status', 'n': n})
+
+            expected = [{'type': 'execution_status', 'n': n} for n in range(3)]
+            self.assertEqual(await drain(direct), expected)
+            self.assertEqual(await drain(relayed), expected)
+        finally:
+            await transport.unsubscribe(relayed)
+            await transport.unsubscribe(direct)
+            transport.relay._task.cancel()
+
+    async def test_channel_layer_mode_delivers_through_relay_only(self):
+        transport = OutputTransport('channel_layer')
+        subscription = await transport.subscribe('execution_y', is_local_execution=True)
+        try:
+            await transport.publish('execution_y', {'type': 'execution_output', 'lines': ['a']})
+            self.assertEqual(await drain(subscription), [{'type': 'execution_output', 'lines': ['a']}])
+        finally:
+            await transport.unsubscribe(subscription)
+            transport.relay._task.cancel()
+
+    async def test_local_mode_never_uses_channel_layer(self):
+        transport = OutputTransport('local')
+        subscription = await transport.subscribe('execution_z', is_local_execution=False)
+        try:
+            await transport.publish('execution_z', {'type': 'execution_status'})
+            self.assertEqual(await drain(subscription), [{'type': 'execution_status'}])
+            self.assertIsNone(transport.relay._task)
+        finally:
+            await transport.unsubscribe(subscription)
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qsl
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ejecutor.execution import ExecutionManager
+from ejecutor.models import ExecutableFile, ExecutionLog
+from ejecutor.scheduler import QueueFullError
+from ejecutor.views import LOGS_PAGE_SIZE
+
+
+class ExecutionLogsViewTests(TestCase):
+    """The logs page costs the same number of queries however many rows it shows."""
+
+    # Session, user, log page and the executable and user choices of the filter form
+    PAGE_QUERIES = 5
+    # Filtering by executable and user also validates both choices
+    FILTERED_PAGE_QUERIES = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='x', is_staff=True)
+        users = [User.objects.create_user(f'user{i}') for i in range(3)]
+        executables = [
+            ExecutableFile.objects.create(name=f'app{i}', file_path=f'app{i}.exe', type='preinstalled')
+            for i in range(3)
+        ]
+        now = timezone.now()
+        logs = [
+            ExecutionLog(execution_uuid=f'00000000-0000-0000-0000-{i:012d}',
+                         executable=executables[i % 3], user=users[i % 3],
+                         success=i % 2 == 0, completed=True)
+            for i in range(3 * LOGS_PAGE_SIZE)
+        ]
+        ExecutionLog.objects.bulk_create(logs)
+        # auto_now_add ignores the value given on create
+        for i, log in enumerate(ExecutionLog.objects.order_by('id')):
+            ExecutionLog.objects.filter(pk=log.pk).update(executed_at=now - timedelta(minutes=i))
+        cls.executable = executables[0]
+        cls.user = users[0]
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        self.url = reverse('execution_logs')
+
+    def get_page(self, expected_queries, params=None):
+        with self.assertNumQueries(expected_queries):
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_first_page(self):
+        response = self.get_page(self.PAGE_QUERIES)
+        self.assertEqual(len(response.context['logs']), LOGS_PAGE_SIZE)
+        self.assertIsNotNone(response.context['next_page_url'])
+
+    def test_cursor_page(self):
+        first = self.get_page(self.PAGE_QUERIES)
+        next_url = first.context['next_page_url']
+        second = self.get_page(self.PAGE_QUERIES, dict(parse_qsl(next_url[1:])))
+
+        first_ids = [log.pk for log in first.context['logs']]
+        second_ids = [log.pk for log in second.context['logs']]
+        self.assertEqual(len(second_ids), LOGS_PAGE_SIZE)
+        self.assertFalse(set(first_ids) & set(second_ids))
+        self.assertIsNotNone(second.context['previous_page_url'])
+
+    def test_filtered_pages(self):
+        params = {'executable': self.executable.pk, 'user': self.user.pk, 'success': '1'}
+        first = self.get_page(self.FILTERED_PAGE_QUERIES, params)
+        logs = first.context['logs']
+        self.assertTrue(logs)
+        self.assertTrue(all(log.executable_id == self.executable.pk and log.user_id == self.user.pk
+                            and log.success for log in logs))
+
+        date_params = {'date_from': timezone.localdate() - timedelta(days=1), 'date_to': timezone.localdate()}
+        response = self.get_page(self.PAGE_QUERIES, date_params)
+        self.assertEqual(len(response.context['logs']), LOGS_PAGE_SIZE)
+        next_url = response.context['next_page_url']
+        self.get_page(self.PAGE_QUERIES, dict(parse_qsl(next_url[1:])))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.get_page(self.PAGE_QUERIES, {'after': 'not-a-cursor'})
+        self.assertEqual(len(response.context['logs']), LOGS_PAGE_SIZE)
+
+
+class ExecuteExecutableViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', password='x')
+        cls.executable = ExecutableFile.objects.create(name='app', file_path='app.exe', type='preinstalled',
+                                                       command_args='/S')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('execute_executable', args=[self.executable.pk])
+
+    def test_additional_arguments_follow_the_executable_arguments(self):
+        with mock.patch.object(ExecutionManager, 'start_execution', return_value='abc') as start:
+            response = self.client.post(self.url, {'arguments': '-v --fast'})
+        self.assertRedirects(response, reverse('realtime_execution', args=['abc']), fetch_redirect_response=False)
+        start.assert_called_once_with(self.executable, '/S -v --fast', self.user, '127.0.0.1')
+
+        with mock.patch.object(ExecutionManager, 'start_execution', return_value='abc') as start:
+            self.client.post(self.url, {'arguments': ''})
+        self.assertEqual(start.call_args.args[1], '/S')
+
+    def test_form_starts_without_the_executable_arguments(self):
+        response = self.client.get(self.url)
+        self.assertIsNone(response.context['form']['arguments'].value())
+        self.assertContains(response, '<code>/S</code>', html=True)
+
+    def test_full_queue_answers_429(self):
+        with mock.patch.object(ExecutionManager, 'start_execution', side_effect=QueueFullError(5, 5, 30)):
+            response = self.client.post(self.url, {'arguments': ''})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
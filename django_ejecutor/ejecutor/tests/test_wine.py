@@ -0,0 +1,150 @@
+import asyncio
+import atexit
+import os
+import socket
+import subprocess
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ejecutor.wine import PrefixCloner, WineServer, WineServerPool
+
+
+class PrefixClonerTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.golden = os.path.join(tmp.name, 'golden')
+        self.clones_dir = os.path.join(tmp.name, 'clones')
+        os.makedirs(os.path.join(self.golden, 'drive_c', 'windows'))
+        for name, content in (('system.reg', 'reg'), ('drive_c/windows/win.ini', '[windows]')):
+            with open(os.path.join(self.golden, name), 'w') as f:
+                f.write(content)
+
+    def read(self, root, name):
+        with open(os.path.join(root, name)) as f:
+            return f.read()
+
+    def test_writes_to_a_clone_leave_the_golden_prefix_alone(self):
+        cloner = PrefixCloner(self.golden, self.clones_dir, strategy='copy')
+        clone = cloner.clone()
+        self.addCleanup(cloner.discard, clone)
+
+        with open(os.path.join(clone.path, 'drive_c/windows/win.ini'), 'r+') as f:
+            f.write('[changed]')
+        self.assertEqual(self.read(self.golden, 'drive_c/windows/win.ini'), '[windows]')
+        self.assertNotEqual(os.stat(os.path.join(clone.path, 'system.reg')).st_ino,
+                            os.stat(os.path.join(self.golden, 'system.reg')).st_ino)
+
+    def test_hardlink_is_not_a_strategy(self):
+        cloner = PrefixCloner(self.golden, self.clones_dir, strategy='hardlink')
+        self.assertIn(cloner.strategy, PrefixCloner.STRATEGIES)
+        self.assertNotIn('hardlink', PrefixCloner.STRATEGIES)
+
+    def test_failed_strategy_falls_back(self):
+        cloner = PrefixCloner(self.golden, self.clones_dir, strategy='reflink')
+        with mock.patch('ejecutor.wine.subprocess.run', side_effect=subprocess.CalledProcessError(1, 'cp')):
+            clone = cloner.clone()
+        self.addCleanup(cloner.discard, clone)
+        self.assertEqual(clone.strategy, 'copy')
+        self.assertEqual(self.read(clone.path, 'system.reg'), 'reg')
+
+    def test_discard_removes_the_clone(self):
+        cloner = PrefixCloner(self.golden, self.clones_dir, strategy='copy')
+        clone = cloner.clone()
+        cloner.discard(clone)
+        self.assertFalse(os.path.exists(clone.root))
+
+
+class FakeProcess:
+    returncode = None
+
+    def poll(self):
+        return None
+
+
+class WineServerPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.pool = WineServerPool(startup_timeout=1.0)
+        self.addCleanup(atexit.unregister, self.pool.cleanup)
+        self.started = []
+
+        def start(server):
+            self.started.append(server.prefix)
+            server.process = FakeProcess()
+
+        def is_healthy(server):
+            # The socket shows up a little after the process starts
+            return server.process is not None and self.ready
+
+        self.ready = False
+        # A wineserver started outside the pool serves the prefix
+        self.external_running = False
+        patches = [
+            mock.patch.object(WineServer, 'start', start),
+            mock.patch.object(WineServer, 'is_healthy', is_healthy),
+            mock.patch.object(WineServer, 'accepts_clients', lambda server: self.external_running),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_concurrent_ensure_starts_one_server_per_prefix(self):
+        async def become_ready():
+            await asyncio.sleep(0.1)
+            self.ready = True
+
+        servers = await asyncio.gather(
+            *(self.pool.ensure('/prefix/a') for _ in range(5)),
+            self.pool.ensure('/prefix/b'),
+            become_ready(),
+        )
+        self.assertEqual(sorted(self.started), ['/prefix/a', '/prefix/b'])
+        self.assertEqual(len({id(server) for server in servers[:5]}), 1)
+
+    async def test_healthy_server_is_reused(self):
+        self.ready = True
+        first = await self.pool.ensure('/prefix/a')
+        second = await self.pool.ensure('/prefix/a')
+        self.assertIs(first, second)
+        self.assertEqual(self.started, ['/prefix/a'])
+
+    async def test_external_server_is_used(self):
+        self.external_running = True
+        server = await self.pool.ensure('/prefix/a')
+        self.assertTrue(server.external)
+        self.assertIsNone(server.process)
+        self.assertEqual(self.started, [])
+
+
+class WineServerTests(SimpleTestCase):
+
+    def test_shutdown_stops_only_its_own_process(self):
+        server = WineServer('/prefix/a')
+        server.process = process = mock.Mock()
+        process.poll.return_value = None
+
+        with mock.patch('ejecutor.wine.subprocess.run') as run:
+            server.shutdown()
+        run.assert_not_called()
+        process.terminate.assert_called_once_with()
+        self.assertIsNone(server.process)
+
+    def test_accepts_clients(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'socket')
+        server = WineServer(tmp.name)
+
+        with mock.patch.object(WineServer, 'socket_path', return_value=path):
+            self.assertFalse(server.accepts_clients())
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+                listener.bind(path)
+                listener.listen()
+                self.assertTrue(server.accepts_clients())
+            # The socket file of a server that is gone
+            self.assertTrue(os.path.exists(path))
+            self.assertFalse(server.accepts_clients())
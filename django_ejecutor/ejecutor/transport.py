@@ -0,0 +1,238 @@
+"""
+Delivery of execution events to WebSocket consumers.
+
+Events can go through the channel layer (Redis), through in-memory queues
+when the consumer runs in the same process as the execution, or both.
+"""
+import asyncio
+import logging
+
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSubscription:
+    """
+    An in-process subscriber to a group: an asyncio queue on the subscriber's loop.
+    Several subscriptions may share one queue to receive events of many groups.
+    """
+
+    def __init__(self, hub, group, queue=None):
+        self.hub = hub
+        self.group = group
+        self.queue = queue if queue is not None else asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+        # Whether events arrive through the NodeRelay (set by OutputTransport.subscribe)
+        self.relayed = False
+
+    def deliver(self, event):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.queue.put_nowait(event)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class LocalHub:
+    """Groups of in-process subscribers. Events are handed over without serialization."""
+
+    def __init__(self):
+        self._groups = {}
+
+    def subscribe(self, group, queue=None):
+        subscription = LocalSubscription(self, group, queue)
+        self._groups.setdefault(group, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._groups.get(subscription.group)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._groups[subscription.group]
+
+    def subscriber_count(self, group):
+        return len(self._groups.get(group, ()))
+
+    def publish(self, group, event, relayed=None):
+        """
+        Deliver an event to the local subscribers of ``group``; returns how many.
+        ``relayed`` limits delivery to subscriptions that are (True) or are not
+        (False) fed by the NodeRelay; None delivers to all of them.
+        """
+        subscribers = self._groups.get(group)
+        if not subscribers:
+            return 0
+        delivered = 0
+        for subscription in list(subscribers):
+            if relayed is None or subscription.relayed == relayed:
+                subscription.deliver(event)
+                delivered += 1
+        return delivered
+
+
+class NodeRelay:
+    """
+    The single channel-layer subscription of this process.
+
+    The relay joins an execution's group once, however many local consumers
+    watch it, and fans the events it receives out through the LocalHub, so
+    the channel layer writes one message per node rather than per viewer.
+    Groups are reference-counted and left when their last watcher goes.
+    """
+
+    # Key carrying the group name through the channel layer
+    GROUP_KEY = 'relay_group'
+
+    def __init__(self, hub):
+        self.hub = hub
+        self._channel_layer = None
+        self._channel = None
+        self._task = None
+        self._refs = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def groups(self):
+        return list(self._refs)
+
+    async def acquire(self, group):
+        async with self._lock:
+            if self._channel is None:
+                self._channel_layer = get_channel_layer()
+                self._channel = await self._channel_layer.new_channel()
+                self._task = asyncio.create_task(self._receive_loop())
+            count = self._refs.get(group, 0)
+            if count == 0:
+                await self._channel_layer.group_add(group, self._channel)
+            self._refs[group] = count + 1
+
+    async def release(self, group):
+        async with self._lock:
+            count = self._refs.get(group, 0) - 1
+            if count > 0:
+                self._refs[group] = count
+                return
+            self._refs.pop(group, None)
+            if self._channel is not None:
+                try:
+                    await self._channel_layer.group_discard(group, self._channel)
+                except Exception as e:
+                    logger.warning(f"Could not leave group {group}: {e}")
+
+    async def _receive_loop(self):
+        while True:
+            try:
+                event = await self._channel_layer.receive(self._channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error receiving relayed events: {e}")
+                await asyncio.sleep(1)
+                continue
+            group = event.pop(self.GROUP_KEY, None)
+            if group is not None:
+                # Subscribers fed directly by a publisher in this process already have it
+                self.hub.publish(group, event, relayed=True)
+
+
+class OutputTransport:
+    """
+    Publish execution events according to ``mode``:
+
+    - ``channel_layer``: every event goes through the channel layer.
+    - ``local``: only in-process subscribers receive events (single-node).
+    - ``hybrid``: in-process subscribers get events directly, and the channel
+      layer carries them to consumers in other processes.
+
+    Consumers always subscribe to the LocalHub through ``subscribe()``. Events
+    that must come through the channel layer reach it via the process's
+    NodeRelay. A subscription is fed by exactly one path: publishing here
+    delivers directly only to subscriptions that are not relayed, and the
+    relay only to those that are, so no consumer receives an event twice even
+    when a relayed viewer and the execution share a process.
+    """
+
+    MODES = ('channel_layer', 'local', 'hybrid')
+
+    def __init__(self, mode='hybrid', hub=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown output transport mode: {mode}")
+        self.mode = mode
+        self.hub = hub or LocalHub()
+        self.relay = NodeRelay(self.hub)
+
+    @property
+    def uses_local(self):
+        return self.mode != 'channel_layer'
+
+    @property
+    def uses_channel_layer(self):
+        return self.mode != 'local'
+
+    def use_local(self, is_local_execution):
+        """Whether events of an execution reach this process without the channel layer."""
+        return self.mode == 'local' or (self.mode == 'hybrid' and is_local_execution)
+
+    async def subscribe(self, group, is_local_execution, queue=None):
+        """Subscribe to a group in-process, relaying it from the channel layer if needed."""
+        subscription = self.hub.subscribe(group, queue)
+        subscription.relayed = not self.use_local(is_local_execution)
+        if subscription.relayed:
+            try:
+                await self.relay.acquire(group)
+            except Exception:
+                subscription.close()
+                raise
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        subscription.close()
+        if subscription.relayed:
+            await self.relay.release(subscription.group)
+
+    async def publish(self, group, event):
+        if self.uses_local:
+            self.hub.publish(group, event, relayed=False if self.uses_channel_layer else None)
+        if self.uses_channel_layer:
+            channel_layer = get_channel_layer()
+            if channel_layer is not None:
+                await channel_layer.group_send(group, {**event, NodeRelay.GROUP_KEY: group})
+
+
+class GroupListener:
+    """
+    Receive the events of one group outside a consumer, as an async context manager.
+    ``local`` tells whether the execution runs in this process.
+    """
+
+    def __init__(self, transport, group, local):
+        self.transport = transport
+        self.group = group
+        self.local = local
+        self._subscription = None
+
+    async def __aenter__(self):
+        self._subscription = await self.transport.subscribe(self.group, self.local)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.transport.unsubscribe(self._subscription)
+
+    async def get(self, timeout=None):
+        """Return the next event, or None if none arrives within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self._subscription.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
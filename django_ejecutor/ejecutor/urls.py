@@ -16,6 +16,10 @@ urlpatterns = [
     path('ejecutables/categoria/<int:category_id>/', views.list_executables, name='list_executables_by_category'),
     path('ejecutar/<int:executable_id>/', views.execute_executable, name='execute_executable'),
     path('ejecutar/realtime/<str:execution_id>/', views.realtime_execution, name='realtime_execution'),
+    path('ejecutar/cancelar/<str:execution_id>/', views.cancel_execution, name='cancel_execution'),
+    path('ejecutar/salida/<str:execution_id>/', views.execution_output, name='execution_output'),
+    path('ejecutar/stream/<str:execution_id>/', views.execution_stream, name='execution_stream'),
+    path('ejecutar/descargar/<str:execution_id>/', views.execution_output_download, name='execution_output_download'),
 
     # Admin views (hidden behind key combination + login)
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
@@ -24,6 +28,7 @@ urlpatterns = [
     path('edit/<int:executable_id>/', views.edit_executable, name='edit_executable'),
     path('toggle/<int:executable_id>/', views.toggle_executable, name='toggle_executable'),
     path('logs/', views.execution_logs, name='execution_logs'),
+    path('logs/buscar/', views.execution_search, name='execution_search'),
 
     # AJAX endpoints
     path('check-admin-key/', views.check_admin_key_combination, name='check_admin_key'),
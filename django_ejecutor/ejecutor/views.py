@@ -5,12 +5,14 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import authenticate, login, logout
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponseRedirect, Http404, StreamingHttpResponse
 from django.urls import reverse
 from django.contrib import messages
 from django.middleware.csrf import get_token
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
+from django.db import DatabaseError
+from asgiref.sync import async_to_sync, sync_to_async
 import json
 from functools import wraps
 
@@ -19,9 +21,33 @@ from .forms import (
     ExecutableFileUploadForm,
     PreinstalledExecutableForm,
     ExecutableSelectionForm,
-    ExecutableArgumentsForm
+    ExecutableArgumentsForm,
+    ExecutionLogFilterForm
 )
 from .execution import ExecutionManager
+from .pagination import KeysetPage
+from .scheduler import QueueFullError
+from . import search
+
+# Tamaño máximo de página del endpoint de salida
+OUTPUT_PAGE_SIZE = 256 * 1024
+
+# Registros por página del historial de ejecuciones
+LOGS_PAGE_SIZE = 50
+
+# Búsqueda de texto completo: resultados por página del endpoint JSON,
+# fragmentos por resultado y coincidencias como máximo en el historial
+SEARCH_PAGE_SIZE = 20
+SEARCH_SNIPPETS = 3
+LOGS_SEARCH_LIMIT = 1000
+
+# Nombre del evento SSE para cada tipo de mensaje de ejecución
+SSE_EVENT_NAMES = {
+    'execution_output': 'output',
+    'execution_status': 'status',
+    'execution_queue': 'queue',
+    'execution_resync': 'resync',
+}
 
 def staff_required(view_func):
     """Decorador para verificar si el usuario es staff."""
@@ -129,12 +155,25 @@ def execute_executable(request, executable_id):
     if request.method == 'POST':
         form = ExecutableArgumentsForm(request.POST)
         if form.is_valid():
-            args = form.cleaned_data.get('command_args', '')
+            args = ' '.join(filter(None, [executable.command_args, form.cleaned_data.get('arguments', '')]))
             manager = ExecutionManager()
-            execution_id = manager.start_execution(executable, args, request.user)
+            try:
+                execution_id = manager.start_execution(
+                    executable, args, request.user, request.META.get('REMOTE_ADDR')
+                )
+            except QueueFullError as e:
+                messages.error(request, str(e))
+                response = render(request, 'ejecutor/execute_executable.html', {
+                    'executable': executable,
+                    'form': form,
+                }, status=429)
+                if e.retry_after:
+                    response['Retry-After'] = str(e.retry_after)
+                return response
             return redirect('realtime_execution', execution_id=execution_id)
     else:
-        form = ExecutableArgumentsForm(initial={'command_args': executable.command_args})
+        # Only the additional arguments: the executable's own are added on submit
+        form = ExecutableArgumentsForm()
     return render(request, 'ejecutor/execute_executable.html', {
         'executable': executable,
         'form': form,
@@ -143,18 +182,129 @@ def execute_executable(request, executable_id):
 @login_required
 def realtime_execution(request, execution_id):
     """Vista para mostrar la ejecución en tiempo real."""
-    execution = get_object_or_404(ExecutionLog, execution_uuid=execution_id)
+    execution = get_execution_or_404(execution_id)
     return render(request, 'ejecutor/realtime_execution.html', {
         'execution': execution,
+        'log': execution,
+        'executable': execution.executable,
+        'execution_id': execution.execution_uuid,
     })
 
+def get_execution_or_404(execution_id, fields=None):
+    """Buscar una ejecución, también entre las archivadas, o responder 404."""
+    execution = ExecutionManager.find_log(execution_id, fields)
+    if execution is None:
+        raise Http404('Ejecución no encontrada')
+    return execution
+
+def can_access_execution(user, execution):
+    """Solo el usuario que inició la ejecución o el staff pueden acceder a ella."""
+    return user.is_staff or execution.user_id == user.id
+
+@login_required
+def execution_output(request, execution_id):
+    """Devolver un rango de bytes de la salida de una ejecución."""
+    execution = get_execution_or_404(execution_id, ['id', 'user_id'])
+    if not can_access_execution(request.user, execution):
+        return JsonResponse({'status': 'error', 'message': 'No autorizado'}, status=403)
+
+    try:
+        offset = int(request.GET.get('offset', 0))
+        length = int(request.GET.get('length', OUTPUT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'offset y length deben ser enteros'}, status=400)
+    length = min(max(length, 0), OUTPUT_PAGE_SIZE)
+
+    page = ExecutionManager.read_output(execution_id, offset, length)
+    if page is None:
+        return JsonResponse({'status': 'error', 'message': 'Ejecución no encontrada'}, status=404)
+    return JsonResponse({'execution_id': execution_id, **page})
+
+@login_required
+def execution_output_download(request, execution_id):
+    """Descargar la salida completa de una ejecución, descomprimida por segmentos."""
+    execution = get_execution_or_404(execution_id, ['id', 'user_id'])
+    if not can_access_execution(request.user, execution):
+        return JsonResponse({'status': 'error', 'message': 'No autorizado'}, status=403)
+
+    response = StreamingHttpResponse(ExecutionManager.iter_output(execution_id),
+                                     content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{execution_id}.log"'
+    return response
+
+def format_sse(event):
+    """Formatear un evento de ejecución como mensaje Server-Sent Events."""
+    if event['type'] == 'keepalive':
+        return ': keepalive\n\n'
+    payload = {key: value for key, value in event.items() if key != 'type'}
+    name = 'complete' if event.get('complete') else SSE_EVENT_NAMES.get(event['type'], event['type'])
+    message = f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+    if event.get('seq') is not None:
+        message = f"id: {event['seq']}\n" + message
+    return message
+
+def format_ndjson(event):
+    """Formatear un evento de ejecución como una línea JSON."""
+    return json.dumps(event) + '\n'
+
+@login_required
+async def execution_stream(request, execution_id):
+    """
+    Transmitir la salida de una ejecución por HTTP: Server-Sent Events por
+    defecto, o JSON delimitado por líneas con ?format=ndjson. Se reanuda a
+    partir del encabezado Last-Event-ID o del parámetro ?since=.
+    """
+    user = await request.auser()
+    execution = await sync_to_async(get_execution_or_404)(execution_id, ['id', 'user_id'])
+    if not can_access_execution(user, execution):
+        return JsonResponse({'status': 'error', 'message': 'No autorizado'}, status=403)
+
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since') or '0'
+    if not since.isdigit():
+        return JsonResponse({'status': 'error', 'message': 'since debe ser un entero'}, status=400)
+
+    ndjson = request.GET.get('format') == 'ndjson'
+    formatter = format_ndjson if ndjson else format_sse
+
+    async def stream():
+        if not ndjson:
+            yield 'retry: 3000\n\n'
+        async for event in ExecutionManager.stream_events(execution_id, int(since)):
+            yield formatter(event)
+
+    response = StreamingHttpResponse(
+        stream(),
+        content_type='application/x-ndjson' if ndjson else 'text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Evitar que proxies como nginx almacenen la respuesta en búfer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+@require_http_methods(["POST"])
+def cancel_execution(request, execution_id):
+    """Cancelar una ejecución en curso o en cola."""
+    execution = get_object_or_404(ExecutionLog, execution_uuid=execution_id)
+    if not can_access_execution(request.user, execution):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'No tiene permisos para cancelar esta ejecución.'
+        }, status=403)
+
+    cancelled = async_to_sync(ExecutionManager.kill_execution)(execution_id)
+    return JsonResponse({
+        'status': 'cancelled' if cancelled else 'not_running',
+        'execution_id': execution_id,
+    }, status=200 if cancelled else 409)
+
 # Admin views
 @staff_required
 def admin_dashboard(request):
     """Administrative dashboard."""
     executables = ExecutableFile.objects.all()
     categories = ExecutableCategory.objects.all()
-    recent_logs = ExecutionLog.objects.all().order_by('-executed_at')[:10]
+    recent_logs = ExecutionLog.objects.select_related('executable', 'user').order_by('-executed_at', '-id')[:10]
 
     context = {
         'executables': executables,
@@ -240,9 +390,95 @@ def toggle_executable(request, executable_id):
 @staff_required
 @ensure_csrf_cookie_wrapped
 def execution_logs(request):
-    """Vista para ver logs de ejecución."""
-    logs = ExecutionLog.objects.all().order_by('-executed_at')
-    return render(request, 'ejecutor/execution_logs.html', {'logs': logs})
+    """
+    Vista para ver logs de ejecución, paginada por cursor sobre
+    (executed_at, id) para que cada página cueste lo mismo sin importar su
+    profundidad.
+    """
+    filter_form = ExecutionLogFilterForm(request.GET or None)
+    logs = filter_form.filter(ExecutionLog.objects.select_related('executable', 'user'))
+    query = request.GET.get('q', '').strip()
+    if query:
+        if search.backend() is None:
+            messages.warning(request, 'La búsqueda en la salida no está disponible con esta base de datos.')
+        else:
+            logs = logs.filter(pk__in=search.search_ids(query, limit=LOGS_SEARCH_LIMIT))
+    try:
+        page = KeysetPage(logs, after=request.GET.get('after'), before=request.GET.get('before'),
+                          size=LOGS_PAGE_SIZE)
+    except ValueError:
+        messages.error(request, 'Cursor de paginación no válido.')
+        page = KeysetPage(logs, size=LOGS_PAGE_SIZE)
+
+    # Enlaces de página que conservan los filtros
+    params = request.GET.copy()
+    for key in ('after', 'before'):
+        params.pop(key, None)
+    filters = params.urlencode()
+
+    def page_url(key, cursor):
+        if cursor is None:
+            return None
+        params[key] = cursor
+        url = f'?{params.urlencode()}'
+        params.pop(key)
+        return url
+
+    return render(request, 'ejecutor/execution_logs.html', {
+        'logs': page.items,
+        'filter_form': filter_form,
+        'first_page_url': f'?{filters}' if page.has_newer else None,
+        'next_page_url': page_url('after', page.next_cursor),
+        'previous_page_url': page_url('before', page.previous_cursor),
+    })
+
+@staff_required
+def execution_search(request):
+    """
+    Buscar texto en la salida de las ejecuciones terminadas. Devuelve las
+    coincidencias más recientes primero, con fragmentos resaltados; ?before=
+    continúa a partir del next_before de una respuesta anterior.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'status': 'error', 'message': 'Falta el parámetro q'}, status=400)
+    if search.backend() is None:
+        return JsonResponse({'status': 'error', 'message': 'Búsqueda no disponible con esta base de datos'},
+                            status=503)
+    try:
+        before = int(request.GET['before']) if 'before' in request.GET else None
+        limit = min(max(int(request.GET.get('limit', SEARCH_PAGE_SIZE)), 1), SEARCH_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'before y limit deben ser enteros'}, status=400)
+
+    try:
+        ids = search.search_ids(query, limit=limit, before_id=before)
+    except DatabaseError as e:
+        return JsonResponse({'status': 'error', 'message': f'Consulta no válida: {e}'}, status=400)
+
+    logs = ExecutionLog.objects.select_related('executable', 'user').in_bulk(ids)
+    terms = search.query_terms(query)
+    results = []
+    for log_id in ids:
+        log = logs.get(log_id)
+        if log is None:
+            continue
+        lines = search.iter_lines(ExecutionManager.iter_output(log.execution_uuid))
+        results.append({
+            'execution_id': log.execution_uuid,
+            'executable': log.executable.name,
+            'user': log.user.username if log.user else None,
+            'executed_at': log.executed_at.isoformat(),
+            'success': log.success,
+            'exit_code': log.exit_code,
+            'output_url': reverse('execution_output_download', args=[log.execution_uuid]),
+            'snippets': search.snippets(lines, terms, limit=SEARCH_SNIPPETS),
+        })
+    return JsonResponse({
+        'query': query,
+        'results': results,
+        'next_before': ids[-1] if len(ids) == limit else None,
+    })
 
 @staff_required
 @ensure_csrf_cookie_wrapped
@@ -0,0 +1,404 @@
+"""
+Wine runtime helpers: persistent wineserver processes kept warm per prefix and
+copy-on-write clones of a golden prefix for per-execution isolation.
+"""
+import os
+import asyncio
+import atexit
+import logging
+import shutil
+import socket
+import subprocess
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class WineServer:
+    """
+    A persistent ``wineserver -p`` bound to one Wine prefix.
+
+    If a wineserver the pool did not start already serves the prefix, it is
+    used as is (``external``) instead of failing to start a second one.
+    """
+
+    def __init__(self, prefix, arch=None):
+        self.prefix = prefix
+        self.arch = arch
+        self.process = None
+        self.external = False
+
+    def env(self):
+        """Environment selecting this server's prefix."""
+        env = {**os.environ, 'WINEPREFIX': self.prefix, 'WINEDEBUG': '-all'}
+        if self.arch:
+            env['WINEARCH'] = self.arch
+        return env
+
+    def socket_path(self):
+        """Path of the server socket Wine clients connect to, or None if the prefix is missing."""
+        try:
+            st = os.stat(self.prefix)
+        except OSError:
+            return None
+        return os.path.join(
+            f'/tmp/.wine-{os.getuid()}', f'server-{st.st_dev:x}-{st.st_ino:x}', 'socket'
+        )
+
+    def accepts_clients(self):
+        """Whether some wineserver is listening on the prefix's socket (a stale file is not)."""
+        socket_path = self.socket_path()
+        if socket_path is None or not os.path.exists(socket_path):
+            return False
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(0.5)
+            try:
+                sock.connect(socket_path)
+            except OSError:
+                return False
+        return True
+
+    def is_healthy(self):
+        """The server process is alive and its socket is accepting clients."""
+        if self.external:
+            return self.accepts_clients()
+        if self.process is None or self.process.poll() is not None:
+            return False
+        socket_path = self.socket_path()
+        return socket_path is not None and os.path.exists(socket_path)
+
+    def start(self):
+        """Start wineserver in the foreground (``-f``) so we own it, never exiting (``-p``)."""
+        self.process = subprocess.Popen(
+            ['wineserver', '-f', '-p'],
+            env=self.env(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        logger.info(f"Persistent wineserver started for {self.prefix} (pid {self.process.pid})")
+
+    def shutdown(self):
+        """
+        Stop the server process started here. Not ``wineserver -k``: that would
+        also kill the Wine processes of other executions sharing the prefix. An
+        external server is left alone.
+        """
+        self.external = False
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+class WineServerPool:
+    """Lazily started, health-checked persistent wineservers, one per prefix."""
+
+    def __init__(self, startup_timeout=5.0):
+        self.startup_timeout = startup_timeout
+        self._servers = {}
+        # Held by ensure() from the health check until the server is ready
+        self._start_locks = {}
+        self._lock = threading.Lock()
+        atexit.register(self.cleanup)
+
+    @staticmethod
+    def available():
+        return bool(shutil.which('wineserver'))
+
+    def get(self, prefix, arch=None):
+        with self._lock:
+            server = self._servers.get(prefix)
+            if server is None:
+                server = self._servers[prefix] = WineServer(prefix, arch)
+            return server
+
+    async def ensure(self, prefix, arch=None):
+        """
+        Return a healthy wineserver for ``prefix``, (re)starting it if needed.
+        Concurrent calls for the same prefix start at most one server; the
+        others wait for it.
+
+        Raises:
+            TimeoutError: if the server socket does not appear in time.
+        """
+        server = self.get(prefix, arch)
+        with self._lock:
+            lock = self._start_locks.setdefault(prefix, asyncio.Lock())
+
+        async with lock:
+            if server.is_healthy():
+                return server
+
+            if server.process is not None or server.external:
+                logger.warning(f"wineserver for {prefix} is not healthy, restarting")
+                await asyncio.to_thread(server.shutdown)
+
+            # ``wineserver -p`` exits at once if another one serves the prefix
+            if await asyncio.to_thread(server.accepts_clients):
+                return self._adopt(server)
+
+            await asyncio.to_thread(server.start)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.startup_timeout
+            while not server.is_healthy():
+                if server.process.poll() is not None:
+                    if await asyncio.to_thread(server.accepts_clients):
+                        return self._adopt(server)
+                    raise RuntimeError(f"wineserver exited with code {server.process.returncode}")
+                if loop.time() > deadline:
+                    raise TimeoutError(f"wineserver for {prefix} did not become ready")
+                await asyncio.sleep(0.05)
+            return server
+
+    @staticmethod
+    def _adopt(server):
+        logger.info(f"Using the wineserver already running for {server.prefix}")
+        server.process = None
+        server.external = True
+        return server
+
+    def release(self, prefix):
+        """Shut down and forget the server of a prefix."""
+        with self._lock:
+            server = self._servers.pop(prefix, None)
+            self._start_locks.pop(prefix, None)
+        if server:
+            server.shutdown()
+
+    def cleanup(self):
+        """Shut down every managed wineserver on exit."""
+        with self._lock:
+            servers = list(self._servers.values())
+            self._servers.clear()
+        for server in servers:
+            try:
+                server.shutdown()
+            except Exception as e:
+                logger.error(f"Error shutting down wineserver for {server.prefix}: {e}")
+        if servers:
+            logger.info("Persistent wineservers shut down")
+
+
+class PrefixClone:
+    """A throwaway Wine prefix derived from the golden prefix."""
+
+    def __init__(self, root, path, strategy):
+        self.root = root
+        self.path = path
+        self.strategy = strategy
+        self.execution_id = None
+
+
+class PrefixCloner:
+    """
+    Clone a pre-booted golden prefix as cheaply as the host allows.
+
+    Strategies, from cheapest to most expensive:
+
+    - ``overlay``: overlayfs mount (kernel overlay as root, else fuse-overlayfs)
+      with a private upper dir; O(1).
+    - ``reflink``: ``cp --reflink=always``; metadata-only copy on btrfs/XFS.
+    - ``copy``: plain recursive copy, always works.
+
+    Hardlinks are not an option: programs write in place to arbitrary files of
+    the prefix (ini files, app data, ``system32`` configuration), and through a
+    link that write would change the golden prefix and every other clone.
+    """
+
+    STRATEGIES = ('overlay', 'reflink', 'copy')
+
+    def __init__(self, golden, clones_dir, strategy='auto'):
+        self.golden = golden
+        self.clones_dir = clones_dir
+        self._requested = strategy
+        self._strategy = None
+
+    @property
+    def strategy(self):
+        if self._strategy is None:
+            self._strategy = self._detect_strategy()
+            logger.info(f"Wine prefix clone strategy: {self._strategy}")
+            if self._strategy == 'copy' and self._requested != 'copy':
+                logger.warning("Neither overlay nor reflink clones are available; every execution "
+                               "copies the whole Wine prefix")
+        return self._strategy
+
+    def _detect_strategy(self):
+        os.makedirs(self.clones_dir, exist_ok=True)
+        if self._requested in self.STRATEGIES:
+            return self._requested
+        if self._requested != 'auto':
+            logger.warning(f"Unknown prefix clone strategy {self._requested}, detecting one")
+
+        if self._overlay_command():
+            return 'overlay'
+
+        probe = os.path.join(self.clones_dir, f'.probe-{uuid.uuid4().hex}')
+        source = os.path.join(self.golden, 'system.reg')
+        if not os.path.exists(source):
+            return 'copy'
+        try:
+            result = subprocess.run(['cp', '--reflink=always', source, probe],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return 'reflink' if result.returncode == 0 else 'copy'
+        except OSError:
+            return 'copy'
+        finally:
+            if os.path.lexists(probe):
+                os.unlink(probe)
+
+    @staticmethod
+    def _overlay_command():
+        if os.geteuid() == 0 and shutil.which('mount'):
+            try:
+                with open('/proc/filesystems') as f:
+                    if 'overlay' in f.read():
+                        return ['mount', '-t', 'overlay', 'overlay', '-o']
+            except OSError:
+                pass
+        if shutil.which('fuse-overlayfs'):
+            return ['fuse-overlayfs', '-o']
+        return None
+
+    def clone(self):
+        """
+        Create a new clone. Blocking; run it off the event loop.
+
+        If the detected strategy fails (e.g. overlay mounts denied inside a
+        container) the cloner permanently falls back to the next one.
+        """
+        while True:
+            root = os.path.join(self.clones_dir, uuid.uuid4().hex)
+            strategy = self.strategy
+            try:
+                return self._clone(root, strategy)
+            except (OSError, subprocess.CalledProcessError) as e:
+                shutil.rmtree(root, ignore_errors=True)
+                if strategy == 'copy':
+                    raise
+                fallback = self.STRATEGIES[self.STRATEGIES.index(strategy) + 1]
+                logger.warning(f"Prefix clone strategy {strategy} failed ({e}), falling back to {fallback}")
+                self._strategy = fallback
+
+    def _clone(self, root, strategy):
+        path = os.path.join(root, 'prefix')
+        os.makedirs(root)
+
+        if strategy == 'overlay':
+            upper, work = os.path.join(root, 'upper'), os.path.join(root, 'work')
+            for d in (upper, work, path):
+                os.makedirs(d)
+            options = f'lowerdir={self.golden},upperdir={upper},workdir={work}'
+            subprocess.run(self._overlay_command() + [options, path], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elif strategy == 'reflink':
+            subprocess.run(['cp', '-a', '--reflink=always', self.golden, path], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        else:
+            shutil.copytree(self.golden, path, symlinks=True)
+
+        return PrefixClone(root, path, strategy)
+
+    def discard(self, clone):
+        """Remove a clone from disk. Blocking; run it off the event loop."""
+        self._unmount(clone)
+        shutil.rmtree(clone.root, ignore_errors=True)
+
+    def keep(self, clone):
+        """Release a clone but leave its files (or overlay upper dir) for inspection."""
+        self._unmount(clone)
+        logger.info(f"Kept Wine prefix clone at {clone.root}")
+
+    @staticmethod
+    def _unmount(clone):
+        if clone.strategy != 'overlay' or not os.path.ismount(clone.path):
+            return
+        command = ['umount', clone.path] if os.geteuid() == 0 else ['fusermount', '-u', clone.path]
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class PrefixPool:
+    """
+    Hand out per-execution prefix clones, keeping a few warm spares ready.
+
+    Spares are cloned ahead of time with their wineserver already running, so
+    an execution pays neither the clone nor the wineserver start-up.
+    Released clones are discarded or kept according to ``policy``:
+    ``'discard'``, ``'keep'`` or ``'keep_on_failure'``.
+    """
+
+    POLICIES = ('discard', 'keep', 'keep_on_failure')
+
+    def __init__(self, cloner, servers, warm_spares=1, policy='discard', arch=None):
+        self.cloner = cloner
+        self.servers = servers
+        self.warm_spares = max(0, int(warm_spares))
+        self.policy = policy if policy in self.POLICIES else 'discard'
+        self.arch = arch
+        self._spares = []
+        self._in_use = {}
+        self._refill_task = None
+        atexit.register(self.cleanup)
+
+    def available(self):
+        return os.path.isdir(self.cloner.golden)
+
+    async def acquire(self, execution_id):
+        """Return a ready prefix clone for ``execution_id``."""
+        if self._spares:
+            clone = self._spares.pop()
+        else:
+            clone = await self._prepare()
+        clone.execution_id = execution_id
+        self._in_use[execution_id] = clone
+        self._schedule_refill()
+        return clone
+
+    async def release(self, clone, success=True):
+        """Stop the clone's wineserver and discard or keep it per policy."""
+        self._in_use.pop(clone.execution_id, None)
+        await asyncio.to_thread(self.servers.release, clone.path)
+
+        keep = self.policy == 'keep' or (self.policy == 'keep_on_failure' and not success)
+        if keep:
+            await asyncio.to_thread(self.cloner.keep, clone)
+        else:
+            await asyncio.to_thread(self.cloner.discard, clone)
+
+    async def _prepare(self):
+        clone = await asyncio.to_thread(self.cloner.clone)
+        try:
+            await self.servers.ensure(clone.path, self.arch)
+        except Exception as e:
+            logger.warning(f"Could not pre-start wineserver for clone {clone.path}: {e}")
+        return clone
+
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        while len(self._spares) < self.warm_spares:
+            try:
+                self._spares.append(await self._prepare())
+            except Exception as e:
+                logger.error(f"Error preparing Wine prefix clone: {e}")
+                return
+
+    def cleanup(self):
+        """Discard spares and in-use clones on exit."""
+        for clone in self._spares + list(self._in_use.values()):
+            self.servers.release(clone.path)
+            self.cloner.discard(clone)
+        self._spares.clear()
+        self._in_use.clear()
+
+
+# Global wineserver pool
+wineserver_pool = WineServerPool()
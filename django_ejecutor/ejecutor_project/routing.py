@@ -4,10 +4,11 @@ WebSocket URL configuration for ejecutor_project.
 from django.urls import re_path
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from ejecutor.consumers import ExecutionConsumer
+from ejecutor.consumers import ExecutionConsumer, ExecutionMultiplexConsumer
 
 websocket_urlpatterns = [
     re_path(r'ws/execution/(?P<execution_id>[^/]+)/$', ExecutionConsumer.as_asgi()),
+    re_path(r'ws/executions/$', ExecutionMultiplexConsumer.as_asgi()),
 ]
 
 application = ProtocolTypeRouter({
@@ -114,6 +114,101 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Pre-installed executables directory
 PREINSTALLED_FILES_DIR = os.path.join(BASE_DIR, 'preinstalled_executables')
 
+# Executor configuration
+EXECUTOR_CONFIG = {
+    'MAX_EXECUTION_TIME': 30,
+    'MAX_OUTPUT_SIZE': 1024 * 1024,
+    'ALLOWED_EXTENSIONS': ['.exe'],
+    # Ejecuciones simultáneas; el resto espera en una cola FIFO
+    'MAX_CONCURRENT_EXECUTIONS': 4,
+    # Ejecuciones en cola antes de rechazar con 429
+    'MAX_QUEUED_EXECUTIONS': 20,
+    'QUEUE_RETRY_AFTER': 10,
+    # Mantener un wineserver persistente por prefijo (evita 1-3s de arranque en frío)
+    'WINESERVER_WARM_POOL': True,
+    # Prefijo Wine propio por ejecución, clonado del prefijo base (WINE_PREFIX).
+    # Solo conviene con overlay (root o fuse-overlayfs) o reflink (btrfs/XFS): con 'copy'
+    # cada ejecución copia el prefijo entero, más lento que el prefijo compartido
+    'ISOLATED_PREFIXES': False,
+    # 'auto', 'overlay', 'reflink' o 'copy' (sin overlay ni reflink se copia el prefijo)
+    'WINE_PREFIX_CLONE_STRATEGY': 'auto',
+    # Por defecto '<WINE_PREFIX>-clones', en el mismo sistema de archivos
+    'WINE_PREFIX_CLONES_DIR': None,
+    # 'discard', 'keep' o 'keep_on_failure'
+    'WINE_PREFIX_POLICY': 'discard',
+    'WINE_PREFIX_WARM_SPARES': 2,
+    # Pool de displays Xvfb (:100, :101, ...) con x11vnc/websockify por display;
+    # 0 ejecuta sin pantalla (solo aplicaciones de consola). Sin Xvfb la ejecución falla
+    'DISPLAY_POOL_SIZE': 4,
+    'DISPLAY_WARM_SPARES': 1,
+    'DISPLAY_POOL_BASE': 100,
+    # Segundos que una ejecución espera una pantalla libre antes de fallar
+    'DISPLAY_LEASE_TIMEOUT': 60.0,
+    # Segundos que una conexión WebSocket espera a que haya una pantalla lista
+    'DISPLAY_READY_TIMEOUT': 5.0,
+    # Lectura de salida por bloques; las líneas más largas se parten
+    'READ_CHUNK_SIZE': 64 * 1024,
+    'MAX_LINE_LENGTH': 16 * 1024,
+    # Segundos sin salida tras los que se muestra una línea incompleta (prompt) en modo interactivo
+    'PTY_PROMPT_DELAY': 0.2,
+    # Agrupar líneas en un solo mensaje por tamaño o latencia (segundos)
+    'OUTPUT_BATCH_MAX_LINES': 500,
+    'OUTPUT_BATCH_MAX_BYTES': 64 * 1024,
+    'OUTPUT_BATCH_MAX_DELAY': 0.05,
+    # Salida por ejecución: cola en memoria acotada y el resto en disco
+    # (None = MEDIA_ROOT/execution_output; puede apuntar a un tmpfs como /dev/shm).
+    # Los archivos *.log que deja un proceso caído se borran en la primera ejecución
+    'OUTPUT_TAIL_BYTES': 64 * 1024,
+    'OUTPUT_SPILL_DIR': None,
+    # Salida de ejecuciones terminadas: comprimida por segmentos en el almacenamiento
+    # indicado (alias de STORAGES); 'zstd' requiere el paquete opcional zstandard
+    'OUTPUT_STORAGE': 'default',
+    'OUTPUT_CODEC': 'gzip',
+    'OUTPUT_SEGMENT_SIZE': 256 * 1024,
+    # Persistencia incremental de la salida en fragmentos mientras se ejecuta:
+    # se escribe cada N líneas o cada M segundos, en lotes de filas de hasta X bytes
+    'OUTPUT_CHUNK_FLUSH_LINES': 500,
+    'OUTPUT_CHUNK_FLUSH_INTERVAL': 0.5,
+    'OUTPUT_CHUNK_MAX_BYTES': 64 * 1024,
+    # Escrituras fallidas seguidas tras las que se deja de persistir (la salida se guarda al terminar)
+    'OUTPUT_CHUNK_MAX_RETRIES': 5,
+    # Bytes iniciales de cada salida que se indexan para la búsqueda de texto completo
+    'SEARCH_INDEX_MAX_BYTES': 1024 * 1024,
+    # Retención del historial: los registros con más de N días (None = conservar siempre,
+    # salvo que el ejecutable fije su propio periodo) se archivan en NDJSON comprimido y
+    # se eliminan por lotes; LOG_RETENTION_ARCHIVE = False los elimina sin archivar.
+    # 'manage.py archive_execution_logs --loop', en un proceso aparte del servidor, la aplica
+    # cada LOG_RETENTION_INTERVAL segundos; con varios nodos solo uno a la vez la aplica
+    'LOG_RETENTION_DAYS': None,
+    'LOG_RETENTION_ARCHIVE': True,
+    'LOG_RETENTION_BATCH_SIZE': 500,
+    'LOG_RETENTION_BATCH_PAUSE': 0.05,
+    'LOG_RETENTION_INTERVAL': 6 * 3600,
+    'LOG_ARCHIVE_SEGMENT_LOGS': 10000,
+    # Lotes recientes que se conservan para que un cliente que se reconecta
+    # con ?since=<seq> recupere lo que se perdió (por ejecución, en memoria)
+    'REPLAY_MAX_BATCHES': 1000,
+    'REPLAY_MAX_BYTES': 1024 * 1024,
+    # Segundos que se conserva el búfer tras terminar la ejecución
+    'REPLAY_RETENTION': 60,
+    # Entrega de eventos de ejecución a los WebSockets:
+    #   'channel_layer': siempre por CHANNEL_LAYERS (Redis)
+    #   'local': colas en memoria del proceso (despliegues de un solo proceso)
+    #   'hybrid': en memoria si la ejecución corre en este proceso, Redis para el resto
+    'OUTPUT_TRANSPORT': 'hybrid',
+    # Control de flujo por cliente: con más de FLOW_WINDOW_BYTES sin confirmar,
+    # se envía cada SNAPSHOT_INTERVAL segundos una instantánea de las últimas
+    # SNAPSHOT_LINES líneas en lugar de cada lote
+    'FLOW_WINDOW_BYTES': 1024 * 1024,
+    'SNAPSHOT_INTERVAL': 1.0,
+    'SNAPSHOT_LINES': 200,
+    # Conexión multiplexada ws/executions/: suscripciones por conexión y,
+    # en modo 'tail', cada cuántos segundos y cuántas líneas se envían
+    'MULTIPLEX_MAX_SUBSCRIPTIONS': 50,
+    'MULTIPLEX_TAIL_INTERVAL': 1.0,
+    'MULTIPLEX_TAIL_LINES': 20,
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
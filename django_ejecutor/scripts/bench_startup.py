@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark del tiempo de arranque de un worker: django.setup() más la importación
+de los módulos de ejecución, tal como lo pagan ASGI/WSGI y manage.py.
+
+Uso:
+    python scripts/bench_startup.py [--repeat N] [--simulate-wine SEGUNDOS]
+
+--simulate-wine pone en el PATH un ``wine``/``winecfg``/``wineboot`` falso que
+tarda SEGUNDOS y usa un HOME vacío (sin ~/.wine), reproduciendo un nodo nuevo
+sin necesidad de tener Wine instalado.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import time
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+import ejecutor.views, ejecutor.consumers
+t2 = time.perf_counter()
+print(f"{t1 - t0:.6f} {t2 - t1:.6f}")
+"""
+
+def fake_wine_env(delay):
+    """Crear un PATH con binarios de Wine falsos y un HOME sin prefijo."""
+    root = tempfile.mkdtemp(prefix='bench-wine-')
+    bin_dir = os.path.join(root, 'bin')
+    os.makedirs(bin_dir)
+    for name in ('wine', 'winecfg', 'wineboot', 'wineserver'):
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write(f'#!/bin/sh\nsleep {delay}\n')
+        os.chmod(path, 0o755)
+    return {'PATH': f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}", 'HOME': root}
+
+def run_once(extra_env):
+    """Medir un arranque en un intérprete nuevo."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'ejecutor_project.settings', **extra_env}
+    result = subprocess.run(
+        [sys.executable, '-c', SNIPPET], cwd=BASE_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    setup, imports = map(float, result.stdout.split()[-2:])
+    return setup, imports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--simulate-wine', type=float, metavar='SEGUNDOS')
+    args = parser.parse_args()
+
+    extra_env = fake_wine_env(args.simulate_wine) if args.simulate_wine else {}
+    samples = [run_once(extra_env) for _ in range(args.repeat)]
+    setup = [s for s, _ in samples]
+    imports = [i for _, i in samples]
+    print(f"Repeticiones: {args.repeat}")
+    print(f"django.setup():          mediana {statistics.median(setup) * 1000:8.1f} ms")
+    print(f"import views/consumers:  mediana {statistics.median(imports) * 1000:8.1f} ms  "
+          f"(máx {max(imports) * 1000:.1f} ms)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark de lectura de salida de alto volumen: compara el lector anterior
+(readline con wait_for de 1s por línea) con el lector por bloques de
+ejecutor.streams.LineSplitter.
+
+Uso: python scripts/bench_stream_reader.py [--lines N] [--chunk BYTES]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ejecutor.streams import LineSplitter  # noqa: E402
+
+PRODUCER = """
+import sys
+out = sys.stdout.buffer
+line = b'x' * 70 + b'\\n'
+for i in range({lines}):
+    out.write(b'%d ' % i + line)
+out.flush()
+"""
+
+async def readline_reader(stream):
+    """Lector anterior: una llamada a wait_for por línea."""
+    count = 0
+    while True:
+        try:
+            line = await asyncio.wait_for(stream.readline(), timeout=1.0)
+            if not line:
+                break
+            if line.decode('utf-8', errors='replace').rstrip():
+                count += 1
+        except asyncio.TimeoutError:
+            continue
+    return count
+
+async def chunk_reader(stream, chunk_size):
+    """Lector por bloques con división incremental de líneas."""
+    count = 0
+    splitter = LineSplitter()
+    while True:
+        chunk = await stream.read(chunk_size)
+        lines = splitter.feed(chunk) if chunk else splitter.flush()
+        for raw_line, _progress in lines:
+            if raw_line.decode('utf-8', errors='replace').rstrip():
+                count += 1
+        if not chunk:
+            break
+    return count
+
+async def measure(reader, lines):
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-c', PRODUCER.format(lines=lines),
+        stdout=asyncio.subprocess.PIPE
+    )
+    wall, cpu = time.perf_counter(), time.process_time()
+    count = await reader(process.stdout)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    await process.wait()
+    return count, wall, cpu
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=500000)
+    parser.add_argument('--chunk', type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    readers = [
+        ('readline + wait_for', readline_reader),
+        (f'bloques de {args.chunk // 1024} KB', lambda stream: chunk_reader(stream, args.chunk)),
+    ]
+    for name, reader in readers:
+        count, wall, cpu = asyncio.run(measure(reader, args.lines))
+        print(f"{name:22s} {count:>9d} líneas  {wall:6.2f} s reales  {cpu:6.2f} s CPU  "
+              f"{count / wall:>12,.0f} líneas/s")
+
+if __name__ == '__main__':
+    main()
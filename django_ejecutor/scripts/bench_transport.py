@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Benchmark del transporte de eventos de ejecución: compara la entrega en
+memoria (ejecutor.transport.LocalHub) con la entrega por la capa de canales
+configurada (Redis), midiendo mensajes por segundo y latencia p50/p99.
+
+Uso: python scripts/bench_transport.py [--messages N] [--subscribers N]
+                                       [--lines N] [--layer redis|memory]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ejecutor_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from channels.layers import get_channel_layer  # noqa: E402
+
+from ejecutor.transport import OutputTransport  # noqa: E402
+
+GROUP = 'execution_bench'
+
+def make_event(seq, lines):
+    return {
+        'type': 'execution_output',
+        'lines': [f'STDOUT: línea {seq}.{i} ' + 'x' * 60 for i in range(lines)],
+        'seq': seq,
+        'sent_at': time.perf_counter(),
+    }
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+async def run_local(messages, subscribers, lines):
+    """Entrega en memoria: una cola asyncio por suscriptor."""
+    transport = OutputTransport('local')
+    subscriptions = [transport.hub.subscribe(GROUP) for _ in range(subscribers)]
+    latencies = []
+
+    async def consume(subscription):
+        for _ in range(messages):
+            event = await subscription.get()
+            latencies.append(time.perf_counter() - event['sent_at'])
+
+    consumers = [asyncio.create_task(consume(s)) for s in subscriptions]
+    start = time.perf_counter()
+    for seq in range(1, messages + 1):
+        await transport.publish(GROUP, make_event(seq, lines))
+        # Ceder el bucle como lo hace el lector de salida entre bloques
+        await asyncio.sleep(0)
+    await asyncio.gather(*consumers)
+    return time.perf_counter() - start, latencies
+
+async def run_channel_layer(messages, subscribers, lines):
+    """Entrega por la capa de canales: group_send y receive por canal."""
+    transport = OutputTransport('channel_layer')
+    layer = get_channel_layer()
+    channels = [await layer.new_channel() for _ in range(subscribers)]
+    for channel in channels:
+        await layer.group_add(GROUP, channel)
+    latencies = []
+
+    async def consume(channel):
+        for _ in range(messages):
+            event = await layer.receive(channel)
+            latencies.append(time.perf_counter() - event['sent_at'])
+
+    consumers = [asyncio.create_task(consume(c)) for c in channels]
+    start = time.perf_counter()
+    try:
+        for seq in range(1, messages + 1):
+            await transport.publish(GROUP, make_event(seq, lines))
+            # Ceder el bucle como lo hace el lector de salida entre bloques
+            await asyncio.sleep(0)
+        await asyncio.wait_for(asyncio.gather(*consumers), timeout=120)
+    finally:
+        for channel in channels:
+            await layer.group_discard(GROUP, channel)
+    return time.perf_counter() - start, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--subscribers', type=int, default=1)
+    parser.add_argument('--lines', type=int, default=1, help='líneas por mensaje')
+    parser.add_argument('--layer', choices=['redis', 'memory'], default='redis',
+                        help='capa de canales a comparar (memory si no hay Redis)')
+    args = parser.parse_args()
+
+    # La capacidad por canal debe cubrir la ráfaga completa; si no, group_send descarta mensajes
+    capacity = args.messages + 100
+    if args.layer == 'memory':
+        settings.CHANNEL_LAYERS = {'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {'capacity': capacity},
+        }}
+    else:
+        layer_settings = settings.CHANNEL_LAYERS['default']
+        layer_settings['CONFIG'] = {**layer_settings.get('CONFIG', {}), 'capacity': capacity}
+
+    runs = [
+        ('en memoria', run_local),
+        (f'capa de canales ({args.layer})', run_channel_layer),
+    ]
+    for name, run in runs:
+        try:
+            elapsed, latencies = asyncio.run(run(args.messages, args.subscribers, args.lines))
+        except Exception as e:
+            print(f"{name:26s} error: {e}")
+            continue
+        delivered = len(latencies)
+        print(f"{name:26s} {delivered:>8d} entregas  {delivered / elapsed:>10.0f} msg/s  "
+              f"p50 {percentile(latencies, 0.50) * 1000:8.3f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:8.3f} ms")
+
+if __name__ == '__main__':
+    main()